@@ -7,37 +7,858 @@ This application provides CRUD (Create, Read, Update, Delete) operations
 for all tables in the caregiver platform database.
 """
 
-from flask import Flask, render_template, request, redirect, url_for, flash
-from sqlalchemy import create_engine, text
+from flask import (Flask, Response, render_template, stream_template, stream_with_context,
+                   request, redirect, url_for, flash, abort, jsonify, g, before_render_template,
+                   has_request_context, make_response, message_flashed, session as cookie_session,
+                   get_flashed_messages)
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import sessionmaker
 import os
-from datetime import datetime
+import io
+import csv
+import json
+import base64
+import hashlib
+import functools
+from datetime import datetime, date, time, timedelta
+
+from cache import TTLCache
+from db import create_db_engine, create_replica_set, pool_status
+from matching import MatchIndex
+from availability import day_windows, free_slots
+import queries
 
 app = Flask(__name__)
 app.secret_key = os.getenv('SECRET_KEY', 'dev-secret-key-change-in-production')
 
-# Database connection configuration
-DB_USER = os.getenv('DB_USER', 'dimerryy')
-DB_PASSWORD = os.getenv('DB_PASSWORD', '')
-DB_HOST = os.getenv('DB_HOST', 'localhost')
-DB_PORT = os.getenv('DB_PORT', '5432')
-DB_NAME = os.getenv('DB_NAME', 'caregiver_platform')
+# Create engine and session factory
+# Connection and pool settings come from environment variables (see db.py)
+engine = create_db_engine()
+Session = sessionmaker(bind=engine)
 
-DATABASE_URL = f"postgresql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
+# Optional read replicas (DB_REPLICA_HOSTS); GET requests read from them.
+# A client that just POSTed keeps reading from the primary for
+# READ_YOUR_WRITES_SECONDS, so the redirect after a write shows the change
+# even if the replicas have not replayed it yet.
+replicas = create_replica_set(engine)
+READ_YOUR_WRITES_SECONDS = int(os.getenv('READ_YOUR_WRITES_SECONDS', '5'))
+READ_YOUR_WRITES_COOKIE = 'read_primary'
+
+
+def request_engine():
+    """
+    Primary for writes and recent writers, otherwise a replica if there is
+    one. Chosen once per request, so that every session of a request (the
+    version check and a streamed page, say) reads from the same server.
+    """
+    if not has_request_context() or not replicas:
+        return engine
+    if 'read_engine' not in g:
+        if request.method not in ('GET', 'HEAD') or READ_YOUR_WRITES_COOKIE in request.cookies:
+            g.read_engine = engine
+        else:
+            g.read_engine = replicas.engine_for_read()
+    return g.read_engine
 
-# Create engine and session factory
-# Render requires SSL, so add connect_args for SSL if using Render
-connect_args = {}
-if 'render.com' in DB_HOST.lower() or os.getenv('RENDER'):
-    connect_args = {'sslmode': 'require'}
 
-engine = create_engine(DATABASE_URL, echo=False, connect_args=connect_args)
-Session = sessionmaker(bind=engine)
+@app.after_request
+def read_your_writes(response):
+    """Pin the client to the primary for a while after a write request"""
+    if replicas and request.method not in ('GET', 'HEAD', 'OPTIONS'):
+        response.set_cookie(READ_YOUR_WRITES_COOKIE, '1', max_age=READ_YOUR_WRITES_SECONDS,
+                            httponly=True, samesite='Lax')
+    return response
 
 
 def get_db_session():
     """Get a database session"""
-    return Session()
+    return Session(bind=request_engine())
+
+
+def get_db():
+    """
+    Request-scoped database session, created on first use.
+
+    The session is stored on the app context and closed in close_db() when
+    the context is torn down. Its connection goes back to the pool as soon
+    as a template starts rendering (see release_db_before_render), so the
+    connection is only checked out while queries actually run. GET
+    requests read from a replica when there is one (see request_engine).
+    """
+    if 'db_session' not in g:
+        g.db_session = Session(bind=request_engine())
+    return g.db_session
+
+
+def release_db():
+    """Return the request session's connection to the pool"""
+    session = g.get('db_session')
+    if session is not None:
+        session.close()
+
+
+@before_render_template.connect_via(app)
+def release_db_before_render(sender, template, context, **extra):
+    """Templates only see materialized rows, so release the connection first"""
+    release_db()
+
+
+@app.teardown_appcontext
+def close_db(exception=None):
+    """Close the request session when the app context ends"""
+    session = g.pop('db_session', None)
+    if session is not None:
+        session.close()
+
+
+# ============================================================================
+# KEYSET PAGINATION
+# ============================================================================
+
+# Page size used when the request does not ask for one, and the hard upper
+# limit a client may request with ?per_page=
+DEFAULT_PAGE_SIZE = int(os.getenv('PAGE_SIZE', '50'))
+MAX_PAGE_SIZE = int(os.getenv('MAX_PAGE_SIZE', '500'))
+
+# Sort keys for every list page: (SQL expression, result column, parser).
+# The last key of each list makes the ordering unique so that a cursor
+# always points at exactly one row.
+USER_KEYS = [('user_id', 'user_id', int)]
+CAREGIVER_KEYS = [('c.caregiver_user_id', 'caregiver_user_id', int)]
+MEMBER_KEYS = [('m.member_user_id', 'member_user_id', int)]
+ADDRESS_KEYS = [('a.member_user_id', 'member_user_id', int)]
+JOB_KEYS = [('j.job_id', 'job_id', int)]
+# Jobs list ?sort=popular, read in descending order (most applicants first)
+JOB_POPULAR_KEYS = [('j.applicant_count', 'applicant_count', int), ('j.job_id', 'job_id', int)]
+JOB_APPLICATION_KEYS = [
+    ('job_id', 'job_id', int),
+    ('date_applied', 'date_applied', date.fromisoformat),
+    ('caregiver_user_id', 'caregiver_user_id', int),
+]
+APPOINTMENT_KEYS = [
+    ('a.appointment_date', 'appointment_date', date.fromisoformat),
+    ('a.appointment_time', 'appointment_time', time.fromisoformat),
+    ('a.appointment_id', 'appointment_id', int),
+]
+
+
+
+def encode_cursor(row, keys):
+    """Encode the sort key values of a row as an opaque URL-safe token"""
+    values = [str(row[column]) for _, column, _ in keys]
+    token = base64.urlsafe_b64encode(json.dumps(values).encode('utf-8'))
+    return token.decode('ascii').rstrip('=')
+
+
+def decode_cursor(token, keys):
+    """Decode a cursor token back into typed sort key values"""
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+        if not isinstance(values, list) or len(values) != len(keys):
+            raise ValueError('wrong number of values')
+        return [parse(value) for (_, _, parse), value in zip(keys, values)]
+    except (ValueError, TypeError) as e:
+        raise ValueError(f'Invalid page cursor: {e}')
+
+
+def get_page_size():
+    """Page size requested via ?per_page=, clamped to MAX_PAGE_SIZE"""
+    per_page = request.args.get('per_page', DEFAULT_PAGE_SIZE, type=int)
+    return max(1, min(per_page, MAX_PAGE_SIZE))
+
+
+def page_query(base_query, keys, params=None, conditions=None, descending=False):
+    """
+    Build the query for one keyset page of base_query.
+
+    base_query is a registered Query holding a SELECT without WHERE/ORDER BY;
+    extra filters go in conditions. The page position comes from the ?after= / ?before= cursor
+    in the request, so every page is a single index range scan of at most
+    per_page + 1 rows no matter how deep it is. descending=True lists the
+    rows in descending order of all the keys.
+
+    Returns (query, params, position); pass the fetched rows and position to
+    finish_page().
+    """
+    params = dict(params or {})
+    conditions = list(conditions or [])
+    per_page = get_page_size()
+    variant = 'page.desc' if descending else 'page'
+    if conditions:
+        variant += '.' + hashlib.md5(' AND '.join(conditions).encode('utf-8')).hexdigest()[:8]
+
+    before = request.args.get('before')
+    after = request.args.get('after')
+    token = before or after
+    backwards = bool(before)
+
+    if token:
+        try:
+            values = decode_cursor(token, keys)
+        except ValueError as e:
+            flash(str(e), 'error')
+            token = None
+            backwards = False
+        else:
+            columns = ', '.join(expression for expression, _, _ in keys)
+            placeholders = ', '.join(f':cursor_{i}' for i in range(len(keys)))
+            conditions.append(f"({columns}) {'<' if backwards != descending else '>'} ({placeholders})")
+            variant += '.before' if backwards else '.after'
+            params.update({f'cursor_{i}': value for i, value in enumerate(values)})
+
+    direction = ' DESC' if backwards != descending else ''
+    order_by = ', '.join(expression + direction for expression, _, _ in keys)
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ''
+    query = base_query.derive(variant, f"{base_query.sql} {where} ORDER BY {order_by} LIMIT :page_limit")
+    params['page_limit'] = per_page + 1
+
+    position = {'per_page': per_page, 'token': token, 'backwards': backwards}
+    return query, params, position
+
+
+def finish_page(result, keys, position):
+    """Turn the fetched rows into (rows, page) with next/prev cursors"""
+    per_page = position['per_page']
+    backwards = position['backwards']
+    token = position['token']
+
+    rows = [dict(row._mapping) for row in result]
+    has_more = len(rows) > per_page
+    rows = rows[:per_page]
+    if backwards:
+        rows.reverse()
+
+    has_next = has_more if not backwards else bool(token)
+    has_prev = has_more if backwards else bool(token)
+    page = {
+        'per_page': per_page,
+        'next': encode_cursor(rows[-1], keys) if rows and has_next else None,
+        'prev': encode_cursor(rows[0], keys) if rows and has_prev else None,
+    }
+    return rows, page
+
+
+def fetch_page(session, base_query, keys, params=None, conditions=None, descending=False):
+    """
+    Fetch one keyset page of base_query (see page_query()).
+
+    Returns (rows, page) where page holds the next/prev cursors for the
+    pagination links.
+    """
+    query, params, position = page_query(base_query, keys, params, conditions, descending)
+    return finish_page(query.execute(session, params), keys, position)
+
+
+# ============================================================================
+# STREAMED LIST RENDERING
+# ============================================================================
+
+# Rows fetched per round trip from the server-side cursor, and the number of
+# bytes of rendered HTML collected before a chunk is flushed to the client
+STREAM_BATCH_ROWS = int(os.getenv('STREAM_BATCH_ROWS', '500'))
+STREAM_BUFFER_BYTES = int(os.getenv('STREAM_BUFFER_BYTES', '16384'))
+
+
+def wants_stream():
+    """True when the list page was requested with ?stream=1"""
+    return request.args.get('stream') == '1'
+
+
+class LazyRows:
+    """
+    Iterable over a row generator that the templates can still test with
+    {% if rows %}: truthiness peeks at the first row without consuming it.
+    """
+
+    def __init__(self, rows):
+        self._rows = iter(rows)
+        self._head = []
+
+    def __bool__(self):
+        if not self._head:
+            self._head = [row for row in [next(self._rows, None)] if row is not None]
+        return bool(self._head)
+
+    def __iter__(self):
+        yield from self._head
+        self._head = []
+        yield from self._rows
+
+
+def execute_streaming(session, base_query, keys, params=None, conditions=None, descending=False):
+    """Run base_query, filtered by conditions, in keys order on a server-side cursor"""
+    direction = ' DESC' if descending else ''
+    order_by = ', '.join(expression + direction for expression, _, _ in keys)
+    variant = 'stream.desc' if descending else 'stream'
+    where = ''
+    if conditions:
+        variant += '.' + hashlib.md5(' AND '.join(conditions).encode('utf-8')).hexdigest()[:8]
+        where = f"WHERE {' AND '.join(conditions)}"
+    query = base_query.derive(variant, f"{base_query.sql} {where} ORDER BY {order_by}", prepare=False)
+    return query.execute(
+        session,
+        params,
+        execution_options={'stream_results': True, 'yield_per': STREAM_BATCH_ROWS}
+    )
+
+
+def stream_rows(session, base_query, keys, params=None, conditions=None, descending=False):
+    """Yield every row of base_query in keys order from a server-side cursor"""
+    for row in execute_streaming(session, base_query, keys, params, conditions, descending):
+        yield dict(row._mapping)
+
+
+def stream_list(template_name, items_name, base_query, keys, params=None, conditions=None, descending=False):
+    """
+    Render a whole list page as a streamed response.
+
+    Rows are pulled from the database in batches of STREAM_BATCH_ROWS while
+    the template renders, and HTML is flushed every STREAM_BUFFER_BYTES, so
+    memory stays flat however large the table is. The session stays open
+    until the last chunk has been sent.
+    """
+    # Take the flashed messages out of the session now: the session cookie
+    # goes out with the headers, before base.html renders them. The
+    # template's get_flashed_messages() then returns this request's copy.
+    get_flashed_messages()
+    session = get_db_session()
+    rows = LazyRows(stream_rows(session, base_query, keys, params, conditions, descending))
+    chunks = stream_template(template_name, **{items_name: rows, 'page': None})
+
+    def generate():
+        buffer = []
+        size = 0
+        try:
+            for chunk in chunks:
+                buffer.append(chunk)
+                size += len(chunk)
+                if size >= STREAM_BUFFER_BYTES:
+                    yield ''.join(buffer)
+                    buffer = []
+                    size = 0
+            if buffer:
+                yield ''.join(buffer)
+        finally:
+            session.close()
+
+    return Response(generate(), mimetype='text/html')
+
+
+@app.template_global()
+def page_url(**cursor):
+    """URL of the current list page with a different cursor"""
+    args = request.args.to_dict()
+    args.pop('after', None)
+    args.pop('before', None)
+    args.update(cursor)
+    return url_for(request.endpoint, **(request.view_args or {}), **args)
+
+
+# ============================================================================
+# CONDITIONAL GET
+# ============================================================================
+
+# The list pages and the user page send an ETag and Last-Modified built from
+# the TABLE_VERSION rows of the tables they read, which triggers bump on
+# every write. A reload that presents them again gets 304 Not Modified
+# after one primary-key lookup, without running the page's query.
+
+
+def version_stamp(rows, tables):
+    """(ETag, Last-Modified) from TABLE_VERSIONS rows, or None while a table has no version row"""
+    if len(rows) != len(tables):
+        return None
+    return '.'.join(str(row.version) for row in rows), max(row.modified_at for row in rows)
+
+
+def table_versions(session, tables):
+    """(ETag, Last-Modified) of the tables, or None while one has no version row"""
+    return version_stamp(queries.TABLE_VERSIONS.execute(session, {'tables': sorted(tables)}).fetchall(), tables)
+
+
+def not_modified(etag, last_modified):
+    """Whether the client's copy is current; If-None-Match wins over If-Modified-Since"""
+    if request.if_none_match:
+        return request.if_none_match.contains_weak(etag)
+    since = request.if_modified_since
+    return since is not None and last_modified.replace(microsecond=0) <= since
+
+
+def with_validators(response, versions):
+    """Add ETag, Last-Modified and Cache-Control to a page built from versions"""
+    etag, last_modified = versions
+    response.set_etag(etag, weak=True)
+    response.last_modified = last_modified
+    # Revalidate on every use rather than trust a heuristic lifetime
+    response.cache_control.no_cache = True
+    response.cache_control.private = True
+    return response
+
+
+@message_flashed.connect_via(app)
+def mark_flashed(sender, message, category, **extra):
+    """Pages showing a flash message must not be revalidated later"""
+    g.flashed = True
+
+
+def conditional(*tables):
+    """
+    Decorate a GET view whose output depends only on the URL and these
+    tables. The tables are kept on the view as conditional_tables for the
+    async views of asgi.py.
+    """
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            # A message waiting from the previous request goes on this page
+            if '_flashes' in cookie_session:
+                return view(*args, **kwargs)
+            versions = table_versions(get_db(), tables)
+            if versions is None:
+                return view(*args, **kwargs)
+            if not_modified(*versions):
+                return with_validators(Response(status=304), versions)
+            if wants_stream():
+                release_db()    # the streamed page reads on its own session
+            response = make_response(view(*args, **kwargs))
+            if response.status_code != 200 or g.get('flashed'):
+                return response
+            return with_validators(response, versions)
+        wrapper.conditional_tables = tables
+        return wrapper
+    return decorator
+
+
+# ============================================================================
+# FORM PICKER CACHE
+# ============================================================================
+
+def fill_cache(session, load):
+    """
+    Run load(session) to fill a per-worker cache entry.
+
+    Cached values outlive the request and are served to every client, so
+    with replicas configured they are read from the primary: a lagging
+    replica would otherwise pin stale rows for the cache's whole TTL.
+    """
+    if not replicas:
+        return load(session)
+    primary = Session(bind=engine)
+    try:
+        return load(primary)
+    finally:
+        primary.close()
+
+
+# Option lists for the <select> pickers on the create/edit forms. They are
+# cached per worker for PICKER_CACHE_TTL seconds and invalidated by the
+# routes that change the underlying rows.
+PICKER_CACHE_TTL = float(os.getenv('PICKER_CACHE_TTL', '60'))
+picker_cache = TTLCache('pickers', PICKER_CACHE_TTL)
+
+PICKER_QUERIES = {
+    'members': queries.MEMBER_PICKER,
+    'jobs': queries.JOB_PICKER,
+    'users_without_caregiver': queries.USERS_WITHOUT_CAREGIVER,
+    'users_without_member': queries.USERS_WITHOUT_MEMBER,
+    'members_without_address': queries.MEMBERS_WITHOUT_ADDRESS,
+}
+
+# Pickers affected by a write to each table (including ON DELETE CASCADE)
+PICKERS_BY_TABLE = {
+    'USER': list(PICKER_QUERIES),
+    'CAREGIVER': ['users_without_caregiver'],
+    'MEMBER': ['members', 'users_without_member', 'members_without_address', 'jobs'],
+    'ADDRESS': ['members_without_address'],
+    'JOB': ['jobs'],
+    'JOB_APPLICATION': [],
+    'APPOINTMENT': [],
+}
+
+
+def get_picker(session, name):
+    """Cached option list for a form picker, loaded on a miss (see fill_cache)"""
+    def load(session):
+        result = PICKER_QUERIES[name].execute(session)
+        return [dict(row._mapping) for row in result]
+    return picker_cache.get(name, lambda: fill_cache(session, load))
+
+
+def invalidate_pickers(table):
+    """Drop the cached pickers that depend on table"""
+    if PICKERS_BY_TABLE[table]:
+        picker_cache.invalidate(*PICKERS_BY_TABLE[table])
+
+
+@app.route('/internal/pool')
+def pool_stats():
+    """Connection pool usage of this worker process"""
+    return jsonify(pool_status(engine))
+
+
+@app.route('/internal/replicas')
+def replica_stats():
+    """Replica health and how many reads went to replicas vs the primary"""
+    return jsonify(replicas.status())
+
+
+@app.route('/internal/queries')
+def query_stats():
+    """Call counts and timings of the registered SQL statements"""
+    return jsonify(queries.stats())
+
+
+@app.route('/internal/cache')
+def cache_stats():
+    """Hit/miss counters of the in-process caches"""
+    return jsonify([picker_cache.stats(), dashboard_cache.stats(), match_cache.stats()])
+
+
+# ============================================================================
+# TYPEAHEAD SEARCH API
+# ============================================================================
+
+# Maximum matches returned by the typeahead endpoints
+TYPEAHEAD_LIMIT = int(os.getenv('TYPEAHEAD_LIMIT', '10'))
+
+# Queries shorter than this use the btree prefix index; longer ones use the
+# pg_trgm index for substring matches
+TRIGRAM_MIN_LENGTH = 3
+
+
+def escape_like(value):
+    """Escape LIKE wildcards in user input"""
+    return value.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+
+def typeahead_query(prefix_query, contains_query):
+    """
+    Pick the typeahead query and parameters for ?q= and ?limit=.
+
+    Short queries use the btree prefix index, longer ones the trigram index
+    (see the TYPEAHEAD SEARCH section of queries.py). Returns (None, None)
+    when there is nothing to search for.
+    """
+    q = request.args.get('q', '').strip()
+    limit = max(1, min(request.args.get('limit', TYPEAHEAD_LIMIT, type=int), TYPEAHEAD_LIMIT))
+    if not q:
+        return None, None
+
+    prefix = escape_like(q.lower()) + '%'
+    if len(q) < TRIGRAM_MIN_LENGTH:
+        return prefix_query, {'pattern': prefix, 'limit': limit}
+    return contains_query, {
+        'pattern': '%' + escape_like(q) + '%',
+        'prefix': prefix,
+        'limit': limit
+    }
+
+
+def search_people(prefix_query, contains_query):
+    """Typeahead lookup of caregivers or members by name"""
+    query, params = typeahead_query(prefix_query, contains_query)
+    if query is None:
+        return jsonify([])
+    result = query.execute(get_db(), params)
+    return jsonify([dict(row._mapping) for row in result])
+
+
+@app.route('/api/caregivers/search')
+def search_caregivers():
+    """Caregivers whose name matches ?q=, best matches first"""
+    return search_people(queries.CAREGIVER_NAME_PREFIX, queries.CAREGIVER_NAME_CONTAINS)
+
+
+@app.route('/api/members/search')
+def search_members():
+    """Members whose name matches ?q=, best matches first"""
+    return search_people(queries.MEMBER_NAME_PREFIX, queries.MEMBER_NAME_CONTAINS)
+
+
+# ============================================================================
+# TEXT SEARCH
+# ============================================================================
+
+# Best-ranked matches shown per search; the rest are counted only as "more
+# than this many" (see _ranked_search() in queries.py)
+SEARCH_MAX_CANDIDATES = int(os.getenv('SEARCH_MAX_CANDIDATES', '1000'))
+SEARCH_PAGE_SIZE = 20
+
+# What can be searched: (label, full-text query, substring query)
+SEARCH_KINDS = {
+    'jobs': ('Job requirements', queries.SEARCH_JOBS_FULLTEXT, queries.SEARCH_JOBS_SUBSTRING),
+    'members': ('House rules and dependents', queries.SEARCH_MEMBERS_FULLTEXT, queries.SEARCH_MEMBERS_SUBSTRING),
+    'users': ('User profiles', queries.SEARCH_USERS_FULLTEXT, queries.SEARCH_USERS_SUBSTRING),
+}
+
+
+def run_search(session):
+    """
+    Ranked, paginated text search for ?q=&kind=&page=.
+
+    Words are matched with PostgreSQL full-text search (stemmed, so "pets"
+    finds "pet"; quotes, OR and -word work as in web search engines). When
+    the first page finds nothing, the search falls back to substring
+    matching on the trigram indexes, ranked by word similarity; the
+    pagination links then carry ?match=substring.
+    """
+    q = request.args.get('q', '').strip()[:200]
+    kind = request.args.get('kind', 'jobs')
+    if kind not in SEARCH_KINDS:
+        kind = 'jobs'
+    page = max(1, request.args.get('page', 1, type=int))
+    per_page = max(1, min(request.args.get('per_page', SEARCH_PAGE_SIZE, type=int), MAX_PAGE_SIZE))
+    match = 'substring' if request.args.get('match') == 'substring' else 'fulltext'
+
+    search = {'q': q, 'kind': kind, 'match': match, 'page': page, 'per_page': per_page,
+              'results': [], 'total': 0, 'capped': False, 'has_next': False}
+    if not q:
+        return search
+
+    _, fulltext_query, substring_query = SEARCH_KINDS[kind]
+    params = {
+        'q': q,
+        'pattern': '%' + escape_like(q) + '%',
+        # One extra candidate tells whether there are more than the maximum
+        'candidates': SEARCH_MAX_CANDIDATES + 1,
+        'limit': per_page,
+        'offset': (page - 1) * per_page,
+    }
+    query = substring_query if match == 'substring' else fulltext_query
+    rows = [dict(row._mapping) for row in query.execute(session, params)]
+    if not rows and match == 'fulltext' and page == 1 and len(q) >= TRIGRAM_MIN_LENGTH:
+        search['match'] = 'substring'
+        rows = [dict(row._mapping) for row in substring_query.execute(session, params)]
+
+    total = rows[0]['total'] if rows else 0
+    capped = total > SEARCH_MAX_CANDIDATES
+    total = min(total, SEARCH_MAX_CANDIDATES)
+    rows = rows[:max(0, total - params['offset'])]
+    for row in rows:
+        del row['total']
+        row['rank'] = round(float(row['rank']), 4)
+    search.update({
+        'results': rows,
+        'total': total,
+        'capped': capped,
+        'has_next': page * per_page < total,
+    })
+    return search
+
+
+@app.route('/search')
+def search():
+    """Search job requirements, house rules and user profiles"""
+    try:
+        result = run_search(get_db())
+    except Exception as e:
+        flash(f'Error searching: {str(e)}', 'error')
+        result = {'q': request.args.get('q', ''), 'kind': request.args.get('kind', 'jobs'),
+                  'results': [], 'total': 0}
+    return render_template('search.html', search=result, kinds=SEARCH_KINDS)
+
+
+@app.route('/api/search')
+def search_api():
+    """JSON version of /search"""
+    return jsonify(run_search(get_db()))
+
+
+# ============================================================================
+# DASHBOARD
+# ============================================================================
+
+# The dashboard runs the report queries of main.py (6.1-6.4 and 7). Its
+# result is cached per worker for DASHBOARD_CACHE_TTL seconds and dropped
+# when a route writes to a table it reads; concurrent requests for an
+# expired dashboard wait for a single recomputation (see cache.py).
+DASHBOARD_CACHE_TTL = float(os.getenv('DASHBOARD_CACHE_TTL', '300'))
+DASHBOARD_ROWS = int(os.getenv('DASHBOARD_ROWS', '20'))
+dashboard_cache = TTLCache('dashboard', DASHBOARD_CACHE_TTL)
+
+DASHBOARD_TABLES = {'USER', 'CAREGIVER', 'MEMBER', 'JOB', 'JOB_APPLICATION', 'APPOINTMENT'}
+
+
+def invalidate_caches(table):
+    """Drop every cached value that depends on table (call after a commit)"""
+    invalidate_pickers(table)
+    if table in DASHBOARD_TABLES:
+        dashboard_cache.invalidate()
+
+
+def load_dashboard(session):
+    """Run the report queries for the dashboard"""
+    started = datetime.now()
+    params = {'limit': DASHBOARD_ROWS}
+
+    def rows(query):
+        return [dict(row._mapping) for row in query.execute(session, params)]
+
+    return {
+        'total_cost': queries.QUERY_7.execute(session).scalar(),
+        'applicants': rows(queries.DASHBOARD_APPLICANTS),
+        'hours': rows(queries.DASHBOARD_HOURS),
+        'average_pay': rows(queries.DASHBOARD_AVERAGE_PAY),
+        'above_average': rows(queries.DASHBOARD_ABOVE_AVERAGE),
+        'computed_at': started,
+        'duration_ms': round((datetime.now() - started).total_seconds() * 1000, 1),
+    }
+
+
+@app.route('/dashboard')
+def dashboard():
+    """Business metrics from the report queries, cached"""
+    session = get_db()
+    try:
+        metrics = dashboard_cache.get('metrics', lambda: fill_cache(session, load_dashboard))
+    except Exception as e:
+        session.rollback()
+        flash(f'Error loading dashboard: {str(e)}', 'error')
+        metrics = None
+    return render_template('dashboard.html', metrics=metrics, rows=DASHBOARD_ROWS,
+                           ttl=DASHBOARD_CACHE_TTL)
+
+
+@app.route('/dashboard/refresh', methods=['POST'])
+def refresh_dashboard():
+    """Drop the cached dashboard so the next view recomputes it"""
+    dashboard_cache.invalidate('metrics')
+    flash('Dashboard refreshed', 'success')
+    return redirect(url_for('dashboard'))
+
+
+# ============================================================================
+# CAREGIVER MATCHING
+# ============================================================================
+
+# The match index (matching.py) is built on first use and rebuilt every
+# MATCH_INDEX_TTL seconds; in between, the routes that change a caregiver
+# update it in place with refresh_matches().
+MATCH_INDEX_TTL = float(os.getenv('MATCH_INDEX_TTL', '600'))
+MATCH_LIMIT = int(os.getenv('MATCH_LIMIT', '10'))
+MAX_MATCH_LIMIT = 100
+match_cache = TTLCache('matching', MATCH_INDEX_TTL)
+
+
+def refresh_matches(session, *caregiver_ids):
+    """Update the given caregivers in this worker's match index, if it is built"""
+    index = match_cache.peek('index')
+    if index is None:
+        return
+    try:
+        index.refresh(session, caregiver_ids)
+    except Exception:
+        # The next rebuild picks the change up
+        session.rollback()
+        match_cache.invalidate('index')
+
+
+@app.route('/jobs/<int:job_id>/matches')
+def job_matches(job_id):
+    """Top ?k= caregivers for a job: its caregiving type, in the member's city"""
+    session = get_db()
+    job = queries.MATCH_JOB.execute(session, {'job_id': job_id}).fetchone()
+    if job is None:
+        return jsonify({'error': f'Job {job_id} not found'}), 404
+    limit = max(1, min(request.args.get('k', MATCH_LIMIT, type=int), MAX_MATCH_LIMIT))
+    index = match_cache.get('index', lambda: fill_cache(session, MatchIndex.load))
+    matches, candidates = index.top(job.required_caregiving_type, job.city, limit)
+    return jsonify({
+        'job_id': job.job_id,
+        'caregiving_type': job.required_caregiving_type,
+        'city': job.city,
+        'candidates': candidates,
+        'matches': matches,
+    })
+
+
+# ============================================================================
+# CAREGIVER AVAILABILITY
+# ============================================================================
+
+# Free slots are the parts of each day's working hours not taken by a
+# pending, confirmed or completed appointment
+AVAILABILITY_DAY_START = time.fromisoformat(os.getenv('AVAILABILITY_DAY_START', '07:00'))
+AVAILABILITY_DAY_END = time.fromisoformat(os.getenv('AVAILABILITY_DAY_END', '21:00'))
+AVAILABILITY_DAYS = 7
+MAX_AVAILABILITY_DAYS = int(os.getenv('MAX_AVAILABILITY_DAYS', '31'))
+MAX_AVAILABILITY_CAREGIVERS = int(os.getenv('MAX_AVAILABILITY_CAREGIVERS', '100'))
+
+
+def availability_range():
+    """First and last day (inclusive) from ?from= and ?to=; raises ValueError"""
+    first_day = date.fromisoformat(request.args.get('from') or date.today().isoformat())
+    to = request.args.get('to')
+    last_day = date.fromisoformat(to) if to else first_day + timedelta(days=AVAILABILITY_DAYS - 1)
+    if last_day < first_day:
+        raise ValueError('to is before from')
+    if (last_day - first_day).days >= MAX_AVAILABILITY_DAYS:
+        raise ValueError(f'at most {MAX_AVAILABILITY_DAYS} days at a time')
+    return first_day, last_day
+
+
+def caregiver_availability(session, caregiver_ids, first_day, last_day):
+    """{caregiver_user_id: {'busy': [...], 'free': [...]}} for existing caregivers"""
+    windows = day_windows(first_day, last_day, AVAILABILITY_DAY_START, AVAILABILITY_DAY_END)
+    busy = {}
+    result = queries.CAREGIVER_BUSY.execute(session, {
+        'caregiver_ids': sorted(set(caregiver_ids)),
+        'range_start': datetime.combine(first_day, time.min),
+        'range_end': datetime.combine(last_day + timedelta(days=1), time.min),
+    })
+    for row in result:
+        intervals = busy.setdefault(row.caregiver_user_id, [])
+        if row.starts is not None:
+            intervals.append((row.starts, row.ends))
+
+    def iso(intervals):
+        return [{'start': start.isoformat(timespec='minutes'), 'end': end.isoformat(timespec='minutes')}
+                for start, end in intervals]
+
+    return {caregiver_id: {'busy': iso(intervals), 'free': iso(free_slots(intervals, windows))}
+            for caregiver_id, intervals in busy.items()}
+
+
+def availability_response(caregivers, first_day, last_day):
+    return {
+        'from': first_day.isoformat(),
+        'to': last_day.isoformat(),
+        'day_start': AVAILABILITY_DAY_START.isoformat(timespec='minutes'),
+        'day_end': AVAILABILITY_DAY_END.isoformat(timespec='minutes'),
+        'caregivers': caregivers,
+    }
+
+
+@app.route('/caregivers/<int:caregiver_id>/availability')
+def caregiver_availability_view(caregiver_id):
+    """Busy and free time of one caregiver from ?from= to ?to= (dates, inclusive)"""
+    try:
+        first_day, last_day = availability_range()
+    except ValueError as e:
+        return jsonify({'error': f'Invalid date range: {e}'}), 400
+    caregivers = caregiver_availability(get_db(), [caregiver_id], first_day, last_day)
+    if caregiver_id not in caregivers:
+        return jsonify({'error': f'Caregiver {caregiver_id} not found'}), 404
+    response = availability_response(caregivers, first_day, last_day)
+    response.update(caregiver_user_id=caregiver_id, **response.pop('caregivers')[caregiver_id])
+    return jsonify(response)
+
+
+@app.route('/caregivers/availability')
+def caregivers_availability_view():
+    """Batch form: ?ids=1,2,3 (up to MAX_AVAILABILITY_CAREGIVERS) in one query"""
+    try:
+        first_day, last_day = availability_range()
+        caregiver_ids = [int(value) for value in request.args.get('ids', '').split(',') if value.strip()]
+    except ValueError as e:
+        return jsonify({'error': f'Invalid request: {e}'}), 400
+    if not caregiver_ids:
+        return jsonify({'error': 'No caregiver ids given (?ids=1,2,3)'}), 400
+    if len(caregiver_ids) > MAX_AVAILABILITY_CAREGIVERS:
+        return jsonify({'error': f'At most {MAX_AVAILABILITY_CAREGIVERS} caregivers at a time'}), 400
+    caregivers = caregiver_availability(get_db(), caregiver_ids, first_day, last_day)
+    return jsonify(availability_response(caregivers, first_day, last_day))
 
 
 # ============================================================================
@@ -55,31 +876,28 @@ def index():
 # ============================================================================
 
 @app.route('/users')
+@conditional('USER')
 def list_users():
     """List all users"""
-    session = get_db_session()
+    if wants_stream():
+        return stream_list('users/list.html', 'users', queries.USER_LIST, USER_KEYS)
+
+    session = get_db()
     try:
-        result = session.execute(text('SELECT * FROM "USER" ORDER BY user_id'))
-        users = [dict(row._mapping) for row in result]
-        return render_template('users/list.html', users=users)
+        users, page = fetch_page(session, queries.USER_LIST, USER_KEYS)
+        return render_template('users/list.html', users=users, page=page)
     except Exception as e:
         flash(f'Error loading users: {str(e)}', 'error')
-        return render_template('users/list.html', users=[])
-    finally:
-        session.close()
+        return render_template('users/list.html', users=[], page=None)
 
 
 @app.route('/users/create', methods=['GET', 'POST'])
 def create_user():
     """Create a new user"""
     if request.method == 'POST':
-        session = get_db_session()
+        session = get_db()
         try:
-            query = text("""
-                INSERT INTO "USER" (email, given_name, surname, city, phone_number, profile_description, password)
-                VALUES (:email, :given_name, :surname, :city, :phone_number, :profile_description, :password)
-            """)
-            session.execute(query, {
+            queries.INSERT_USER.execute(session, {
                 'email': request.form['email'],
                 'given_name': request.form['given_name'],
                 'surname': request.form['surname'],
@@ -89,50 +907,37 @@ def create_user():
                 'password': request.form['password']
             })
             session.commit()
+            invalidate_caches('USER')
             flash('User created successfully!', 'success')
             return redirect(url_for('list_users'))
         except Exception as e:
             session.rollback()
             flash(f'Error creating user: {str(e)}', 'error')
-        finally:
-            session.close()
     
     return render_template('users/create.html')
 
 
 @app.route('/users/<int:user_id>')
+@conditional('USER')
 def view_user(user_id):
     """View a specific user"""
-    session = get_db_session()
-    try:
-        result = session.execute(
-            text('SELECT * FROM "USER" WHERE user_id = :user_id'),
-            {'user_id': user_id}
-        )
-        user = result.fetchone()
-        if user:
-            return render_template('users/view.html', user=dict(user._mapping))
-        else:
-            flash('User not found', 'error')
-            return redirect(url_for('list_users'))
-    finally:
-        session.close()
+    session = get_db()
+    result = queries.USER_BY_ID.execute(session, {'user_id': user_id})
+    user = result.fetchone()
+    if user:
+        return render_template('users/view.html', user=dict(user._mapping))
+    else:
+        flash('User not found', 'error')
+        return redirect(url_for('list_users'))
 
 
 @app.route('/users/<int:user_id>/edit', methods=['GET', 'POST'])
 def edit_user(user_id):
     """Edit a user"""
-    session = get_db_session()
+    session = get_db()
     try:
         if request.method == 'POST':
-            query = text("""
-                UPDATE "USER"
-                SET email = :email, given_name = :given_name, surname = :surname,
-                    city = :city, phone_number = :phone_number,
-                    profile_description = :profile_description, password = :password
-                WHERE user_id = :user_id
-            """)
-            session.execute(query, {
+            queries.UPDATE_USER.execute(session, {
                 'user_id': user_id,
                 'email': request.form['email'],
                 'given_name': request.form['given_name'],
@@ -143,13 +948,12 @@ def edit_user(user_id):
                 'password': request.form['password']
             })
             session.commit()
+            invalidate_caches('USER')
+            refresh_matches(session, user_id)
             flash('User updated successfully!', 'success')
             return redirect(url_for('view_user', user_id=user_id))
         
-        result = session.execute(
-            text('SELECT * FROM "USER" WHERE user_id = :user_id'),
-            {'user_id': user_id}
-        )
+        result = queries.USER_BY_ID.execute(session, {'user_id': user_id})
         user = result.fetchone()
         if user:
             return render_template('users/edit.html', user=dict(user._mapping))
@@ -159,26 +963,21 @@ def edit_user(user_id):
     except Exception as e:
         session.rollback()
         flash(f'Error updating user: {str(e)}', 'error')
-    finally:
-        session.close()
 
 
 @app.route('/users/<int:user_id>/delete', methods=['POST'])
 def delete_user(user_id):
     """Delete a user"""
-    session = get_db_session()
+    session = get_db()
     try:
-        session.execute(
-            text('DELETE FROM "USER" WHERE user_id = :user_id'),
-            {'user_id': user_id}
-        )
+        queries.DELETE_USER.execute(session, {'user_id': user_id})
         session.commit()
+        invalidate_caches('USER')
+        refresh_matches(session, user_id)
         flash('User deleted successfully!', 'success')
     except Exception as e:
         session.rollback()
         flash(f'Error deleting user: {str(e)}', 'error')
-    finally:
-        session.close()
     return redirect(url_for('list_users'))
 
 
@@ -187,34 +986,24 @@ def delete_user(user_id):
 # ============================================================================
 
 @app.route('/caregivers')
+@conditional('CAREGIVER', 'USER')
 def list_caregivers():
     """List all caregivers with user information"""
-    session = get_db_session()
-    try:
-        query = text("""
-            SELECT c.*, u.given_name, u.surname, u.email, u.city, u.phone_number
-            FROM CAREGIVER c
-            JOIN "USER" u ON c.caregiver_user_id = u.user_id
-            ORDER BY c.caregiver_user_id
-        """)
-        result = session.execute(query)
-        caregivers = [dict(row._mapping) for row in result]
-        return render_template('caregivers/list.html', caregivers=caregivers)
-    finally:
-        session.close()
+    if wants_stream():
+        return stream_list('caregivers/list.html', 'caregivers', queries.CAREGIVER_LIST, CAREGIVER_KEYS)
+
+    session = get_db()
+    caregivers, page = fetch_page(session, queries.CAREGIVER_LIST, CAREGIVER_KEYS)
+    return render_template('caregivers/list.html', caregivers=caregivers, page=page)
 
 
 @app.route('/caregivers/create', methods=['GET', 'POST'])
 def create_caregiver():
     """Create a new caregiver (user must exist first)"""
-    session = get_db_session()
+    session = get_db()
     try:
         if request.method == 'POST':
-            query = text("""
-                INSERT INTO CAREGIVER (caregiver_user_id, photo, gender, caregiving_type, hourly_rate)
-                VALUES (:caregiver_user_id, :photo, :gender, :caregiving_type, :hourly_rate)
-            """)
-            session.execute(query, {
+            queries.INSERT_CAREGIVER.execute(session, {
                 'caregiver_user_id': int(request.form['caregiver_user_id']),
                 'photo': request.form.get('photo', ''),
                 'gender': request.form['gender'],
@@ -222,41 +1011,27 @@ def create_caregiver():
                 'hourly_rate': float(request.form['hourly_rate'])
             })
             session.commit()
+            invalidate_caches('CAREGIVER')
+            refresh_matches(session, int(request.form['caregiver_user_id']))
             flash('Caregiver created successfully!', 'success')
             return redirect(url_for('list_caregivers'))
         
         # Get list of users who are not already caregivers
-        users_query = text("""
-            SELECT u.user_id, u.given_name || ' ' || u.surname AS name
-            FROM "USER" u
-            LEFT JOIN CAREGIVER c ON u.user_id = c.caregiver_user_id
-            WHERE c.caregiver_user_id IS NULL
-            ORDER BY u.user_id
-        """)
-        users_result = session.execute(users_query)
-        available_users = [dict(row._mapping) for row in users_result]
+        available_users = get_picker(session, 'users_without_caregiver')
         return render_template('caregivers/create.html', available_users=available_users)
     except Exception as e:
         session.rollback()
         flash(f'Error: {str(e)}', 'error')
-    finally:
-        session.close()
     return redirect(url_for('list_caregivers'))
 
 
 @app.route('/caregivers/<int:caregiver_id>/edit', methods=['GET', 'POST'])
 def edit_caregiver(caregiver_id):
     """Edit a caregiver"""
-    session = get_db_session()
+    session = get_db()
     try:
         if request.method == 'POST':
-            query = text("""
-                UPDATE CAREGIVER
-                SET photo = :photo, gender = :gender, caregiving_type = :caregiving_type,
-                    hourly_rate = :hourly_rate
-                WHERE caregiver_user_id = :caregiver_user_id
-            """)
-            session.execute(query, {
+            queries.UPDATE_CAREGIVER.execute(session, {
                 'caregiver_user_id': caregiver_id,
                 'photo': request.form.get('photo', ''),
                 'gender': request.form['gender'],
@@ -264,16 +1039,12 @@ def edit_caregiver(caregiver_id):
                 'hourly_rate': float(request.form['hourly_rate'])
             })
             session.commit()
+            invalidate_caches('CAREGIVER')
+            refresh_matches(session, caregiver_id)
             flash('Caregiver updated successfully!', 'success')
             return redirect(url_for('list_caregivers'))
         
-        query = text("""
-            SELECT c.*, u.given_name, u.surname
-            FROM CAREGIVER c
-            JOIN "USER" u ON c.caregiver_user_id = u.user_id
-            WHERE c.caregiver_user_id = :caregiver_id
-        """)
-        result = session.execute(query, {'caregiver_id': caregiver_id})
+        result = queries.CAREGIVER_BY_ID.execute(session, {'caregiver_id': caregiver_id})
         caregiver = result.fetchone()
         if caregiver:
             return render_template('caregivers/edit.html', caregiver=dict(caregiver._mapping))
@@ -283,27 +1054,22 @@ def edit_caregiver(caregiver_id):
     except Exception as e:
         session.rollback()
         flash(f'Error: {str(e)}', 'error')
-    finally:
-        session.close()
     return redirect(url_for('list_caregivers'))
 
 
 @app.route('/caregivers/<int:caregiver_id>/delete', methods=['POST'])
 def delete_caregiver(caregiver_id):
     """Delete a caregiver"""
-    session = get_db_session()
+    session = get_db()
     try:
-        session.execute(
-            text("DELETE FROM CAREGIVER WHERE caregiver_user_id = :caregiver_id"),
-            {'caregiver_id': caregiver_id}
-        )
+        queries.DELETE_CAREGIVER.execute(session, {'caregiver_id': caregiver_id})
         session.commit()
+        invalidate_caches('CAREGIVER')
+        refresh_matches(session, caregiver_id)
         flash('Caregiver deleted successfully!', 'success')
     except Exception as e:
         session.rollback()
         flash(f'Error deleting caregiver: {str(e)}', 'error')
-    finally:
-        session.close()
     return redirect(url_for('list_caregivers'))
 
 
@@ -312,73 +1078,49 @@ def delete_caregiver(caregiver_id):
 # ============================================================================
 
 @app.route('/members')
+@conditional('MEMBER', 'USER')
 def list_members():
     """List all members with user information"""
-    session = get_db_session()
-    try:
-        query = text("""
-            SELECT m.*, u.given_name, u.surname, u.email, u.city, u.phone_number
-            FROM MEMBER m
-            JOIN "USER" u ON m.member_user_id = u.user_id
-            ORDER BY m.member_user_id
-        """)
-        result = session.execute(query)
-        members = [dict(row._mapping) for row in result]
-        return render_template('members/list.html', members=members)
-    finally:
-        session.close()
+    if wants_stream():
+        return stream_list('members/list.html', 'members', queries.MEMBER_LIST, MEMBER_KEYS)
+
+    session = get_db()
+    members, page = fetch_page(session, queries.MEMBER_LIST, MEMBER_KEYS)
+    return render_template('members/list.html', members=members, page=page)
 
 
 @app.route('/members/create', methods=['GET', 'POST'])
 def create_member():
     """Create a new member (user must exist first)"""
-    session = get_db_session()
+    session = get_db()
     try:
         if request.method == 'POST':
-            query = text("""
-                INSERT INTO MEMBER (member_user_id, house_rules, dependent_description)
-                VALUES (:member_user_id, :house_rules, :dependent_description)
-            """)
-            session.execute(query, {
+            queries.INSERT_MEMBER.execute(session, {
                 'member_user_id': int(request.form['member_user_id']),
                 'house_rules': request.form.get('house_rules', ''),
                 'dependent_description': request.form.get('dependent_description', '')
             })
             session.commit()
+            invalidate_caches('MEMBER')
             flash('Member created successfully!', 'success')
             return redirect(url_for('list_members'))
         
         # Get list of users who are not already members
-        users_query = text("""
-            SELECT u.user_id, u.given_name || ' ' || u.surname AS name
-            FROM "USER" u
-            LEFT JOIN MEMBER m ON u.user_id = m.member_user_id
-            WHERE m.member_user_id IS NULL
-            ORDER BY u.user_id
-        """)
-        users_result = session.execute(users_query)
-        available_users = [dict(row._mapping) for row in users_result]
+        available_users = get_picker(session, 'users_without_member')
         return render_template('members/create.html', available_users=available_users)
     except Exception as e:
         session.rollback()
         flash(f'Error: {str(e)}', 'error')
-    finally:
-        session.close()
     return redirect(url_for('list_members'))
 
 
 @app.route('/members/<int:member_id>/edit', methods=['GET', 'POST'])
 def edit_member(member_id):
     """Edit a member"""
-    session = get_db_session()
+    session = get_db()
     try:
         if request.method == 'POST':
-            query = text("""
-                UPDATE MEMBER
-                SET house_rules = :house_rules, dependent_description = :dependent_description
-                WHERE member_user_id = :member_user_id
-            """)
-            session.execute(query, {
+            queries.UPDATE_MEMBER.execute(session, {
                 'member_user_id': member_id,
                 'house_rules': request.form.get('house_rules', ''),
                 'dependent_description': request.form.get('dependent_description', '')
@@ -387,13 +1129,7 @@ def edit_member(member_id):
             flash('Member updated successfully!', 'success')
             return redirect(url_for('list_members'))
         
-        query = text("""
-            SELECT m.*, u.given_name, u.surname
-            FROM MEMBER m
-            JOIN "USER" u ON m.member_user_id = u.user_id
-            WHERE m.member_user_id = :member_id
-        """)
-        result = session.execute(query, {'member_id': member_id})
+        result = queries.MEMBER_BY_ID.execute(session, {'member_id': member_id})
         member = result.fetchone()
         if member:
             return render_template('members/edit.html', member=dict(member._mapping))
@@ -403,27 +1139,21 @@ def edit_member(member_id):
     except Exception as e:
         session.rollback()
         flash(f'Error: {str(e)}', 'error')
-    finally:
-        session.close()
     return redirect(url_for('list_members'))
 
 
 @app.route('/members/<int:member_id>/delete', methods=['POST'])
 def delete_member(member_id):
     """Delete a member"""
-    session = get_db_session()
+    session = get_db()
     try:
-        session.execute(
-            text("DELETE FROM MEMBER WHERE member_user_id = :member_id"),
-            {'member_id': member_id}
-        )
+        queries.DELETE_MEMBER.execute(session, {'member_id': member_id})
         session.commit()
+        invalidate_caches('MEMBER')
         flash('Member deleted successfully!', 'success')
     except Exception as e:
         session.rollback()
         flash(f'Error deleting member: {str(e)}', 'error')
-    finally:
-        session.close()
     return redirect(url_for('list_members'))
 
 
@@ -432,76 +1162,50 @@ def delete_member(member_id):
 # ============================================================================
 
 @app.route('/addresses')
+@conditional('ADDRESS', 'MEMBER', 'USER')
 def list_addresses():
     """List all addresses with member information"""
-    session = get_db_session()
-    try:
-        query = text("""
-            SELECT a.*, u.given_name, u.surname
-            FROM ADDRESS a
-            JOIN MEMBER m ON a.member_user_id = m.member_user_id
-            JOIN "USER" u ON m.member_user_id = u.user_id
-            ORDER BY a.member_user_id
-        """)
-        result = session.execute(query)
-        addresses = [dict(row._mapping) for row in result]
-        return render_template('addresses/list.html', addresses=addresses)
-    finally:
-        session.close()
+    if wants_stream():
+        return stream_list('addresses/list.html', 'addresses', queries.ADDRESS_LIST, ADDRESS_KEYS)
+
+    session = get_db()
+    addresses, page = fetch_page(session, queries.ADDRESS_LIST, ADDRESS_KEYS)
+    return render_template('addresses/list.html', addresses=addresses, page=page)
 
 
 @app.route('/addresses/create', methods=['GET', 'POST'])
 def create_address():
     """Create a new address"""
-    session = get_db_session()
+    session = get_db()
     try:
         if request.method == 'POST':
-            query = text("""
-                INSERT INTO ADDRESS (member_user_id, house_number, street, town)
-                VALUES (:member_user_id, :house_number, :street, :town)
-            """)
-            session.execute(query, {
+            queries.INSERT_ADDRESS.execute(session, {
                 'member_user_id': int(request.form['member_user_id']),
                 'house_number': request.form['house_number'],
                 'street': request.form['street'],
                 'town': request.form['town']
             })
             session.commit()
+            invalidate_caches('ADDRESS')
             flash('Address created successfully!', 'success')
             return redirect(url_for('list_addresses'))
         
         # Get list of members who don't have addresses yet
-        members_query = text("""
-            SELECT m.member_user_id, u.given_name || ' ' || u.surname AS name
-            FROM MEMBER m
-            JOIN "USER" u ON m.member_user_id = u.user_id
-            LEFT JOIN ADDRESS a ON m.member_user_id = a.member_user_id
-            WHERE a.member_user_id IS NULL
-            ORDER BY m.member_user_id
-        """)
-        members_result = session.execute(members_query)
-        available_members = [dict(row._mapping) for row in members_result]
+        available_members = get_picker(session, 'members_without_address')
         return render_template('addresses/create.html', available_members=available_members)
     except Exception as e:
         session.rollback()
         flash(f'Error: {str(e)}', 'error')
-    finally:
-        session.close()
     return redirect(url_for('list_addresses'))
 
 
 @app.route('/addresses/<int:member_id>/edit', methods=['GET', 'POST'])
 def edit_address(member_id):
     """Edit an address"""
-    session = get_db_session()
+    session = get_db()
     try:
         if request.method == 'POST':
-            query = text("""
-                UPDATE ADDRESS
-                SET house_number = :house_number, street = :street, town = :town
-                WHERE member_user_id = :member_user_id
-            """)
-            session.execute(query, {
+            queries.UPDATE_ADDRESS.execute(session, {
                 'member_user_id': member_id,
                 'house_number': request.form['house_number'],
                 'street': request.form['street'],
@@ -511,14 +1215,7 @@ def edit_address(member_id):
             flash('Address updated successfully!', 'success')
             return redirect(url_for('list_addresses'))
         
-        query = text("""
-            SELECT a.*, u.given_name, u.surname
-            FROM ADDRESS a
-            JOIN MEMBER m ON a.member_user_id = m.member_user_id
-            JOIN "USER" u ON m.member_user_id = u.user_id
-            WHERE a.member_user_id = :member_id
-        """)
-        result = session.execute(query, {'member_id': member_id})
+        result = queries.ADDRESS_BY_MEMBER.execute(session, {'member_id': member_id})
         address = result.fetchone()
         if address:
             return render_template('addresses/edit.html', address=dict(address._mapping))
@@ -528,27 +1225,21 @@ def edit_address(member_id):
     except Exception as e:
         session.rollback()
         flash(f'Error: {str(e)}', 'error')
-    finally:
-        session.close()
     return redirect(url_for('list_addresses'))
 
 
 @app.route('/addresses/<int:member_id>/delete', methods=['POST'])
 def delete_address(member_id):
     """Delete an address"""
-    session = get_db_session()
+    session = get_db()
     try:
-        session.execute(
-            text("DELETE FROM ADDRESS WHERE member_user_id = :member_id"),
-            {'member_id': member_id}
-        )
+        queries.DELETE_ADDRESS.execute(session, {'member_id': member_id})
         session.commit()
+        invalidate_caches('ADDRESS')
         flash('Address deleted successfully!', 'success')
     except Exception as e:
         session.rollback()
         flash(f'Error deleting address: {str(e)}', 'error')
-    finally:
-        session.close()
     return redirect(url_for('list_addresses'))
 
 
@@ -556,94 +1247,70 @@ def delete_address(member_id):
 # JOB CRUD OPERATIONS
 # ============================================================================
 
+def job_list_order():
+    """(sort keys, descending) of the jobs list: by id, or most applicants first with ?sort=popular"""
+    if request.args.get('sort') == 'popular':
+        return JOB_POPULAR_KEYS, True
+    return JOB_KEYS, False
+
+
 @app.route('/jobs')
+@conditional('JOB', 'MEMBER', 'USER')
 def list_jobs():
-    """List all jobs with member information"""
-    session = get_db_session()
-    try:
-        query = text("""
-            SELECT j.*, u.given_name, u.surname
-            FROM JOB j
-            JOIN MEMBER m ON j.member_user_id = m.member_user_id
-            JOIN "USER" u ON m.member_user_id = u.user_id
-            ORDER BY j.job_id
-        """)
-        result = session.execute(query)
-        jobs = [dict(row._mapping) for row in result]
-        return render_template('jobs/list.html', jobs=jobs)
-    finally:
-        session.close()
+    """List all jobs with member information, by id or by ?sort=popular"""
+    keys, descending = job_list_order()
+    if wants_stream():
+        return stream_list('jobs/list.html', 'jobs', queries.JOB_LIST, keys, descending=descending)
+
+    session = get_db()
+    jobs, page = fetch_page(session, queries.JOB_LIST, keys, descending=descending)
+    return render_template('jobs/list.html', jobs=jobs, page=page)
 
 
 @app.route('/jobs/create', methods=['GET', 'POST'])
 def create_job():
     """Create a new job"""
-    session = get_db_session()
+    session = get_db()
     try:
         if request.method == 'POST':
-            query = text("""
-                INSERT INTO JOB (member_user_id, required_caregiving_type, other_requirements, date_posted)
-                VALUES (:member_user_id, :required_caregiving_type, :other_requirements, :date_posted)
-            """)
-            session.execute(query, {
+            queries.INSERT_JOB.execute(session, {
                 'member_user_id': int(request.form['member_user_id']),
                 'required_caregiving_type': request.form['required_caregiving_type'],
                 'other_requirements': request.form.get('other_requirements', ''),
                 'date_posted': request.form.get('date_posted', datetime.now().date())
             })
             session.commit()
+            invalidate_caches('JOB')
             flash('Job created successfully!', 'success')
             return redirect(url_for('list_jobs'))
         
         # Get list of members
-        members_query = text("""
-            SELECT m.member_user_id, u.given_name || ' ' || u.surname AS name
-            FROM MEMBER m
-            JOIN "USER" u ON m.member_user_id = u.user_id
-            ORDER BY m.member_user_id
-        """)
-        members_result = session.execute(members_query)
-        members = [dict(row._mapping) for row in members_result]
+        members = get_picker(session, 'members')
         return render_template('jobs/create.html', members=members)
     except Exception as e:
         session.rollback()
         flash(f'Error: {str(e)}', 'error')
-    finally:
-        session.close()
     return redirect(url_for('list_jobs'))
 
 
 @app.route('/jobs/<int:job_id>/edit', methods=['GET', 'POST'])
 def edit_job(job_id):
     """Edit a job"""
-    session = get_db_session()
+    session = get_db()
     try:
         if request.method == 'POST':
-            query = text("""
-                UPDATE JOB
-                SET required_caregiving_type = :required_caregiving_type,
-                    other_requirements = :other_requirements,
-                    date_posted = :date_posted
-                WHERE job_id = :job_id
-            """)
-            session.execute(query, {
+            queries.UPDATE_JOB.execute(session, {
                 'job_id': job_id,
                 'required_caregiving_type': request.form['required_caregiving_type'],
                 'other_requirements': request.form.get('other_requirements', ''),
                 'date_posted': request.form.get('date_posted')
             })
             session.commit()
+            invalidate_caches('JOB')
             flash('Job updated successfully!', 'success')
             return redirect(url_for('list_jobs'))
         
-        query = text("""
-            SELECT j.*, u.given_name, u.surname
-            FROM JOB j
-            JOIN MEMBER m ON j.member_user_id = m.member_user_id
-            JOIN "USER" u ON m.member_user_id = u.user_id
-            WHERE j.job_id = :job_id
-        """)
-        result = session.execute(query, {'job_id': job_id})
+        result = queries.JOB_BY_ID.execute(session, {'job_id': job_id})
         job = result.fetchone()
         if job:
             job_dict = dict(job._mapping)
@@ -657,27 +1324,21 @@ def edit_job(job_id):
     except Exception as e:
         session.rollback()
         flash(f'Error: {str(e)}', 'error')
-    finally:
-        session.close()
     return redirect(url_for('list_jobs'))
 
 
 @app.route('/jobs/<int:job_id>/delete', methods=['POST'])
 def delete_job(job_id):
     """Delete a job"""
-    session = get_db_session()
+    session = get_db()
     try:
-        session.execute(
-            text("DELETE FROM JOB WHERE job_id = :job_id"),
-            {'job_id': job_id}
-        )
+        queries.DELETE_JOB.execute(session, {'job_id': job_id})
         session.commit()
+        invalidate_caches('JOB')
         flash('Job deleted successfully!', 'success')
     except Exception as e:
         session.rollback()
         flash(f'Error deleting job: {str(e)}', 'error')
-    finally:
-        session.close()
     return redirect(url_for('list_jobs'))
 
 
@@ -685,94 +1346,97 @@ def delete_job(job_id):
 # JOB_APPLICATION CRUD OPERATIONS
 # ============================================================================
 
+CAREGIVING_TYPES = ['babysitter', 'elderly care', 'playmate for children']
+
+
+def caregiving_type(value):
+    if value not in CAREGIVING_TYPES:
+        raise ValueError(value)
+    return value
+
+
+def job_application_filters():
+    """
+    SQL conditions and parameters for the ?job_id=, ?caregiver_id=, ?type=,
+    ?applied_from= and ?applied_to= filters of the job applications list
+    """
+    conditions = []
+    params = {}
+    for arg, condition, parse in [
+        ('job_id', 'job_id = :job_id', int),
+        ('caregiver_id', 'caregiver_user_id = :caregiver_id', int),
+        ('type', 'required_caregiving_type = :type', caregiving_type),
+        ('applied_from', 'date_applied >= :applied_from', date.fromisoformat),
+        ('applied_to', 'date_applied <= :applied_to', date.fromisoformat),
+    ]:
+        value = request.args.get(arg, '').strip()
+        if not value:
+            continue
+        try:
+            params[arg] = parse(value)
+        except ValueError:
+            flash(f'Invalid {arg.replace("_", " ")} filter: {value}', 'error')
+            continue
+        conditions.append(condition)
+    return conditions, params
+
+
 @app.route('/job_applications')
+@conditional('JOB_APPLICATION', 'JOB', 'MEMBER', 'CAREGIVER', 'USER')
 def list_job_applications():
-    """List all job applications"""
-    session = get_db_session()
-    try:
-        query = text("""
-            SELECT ja.*, 
-                   u_caregiver.given_name || ' ' || u_caregiver.surname AS caregiver_name,
-                   u_member.given_name || ' ' || u_member.surname AS member_name,
-                   j.required_caregiving_type
-            FROM JOB_APPLICATION ja
-            JOIN CAREGIVER c ON ja.caregiver_user_id = c.caregiver_user_id
-            JOIN "USER" u_caregiver ON c.caregiver_user_id = u_caregiver.user_id
-            JOIN JOB j ON ja.job_id = j.job_id
-            JOIN MEMBER m ON j.member_user_id = m.member_user_id
-            JOIN "USER" u_member ON m.member_user_id = u_member.user_id
-            ORDER BY ja.job_id, ja.date_applied
-        """)
-        result = session.execute(query)
-        applications = [dict(row._mapping) for row in result]
-        return render_template('job_applications/list.html', applications=applications)
-    finally:
-        session.close()
+    """List job applications from job_applications_view, optionally filtered"""
+    conditions, params = job_application_filters()
+    if wants_stream():
+        return stream_list('job_applications/list.html', 'applications', queries.JOB_APPLICATION_LIST,
+                           JOB_APPLICATION_KEYS, params, conditions)
+
+    session = get_db()
+    applications, page = fetch_page(session, queries.JOB_APPLICATION_LIST, JOB_APPLICATION_KEYS,
+                                    params, conditions)
+    return render_template('job_applications/list.html', applications=applications, page=page)
 
 
 @app.route('/job_applications/create', methods=['GET', 'POST'])
 def create_job_application():
     """Create a new job application"""
-    session = get_db_session()
+    session = get_db()
     try:
         if request.method == 'POST':
-            query = text("""
-                INSERT INTO JOB_APPLICATION (caregiver_user_id, job_id, date_applied)
-                VALUES (:caregiver_user_id, :job_id, :date_applied)
-            """)
-            session.execute(query, {
+            queries.INSERT_JOB_APPLICATION.execute(session, {
                 'caregiver_user_id': int(request.form['caregiver_user_id']),
                 'job_id': int(request.form['job_id']),
                 'date_applied': request.form.get('date_applied', datetime.now().date())
             })
             session.commit()
+            invalidate_caches('JOB_APPLICATION')
             flash('Job application created successfully!', 'success')
             return redirect(url_for('list_job_applications'))
         
-        # Get caregivers and jobs
-        caregivers_query = text("""
-            SELECT c.caregiver_user_id, u.given_name || ' ' || u.surname AS name
-            FROM CAREGIVER c
-            JOIN "USER" u ON c.caregiver_user_id = u.user_id
-            ORDER BY c.caregiver_user_id
-        """)
-        jobs_query = text("SELECT job_id, required_caregiving_type FROM JOB ORDER BY job_id")
-        
-        caregivers_result = session.execute(caregivers_query)
-        jobs_result = session.execute(jobs_query)
+        # Caregivers are picked through the typeahead search API
+        jobs = get_picker(session, 'jobs')
         
-        caregivers = [dict(row._mapping) for row in caregivers_result]
-        jobs = [dict(row._mapping) for row in jobs_result]
-        
-        return render_template('job_applications/create.html', caregivers=caregivers, jobs=jobs)
+        return render_template('job_applications/create.html', jobs=jobs)
     except Exception as e:
         session.rollback()
         flash(f'Error: {str(e)}', 'error')
-    finally:
-        session.close()
     return redirect(url_for('list_job_applications'))
 
 
 @app.route('/job_applications/<int:caregiver_id>/<int:job_id>/delete', methods=['POST'])
 def delete_job_application(caregiver_id, job_id):
     """Delete a job application"""
-    session = get_db_session()
+    session = get_db()
     try:
-        query = text("""
-            DELETE FROM JOB_APPLICATION 
-            WHERE caregiver_user_id = :caregiver_id AND job_id = :job_id
-        """)
-        session.execute(query, {
+        queries.DELETE_JOB_APPLICATION.execute(session, {
             'caregiver_id': caregiver_id,
             'job_id': job_id
         })
         session.commit()
+        invalidate_caches('JOB_APPLICATION')
         flash('Job application deleted successfully!', 'success')
     except Exception as e:
         session.rollback()
         flash(f'Error deleting job application: {str(e)}', 'error')
-    finally:
-        session.close()
     return redirect(url_for('list_job_applications'))
 
 
@@ -781,112 +1445,108 @@ def delete_job_application(caregiver_id, job_id):
 # ============================================================================
 
 @app.route('/appointments')
+@conditional('APPOINTMENT', 'CAREGIVER', 'MEMBER', 'USER')
 def list_appointments():
     """List all appointments"""
-    session = get_db_session()
-    try:
-        query = text("""
-            SELECT a.*,
-                   u_caregiver.given_name || ' ' || u_caregiver.surname AS caregiver_name,
-                   u_member.given_name || ' ' || u_member.surname AS member_name
-            FROM APPOINTMENT a
-            JOIN CAREGIVER c ON a.caregiver_user_id = c.caregiver_user_id
-            JOIN "USER" u_caregiver ON c.caregiver_user_id = u_caregiver.user_id
-            JOIN MEMBER m ON a.member_user_id = m.member_user_id
-            JOIN "USER" u_member ON m.member_user_id = u_member.user_id
-            ORDER BY a.appointment_date, a.appointment_time
-        """)
-        result = session.execute(query)
-        appointments = [dict(row._mapping) for row in result]
-        return render_template('appointments/list.html', appointments=appointments)
-    finally:
-        session.close()
+    if wants_stream():
+        return stream_list('appointments/list.html', 'appointments', queries.APPOINTMENT_LIST, APPOINTMENT_KEYS)
+
+    session = get_db()
+    appointments, page = fetch_page(session, queries.APPOINTMENT_LIST, APPOINTMENT_KEYS)
+    return render_template('appointments/list.html', appointments=appointments, page=page)
+
+
+# SQLSTATE of a row rejected by an exclusion constraint (appointment_no_overlap)
+EXCLUSION_VIOLATION = '23P01'
+
+
+def appointment_form():
+    """Appointment fields posted by the create/edit forms"""
+    return {
+        'caregiver_user_id': int(request.form['caregiver_user_id']),
+        'member_user_id': int(request.form['member_user_id']),
+        'appointment_date': request.form['appointment_date'],
+        'appointment_time': request.form['appointment_time'],
+        'work_hours': float(request.form['work_hours']),
+        'status': request.form['status']
+    }
+
+
+def is_double_booking(error):
+    return getattr(error.orig, 'pgcode', None) == EXCLUSION_VIOLATION
+
+
+def double_booking(session, template_name, appointment):
+    """
+    Show the form again, with the posted values and the appointment that
+    the caregiver already has at that time
+    """
+    clash = queries.APPOINTMENT_CONFLICT.execute(
+        session, {'appointment_id': 0, **appointment}).fetchone()
+    names = queries.APPOINTMENT_PARTY_NAMES.execute(session, appointment).fetchone()
+    session.rollback()
+    appointment = dict(appointment, caregiver_name=names.caregiver_name, member_name=names.member_name)
+    if clash:
+        flash(f'{names.caregiver_name} is already booked at that time: appointment #{clash.appointment_id} '
+              f'({clash.status}) with {clash.member_name} on {clash.appointment_date} at '
+              f'{clash.appointment_time.strftime("%H:%M")} for {clash.work_hours} hours', 'error')
+    else:
+        flash(f'{names.caregiver_name} already has an appointment at that time', 'error')
+    return render_template(template_name, appointment=appointment), 409
 
 
 @app.route('/appointments/create', methods=['GET', 'POST'])
 def create_appointment():
     """Create a new appointment"""
-    session = get_db_session()
+    session = get_db()
     try:
         if request.method == 'POST':
-            query = text("""
-                INSERT INTO APPOINTMENT (caregiver_user_id, member_user_id, appointment_date, 
-                                        appointment_time, work_hours, status)
-                VALUES (:caregiver_user_id, :member_user_id, :appointment_date,
-                        :appointment_time, :work_hours, :status)
-            """)
-            session.execute(query, {
-                'caregiver_user_id': int(request.form['caregiver_user_id']),
-                'member_user_id': int(request.form['member_user_id']),
-                'appointment_date': request.form['appointment_date'],
-                'appointment_time': request.form['appointment_time'],
-                'work_hours': float(request.form['work_hours']),
-                'status': request.form['status']
-            })
-            session.commit()
+            appointment = appointment_form()
+            try:
+                queries.INSERT_APPOINTMENT.execute(session, appointment)
+                session.commit()
+            except IntegrityError as e:
+                if not is_double_booking(e):
+                    raise
+                session.rollback()
+                return double_booking(session, 'appointments/create.html', appointment)
+            invalidate_caches('APPOINTMENT')
+            refresh_matches(session, appointment['caregiver_user_id'])
             flash('Appointment created successfully!', 'success')
             return redirect(url_for('list_appointments'))
         
-        # Get caregivers and members
-        caregivers_query = text("""
-            SELECT c.caregiver_user_id, u.given_name || ' ' || u.surname AS name
-            FROM CAREGIVER c
-            JOIN "USER" u ON c.caregiver_user_id = u.user_id
-            ORDER BY c.caregiver_user_id
-        """)
-        members_query = text("""
-            SELECT m.member_user_id, u.given_name || ' ' || u.surname AS name
-            FROM MEMBER m
-            JOIN "USER" u ON m.member_user_id = u.user_id
-            ORDER BY m.member_user_id
-        """)
-        
-        caregivers_result = session.execute(caregivers_query)
-        members_result = session.execute(members_query)
-        
-        caregivers = [dict(row._mapping) for row in caregivers_result]
-        members = [dict(row._mapping) for row in members_result]
-        
-        return render_template('appointments/create.html', caregivers=caregivers, members=members)
+        # Caregivers and members are picked through the typeahead search API
+        return render_template('appointments/create.html', appointment={})
     except Exception as e:
         session.rollback()
         flash(f'Error: {str(e)}', 'error')
-    finally:
-        session.close()
     return redirect(url_for('list_appointments'))
 
 
 @app.route('/appointments/<int:appointment_id>/edit', methods=['GET', 'POST'])
 def edit_appointment(appointment_id):
     """Edit an appointment"""
-    session = get_db_session()
+    session = get_db()
     try:
         if request.method == 'POST':
-            query = text("""
-                UPDATE APPOINTMENT
-                SET caregiver_user_id = :caregiver_user_id,
-                    member_user_id = :member_user_id,
-                    appointment_date = :appointment_date,
-                    appointment_time = :appointment_time,
-                    work_hours = :work_hours,
-                    status = :status
-                WHERE appointment_id = :appointment_id
-            """)
-            session.execute(query, {
-                'appointment_id': appointment_id,
-                'caregiver_user_id': int(request.form['caregiver_user_id']),
-                'member_user_id': int(request.form['member_user_id']),
-                'appointment_date': request.form['appointment_date'],
-                'appointment_time': request.form['appointment_time'],
-                'work_hours': float(request.form['work_hours']),
-                'status': request.form['status']
-            })
-            session.commit()
+            appointment = dict(appointment_form(), appointment_id=appointment_id)
+            # The old caregiver loses the appointment's confirmed hours
+            previous_caregiver = queries.APPOINTMENT_CAREGIVER.execute(
+                session, {'appointment_id': appointment_id}).scalar()
+            try:
+                queries.UPDATE_APPOINTMENT.execute(session, appointment)
+                session.commit()
+            except IntegrityError as e:
+                if not is_double_booking(e):
+                    raise
+                session.rollback()
+                return double_booking(session, 'appointments/edit.html', appointment)
+            invalidate_caches('APPOINTMENT')
+            refresh_matches(session, previous_caregiver, appointment['caregiver_user_id'])
             flash('Appointment updated successfully!', 'success')
             return redirect(url_for('list_appointments'))
         
-        query = text("SELECT * FROM APPOINTMENT WHERE appointment_id = :appointment_id")
-        result = session.execute(query, {'appointment_id': appointment_id})
+        result = queries.APPOINTMENT_BY_ID.execute(session, {'appointment_id': appointment_id})
         appointment = result.fetchone()
         
         if appointment:
@@ -897,60 +1557,107 @@ def edit_appointment(appointment_id):
             if appointment_dict.get('appointment_time'):
                 appointment_dict['appointment_time'] = str(appointment_dict['appointment_time'])
             
-            # Get caregivers and members for dropdowns
-            caregivers_query = text("""
-                SELECT c.caregiver_user_id, u.given_name || ' ' || u.surname AS name
-                FROM CAREGIVER c
-                JOIN "USER" u ON c.caregiver_user_id = u.user_id
-                ORDER BY c.caregiver_user_id
-            """)
-            members_query = text("""
-                SELECT m.member_user_id, u.given_name || ' ' || u.surname AS name
-                FROM MEMBER m
-                JOIN "USER" u ON m.member_user_id = u.user_id
-                ORDER BY m.member_user_id
-            """)
-            
-            caregivers_result = session.execute(caregivers_query)
-            members_result = session.execute(members_query)
-            
-            caregivers = [dict(row._mapping) for row in caregivers_result]
-            members = [dict(row._mapping) for row in members_result]
-            
-            return render_template('appointments/edit.html', 
-                                 appointment=appointment_dict,
-                                 caregivers=caregivers,
-                                 members=members)
+            return render_template('appointments/edit.html', appointment=appointment_dict)
         else:
             flash('Appointment not found', 'error')
             return redirect(url_for('list_appointments'))
     except Exception as e:
         session.rollback()
         flash(f'Error: {str(e)}', 'error')
-    finally:
-        session.close()
     return redirect(url_for('list_appointments'))
 
 
 @app.route('/appointments/<int:appointment_id>/delete', methods=['POST'])
 def delete_appointment(appointment_id):
     """Delete an appointment"""
-    session = get_db_session()
+    session = get_db()
     try:
-        session.execute(
-            text("DELETE FROM APPOINTMENT WHERE appointment_id = :appointment_id"),
-            {'appointment_id': appointment_id}
-        )
+        caregiver_id = queries.APPOINTMENT_CAREGIVER.execute(session, {'appointment_id': appointment_id}).scalar()
+        queries.DELETE_APPOINTMENT.execute(session, {'appointment_id': appointment_id})
         session.commit()
+        invalidate_caches('APPOINTMENT')
+        refresh_matches(session, caregiver_id)
         flash('Appointment deleted successfully!', 'success')
     except Exception as e:
         session.rollback()
         flash(f'Error deleting appointment: {str(e)}', 'error')
-    finally:
-        session.close()
     return redirect(url_for('list_appointments'))
 
 
+# ============================================================================
+# DATA EXPORT
+# ============================================================================
+
+# Exportable tables: URL name -> (list query, sort keys)
+EXPORTS = {
+    'users': (queries.USER_LIST, USER_KEYS),
+    'caregivers': (queries.CAREGIVER_LIST, CAREGIVER_KEYS),
+    'members': (queries.MEMBER_LIST, MEMBER_KEYS),
+    'addresses': (queries.ADDRESS_LIST, ADDRESS_KEYS),
+    'jobs': (queries.JOB_LIST, JOB_KEYS),
+    'job_applications': (queries.JOB_APPLICATION_LIST, JOB_APPLICATION_KEYS),
+    'appointments': (queries.APPOINTMENT_LIST, APPOINTMENT_KEYS),
+}
+
+
+def export_csv(result):
+    """Yield a query result as CSV text in chunks of about STREAM_BUFFER_BYTES"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(result.keys())
+    for row in result:
+        writer.writerow(row)
+        if buffer.tell() >= STREAM_BUFFER_BYTES:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+
+def export_ndjson(result):
+    """Yield a query result as newline-delimited JSON in chunks"""
+    buffer = []
+    size = 0
+    for row in result:
+        line = json.dumps(dict(row._mapping), default=str) + '\n'
+        buffer.append(line)
+        size += len(line)
+        if size >= STREAM_BUFFER_BYTES:
+            yield ''.join(buffer)
+            buffer = []
+            size = 0
+    if buffer:
+        yield ''.join(buffer)
+
+
+@app.route('/export/<table>.<any(csv, ndjson):fmt>')
+def export_table(table, fmt):
+    """
+    Stream a full table dump as CSV or NDJSON.
+
+    Uses the same query as the table's list page, read from a server-side
+    cursor and sent with chunked transfer encoding.
+    """
+    if table not in EXPORTS:
+        abort(404)
+    base_query, keys = EXPORTS[table]
+    writer = export_csv if fmt == 'csv' else export_ndjson
+
+    def generate():
+        session = get_db_session()
+        try:
+            yield from writer(execute_streaming(session, base_query, keys))
+        finally:
+            session.close()
+
+    mimetype = 'text/csv' if fmt == 'csv' else 'application/x-ndjson'
+    return Response(
+        stream_with_context(generate()),
+        mimetype=mimetype,
+        headers={'Content-Disposition': f'attachment; filename={table}.{fmt}'}
+    )
+
+
 if __name__ == '__main__':
     app.run(debug=True, host='0.0.0.0', port=5001)
 
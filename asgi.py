@@ -0,0 +1,240 @@
+"""
+ASGI entry point for the caregiver platform web application
+
+The read-heavy routes (the list pages and the typeahead search API) run as
+coroutines on an asyncpg engine, so a single process can keep hundreds of
+requests waiting on the database at once instead of one per sync worker.
+URL routing, SQL (queries.py), templates, pagination and flash messages
+are all shared with app.py. Every other route, and list pages requested
+with ?stream=1, fall through to the Flask WSGI app on a thread pool.
+
+With DB_REPLICA_HOSTS set, the async views read from asyncpg engines on
+the replicas, picked by app.py's ReplicaSet (round-robin, health and lag)
+and skipped for clients holding the read-your-writes cookie, exactly as
+the Flask routes do.
+
+List pages that app.py marks @conditional get the same ETag and
+Last-Modified headers and 304 answers here: one async TABLE_VERSIONS
+query runs before the page query and, when the client's copy is current,
+instead of it.
+
+Install the extra packages and run with:
+    pip install -r requirements-async.txt
+    uvicorn asgi:application --port 5001
+or under gunicorn:
+    gunicorn asgi:application -k uvicorn.workers.UvicornWorker
+
+Environment:
+    ASGI_WSGI_THREADS  threads for the routes served by Flask (default 10)
+"""
+
+import asyncio
+import io
+import os
+
+from a2wsgi import WSGIMiddleware
+from flask import Response, render_template, jsonify, request, g, session as cookie_session
+from werkzeug.exceptions import HTTPException
+from werkzeug.wrappers import Request
+
+import queries
+from app import (app, engine, replicas, page_query, finish_page, typeahead_query,
+                 version_stamp, not_modified, with_validators,
+                 job_list_order, job_application_filters,
+                 USER_KEYS, CAREGIVER_KEYS, MEMBER_KEYS, ADDRESS_KEYS,
+                 JOB_APPLICATION_KEYS, APPOINTMENT_KEYS, READ_YOUR_WRITES_COOKIE)
+from db import create_async_db_engine, create_async_replica_engines
+
+WSGI_THREADS = int(os.getenv('ASGI_WSGI_THREADS', '10'))
+
+async_engine = create_async_db_engine()
+async_replica_engines = create_async_replica_engines(replicas)
+wsgi_application = WSGIMiddleware(app, workers=WSGI_THREADS)
+
+
+# ============================================================================
+# ASYNC VIEWS
+# ============================================================================
+
+async def read_engine():
+    """Async counterpart of request_engine() in app.py: one engine per request"""
+    if 'async_read_engine' not in g:
+        chosen = engine
+        if replicas and READ_YOUR_WRITES_COOKIE not in request.cookies:
+            # A health check that is due connects to the replica, so it
+            # runs on a thread instead of blocking the event loop
+            chosen = await asyncio.to_thread(replicas.engine_for_read)
+        g.async_read_engine = async_replica_engines.get(chosen, async_engine)
+    return g.async_read_engine
+
+
+async def list_view(template_name, items_name, base_query, keys, params=None, conditions=None, descending=False):
+    """Async counterpart of the list routes in app.py"""
+    query, params, position = page_query(base_query, keys, params, conditions, descending)
+    async with (await read_engine()).connect() as connection:
+        result = await query.execute_async(connection, params)
+        items, page = finish_page(result, keys, position)
+    return render_template(template_name, **{items_name: items}, page=page)
+
+
+async def jobs_view():
+    """Async counterpart of list_jobs() in app.py"""
+    keys, descending = job_list_order()
+    return await list_view('jobs/list.html', 'jobs', queries.JOB_LIST, keys, descending=descending)
+
+
+async def job_applications_view():
+    """Async counterpart of list_job_applications() in app.py"""
+    conditions, params = job_application_filters()
+    return await list_view('job_applications/list.html', 'applications', queries.JOB_APPLICATION_LIST,
+                           JOB_APPLICATION_KEYS, params, conditions)
+
+
+async def search_view(prefix_query, contains_query):
+    """Async counterpart of search_people() in app.py"""
+    query, params = typeahead_query(prefix_query, contains_query)
+    if query is None:
+        return jsonify([])
+    async with (await read_engine()).connect() as connection:
+        result = await query.execute_async(connection, params)
+        return jsonify([dict(row._mapping) for row in result])
+
+
+# Flask endpoint -> (async view, arguments). List pages requested with
+# ?stream=1 are left to Flask (wants_stream() in app.py), which streams them
+# from a server-side cursor.
+ASYNC_VIEWS = {
+    'list_users': (list_view, ('users/list.html', 'users', queries.USER_LIST, USER_KEYS)),
+    'list_caregivers': (list_view, ('caregivers/list.html', 'caregivers', queries.CAREGIVER_LIST, CAREGIVER_KEYS)),
+    'list_members': (list_view, ('members/list.html', 'members', queries.MEMBER_LIST, MEMBER_KEYS)),
+    'list_addresses': (list_view, ('addresses/list.html', 'addresses', queries.ADDRESS_LIST, ADDRESS_KEYS)),
+    'list_jobs': (jobs_view, ()),
+    'list_job_applications': (job_applications_view, ()),
+    'list_appointments': (list_view, ('appointments/list.html', 'appointments',
+                                      queries.APPOINTMENT_LIST, APPOINTMENT_KEYS)),
+    'search_caregivers': (search_view, (queries.CAREGIVER_NAME_PREFIX, queries.CAREGIVER_NAME_CONTAINS)),
+    'search_members': (search_view, (queries.MEMBER_NAME_PREFIX, queries.MEMBER_NAME_CONTAINS)),
+}
+
+
+# ============================================================================
+# ASGI APPLICATION
+# ============================================================================
+
+def build_environ(scope):
+    """Minimal WSGI environ for a body-less ASGI request, so Flask's request
+    context, url_for() and session cookies work inside the async views"""
+    server_name, server_port = scope.get('server') or ('localhost', 80)
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': scope.get('root_path', '').encode('utf-8').decode('latin-1'),
+        'PATH_INFO': scope['path'].encode('utf-8').decode('latin-1'),
+        'QUERY_STRING': scope['query_string'].decode('latin-1'),
+        'SERVER_NAME': server_name,
+        'SERVER_PORT': str(server_port),
+        'SERVER_PROTOCOL': f"HTTP/{scope.get('http_version', '1.1')}",
+        'REMOTE_ADDR': (scope.get('client') or ('', 0))[0],
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': io.BytesIO(),
+        'wsgi.errors': io.StringIO(),
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': True,
+        'wsgi.run_once': False,
+    }
+    for name, value in scope['headers']:
+        key = name.decode('latin-1').upper().replace('-', '_')
+        if key not in ('CONTENT_TYPE', 'CONTENT_LENGTH'):
+            key = 'HTTP_' + key
+        value = value.decode('latin-1')
+        environ[key] = f'{environ[key]},{value}' if key in environ else value
+    return environ
+
+
+def match_async_view(environ):
+    """The async view and arguments for this request, or None for Flask"""
+    if environ['REQUEST_METHOD'] not in ('GET', 'HEAD'):
+        return None
+    try:
+        endpoint, view_args = app.url_map.bind_to_environ(environ).match()
+    except HTTPException:
+        return None
+    if endpoint not in ASYNC_VIEWS:
+        return None
+    view, args = ASYNC_VIEWS[endpoint]
+    if view is not search_view and Request(environ).args.get('stream') == '1':
+        return None
+    tables = getattr(app.view_functions[endpoint], 'conditional_tables', None)
+    return view, args, view_args, tables
+
+
+async def conditional_view(tables, view, args, view_args):
+    """Async counterpart of the conditional() wrapper in app.py"""
+    # A message waiting from the previous request goes on this page
+    if not tables or '_flashes' in cookie_session:
+        return await view(*args, **view_args)
+    async with (await read_engine()).connect() as connection:
+        result = await queries.TABLE_VERSIONS.execute_async(connection, {'tables': sorted(tables)})
+        versions = version_stamp(result.fetchall(), tables)
+    if versions is None:
+        return await view(*args, **view_args)
+    if not_modified(*versions):
+        return with_validators(Response(status=304), versions)
+    response = app.make_response(await view(*args, **view_args))
+    if response.status_code != 200 or g.get('flashed'):
+        return response
+    return with_validators(response, versions)
+
+
+async def dispatch(environ, view, args, view_args, tables):
+    """Run an async view the way Flask.full_dispatch_request() runs a sync one"""
+    with app.request_context(environ):
+        try:
+            try:
+                rv = app.preprocess_request()
+                if rv is None:
+                    rv = await conditional_view(tables, view, args, view_args)
+            except Exception as e:
+                rv = app.handle_user_exception(e)
+            return app.finalize_request(rv)
+        except Exception as e:
+            return app.handle_exception(e)
+
+
+async def send_response(response, send, head=False):
+    """Send a (non-streaming) Flask response over ASGI"""
+    body = response.get_data()
+    headers = [(name.lower().encode('latin-1'), value.encode('latin-1'))
+               for name, value in response.headers.items()]
+    await send({'type': 'http.response.start', 'status': response.status_code, 'headers': headers})
+    await send({'type': 'http.response.body', 'body': b'' if head else body})
+
+
+async def lifespan(receive, send):
+    """Dispose of both connection pools on shutdown"""
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            await async_engine.dispose()
+            for replica_engine in async_replica_engines.values():
+                await replica_engine.dispose()
+            engine.dispose()
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+
+async def application(scope, receive, send):
+    """ASGI callable: async views for the read routes, Flask for the rest"""
+    if scope['type'] == 'lifespan':
+        return await lifespan(receive, send)
+
+    if scope['type'] == 'http':
+        environ = build_environ(scope)
+        match = match_async_view(environ)
+        if match is not None:
+            response = await dispatch(environ, *match)
+            return await send_response(response, send, head=scope['method'] == 'HEAD')
+
+    return await wsgi_application(scope, receive, send)
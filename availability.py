@@ -0,0 +1,47 @@
+"""
+Free-slot computation for the caregiver availability endpoints
+
+A caregiver is free during the working hours of each day (day_windows())
+except while one of their appointments runs. free_slots() subtracts the
+busy intervals, sorted by start as the availability query returns them,
+from the windows in a single merge pass; overlapping or touching busy
+intervals are merged on the way.
+"""
+
+from datetime import datetime, timedelta
+
+
+def day_windows(first_day, last_day, day_start, day_end):
+    """(start, end) of the working hours of every day from first_day to last_day"""
+    windows = []
+    day = first_day
+    while day <= last_day:
+        windows.append((datetime.combine(day, day_start), datetime.combine(day, day_end)))
+        day += timedelta(days=1)
+    return windows
+
+
+def free_slots(busy, windows):
+    """
+    The parts of the windows not covered by a busy interval.
+
+    Both lists hold (start, end) pairs sorted by start; the windows must not
+    overlap. An interval running past the end of one window (an overnight
+    appointment) is carried over to the next.
+    """
+    slots = []
+    first = 0
+    for start, end in windows:
+        cursor = start
+        while first < len(busy) and busy[first][1] <= cursor:
+            first += 1
+        index = first
+        while index < len(busy) and busy[index][0] < end:
+            busy_start, busy_end = busy[index]
+            if busy_start > cursor:
+                slots.append((cursor, busy_start))
+            cursor = max(cursor, busy_end)
+            index += 1
+        if cursor < end:
+            slots.append((cursor, end))
+    return slots
@@ -0,0 +1,69 @@
+"""
+Compare the sync (gunicorn app:app) and async (asgi:application) serving modes
+
+Starts each server in turn with the same number of processes, drives the
+same read endpoints at increasing concurrency with loadgen.py and prints
+requests/second and latency percentiles side by side. Both servers use the
+DB_* settings from the environment, so point them at a database with
+realistic data (see generate_data.py / sample_data.sql) first.
+
+    pip install -r requirements-async.txt
+    python benchmarks/compare_serving_modes.py --workers 2 -c 10 50 200
+"""
+
+import argparse
+import asyncio
+import json
+import sys
+from pathlib import Path
+
+from loadgen import run_load
+from servers import running_server
+
+DEFAULT_PATHS = ['/users', '/jobs', '/appointments', '/api/members/search?q=an']
+
+
+def benchmark_mode(mode, args):
+    """Start the server for one mode and run every path/concurrency pair"""
+    results = []
+    with running_server(mode, args.port, args.workers, args.threads) as base_url:
+        for path in args.paths:
+            # Warm up pools, template caches and prepared plans
+            asyncio.run(run_load(base_url + path, min(args.concurrency), 1.0))
+            for concurrency in args.concurrency:
+                result = asyncio.run(run_load(base_url + path, concurrency, args.duration))
+                result.update({'mode': mode, 'path': path})
+                results.append(result)
+                print(f"{mode:<6} {path:<32} c={concurrency:<5} {result['rps']:>9.1f} "
+                      f"{result['p50_ms']!s:>9} {result['p95_ms']!s:>9} {result['p99_ms']!s:>9} "
+                      f"{sum(result['errors'].values()):>7}")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare sync and async serving modes')
+    parser.add_argument('--modes', nargs='+', choices=['sync', 'async'], default=['sync', 'async'])
+    parser.add_argument('--paths', nargs='+', default=DEFAULT_PATHS)
+    parser.add_argument('-c', '--concurrency', nargs='+', type=int, default=[10, 50, 200])
+    parser.add_argument('-d', '--duration', type=float, default=10.0)
+    parser.add_argument('--workers', type=int, default=2, help='server processes for both modes')
+    parser.add_argument('--threads', type=int, default=1, help='threads per sync worker')
+    parser.add_argument('--port', type=int, default=5099)
+    parser.add_argument('--json', help='also write the raw results to this file')
+    args = parser.parse_args()
+
+    print(f"{'Mode':<6} {'Path':<32} {'Clients':<7} {'Req/s':>9} {'p50 ms':>9} "
+          f"{'p95 ms':>9} {'p99 ms':>9} {'Errors':>7}")
+    print('-' * 96)
+    results = []
+    for mode in args.modes:
+        results.extend(benchmark_mode(mode, args))
+
+    if args.json:
+        Path(args.json).write_text(json.dumps(results, indent=2), encoding='utf-8')
+        print(f'\nResults written to {args.json}')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
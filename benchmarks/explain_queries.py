@@ -0,0 +1,225 @@
+"""
+EXPLAIN ANALYZE regression harness for the report queries of main.py
+
+Runs the simple queries (5.1-5.4), complex queries (6.1-6.4), derived
+query 7 and job_applications_view with EXPLAIN (ANALYZE, BUFFERS, FORMAT
+JSON) and records, per query: the plan shape, every scan and the table it
+reads, estimated vs actual rows, buffers and planning/execution time.
+
+Results can be saved as a JSON baseline. Compared against a baseline, a
+query fails when
+  - its plan gained a Seq Scan on a table it used to reach another way,
+  - it does a Seq Scan on a table named with --forbid-seq-scan, or
+  - its median execution time grew by more than --tolerance percent
+    (and by more than --min-delta-ms, so tiny queries don't flap).
+Plan shape changes and worse row estimates are reported as warnings. The
+script exits with status 1 if any query failed.
+
+    python benchmarks/explain_queries.py --seed-users 200000 --save-baseline benchmarks/plans.json
+    ... add an index, change a query ...
+    python benchmarks/explain_queries.py --baseline benchmarks/plans.json
+
+--seed-users drops and refills the database with generate_data.py, so only
+use it against a local or scratch database.
+"""
+
+import argparse
+import json
+import statistics
+import sys
+from datetime import datetime
+from pathlib import Path
+
+from sqlalchemy import text
+
+from servers import ROOT
+
+sys.path.insert(0, str(ROOT))
+import queries  # noqa: E402
+from db import create_db_engine  # noqa: E402
+
+REPORT_QUERIES = [
+    queries.QUERY_5_1, queries.QUERY_5_2, queries.QUERY_5_3, queries.QUERY_5_4,
+    queries.QUERY_6_1, queries.QUERY_6_2, queries.QUERY_6_3, queries.QUERY_6_4,
+    queries.QUERY_7, queries.JOB_APPLICATIONS_VIEW,
+]
+
+SCAN_NODES = ('Seq Scan', 'Index Scan', 'Index Only Scan', 'Bitmap Heap Scan')
+
+
+def walk(plan, depth=0):
+    """Yield (depth, node) for every node of a JSON plan tree"""
+    yield depth, plan
+    for child in plan.get('Plans', []):
+        yield from walk(child, depth + 1)
+
+
+def node_label(node):
+    label = node['Node Type']
+    if node.get('Relation Name'):
+        label += f" on {node['Relation Name'].upper()}"
+    if node.get('Index Name'):
+        label += f" using {node['Index Name']}"
+    return label
+
+
+def misestimate(node):
+    """How far the planner's row estimate was off, as a factor >= 1"""
+    if not node.get('Actual Loops'):
+        return 1.0                      # never executed
+    estimated = max(node['Plan Rows'], 1)
+    actual = max(node['Actual Rows'], 1)
+    return max(estimated / actual, actual / estimated)
+
+
+def summarize(explain):
+    """The parts of one EXPLAIN (ANALYZE, FORMAT JSON) result worth comparing"""
+    plan = explain['Plan']
+    nodes = list(walk(plan))
+    worst = max(nodes, key=lambda item: misestimate(item[1]))[1]
+    return {
+        'shape': ['  ' * depth + node_label(node) for depth, node in nodes],
+        'scans': sorted({(node['Node Type'], node['Relation Name'].upper())
+                         for _, node in nodes if node['Node Type'] in SCAN_NODES}),
+        'seq_scans': sorted({node['Relation Name'].upper()
+                             for _, node in nodes if node['Node Type'] == 'Seq Scan'}),
+        'estimated_rows': plan.get('Plan Rows'),
+        'actual_rows': plan.get('Actual Rows'),
+        'worst_misestimate': {'node': node_label(worst), 'factor': round(misestimate(worst), 1)},
+        'shared_hit_blocks': plan.get('Shared Hit Blocks'),
+        'shared_read_blocks': plan.get('Shared Read Blocks'),
+        'planning_ms': round(explain.get('Planning Time', 0.0), 3),
+        'execution_ms': round(explain.get('Execution Time', 0.0), 3),
+    }
+
+
+def explain_query(connection, query, repeat):
+    """EXPLAIN ANALYZE a registered query repeat times; keeps the plan of the
+    median run"""
+    sql = query.sql.strip().rstrip(';')
+    runs = []
+    for _ in range(repeat):
+        result = connection.execute(text(f'EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) {sql}')).scalar()
+        runs.append(summarize(result[0] if isinstance(result, list) else json.loads(result)[0]))
+    runs.sort(key=lambda run: run['execution_ms'])
+    summary = runs[len(runs) // 2]
+    summary['execution_runs_ms'] = [run['execution_ms'] for run in runs]
+    summary['median_execution_ms'] = round(statistics.median(summary['execution_runs_ms']), 3)
+    return summary
+
+
+def table_sizes(connection):
+    rows = connection.execute(text("""
+        SELECT upper(relname), n_live_tup FROM pg_stat_user_tables ORDER BY relname
+    """)).fetchall()
+    return {name: count for name, count in rows}
+
+
+def compare(plans, baseline, args):
+    """(failures, warnings) of plans against a baseline"""
+    failures, warnings = [], []
+    forbidden = {table.upper() for table in args.forbid_seq_scan}
+    for name, plan in plans.items():
+        for table in sorted(forbidden & set(plan['seq_scans'])):
+            failures.append(f'{name}: Seq Scan on {table}')
+
+        old = baseline['plans'].get(name)
+        if old is None:
+            continue
+        for table in sorted(set(plan['seq_scans']) - set(old['seq_scans']) - forbidden):
+            failures.append(f'{name}: new Seq Scan on {table}')
+
+        before, after = old['median_execution_ms'], plan['median_execution_ms']
+        if after > before * (1 + args.tolerance / 100) and after - before > args.min_delta_ms:
+            failures.append(f'{name}: execution {before} ms -> {after} ms')
+
+        if plan['shape'] != old['shape']:
+            warnings.append(f'{name}: plan shape changed\n' + '\n'.join(
+                f'      {line}' for line in plan['shape']))
+        old_factor = old['worst_misestimate']['factor']
+        new_factor = plan['worst_misestimate']['factor']
+        if new_factor > max(old_factor * 10, 10):
+            warnings.append(f"{name}: row estimate off by {new_factor}x at "
+                            f"{plan['worst_misestimate']['node']} (was {old_factor}x)")
+    return failures, warnings
+
+
+def seed(users):
+    """Recreate the database with a generate_data.py dataset of users users"""
+    from bulk_load import create_load_engine
+    from db import DATABASE_URL
+    from generate_data import DataGenerator, generate
+
+    engine = create_load_engine(DATABASE_URL)
+    try:
+        generate(engine, DataGenerator(users), ROOT / 'schema.sql')
+    finally:
+        engine.dispose()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='EXPLAIN ANALYZE regression check for the report queries')
+    parser.add_argument('--seed-users', type=int, metavar='N',
+                        help='first refill the database with generate_data.py (N users)')
+    parser.add_argument('--repeat', type=int, default=3, help='runs per query; the median is kept')
+    parser.add_argument('--save-baseline', metavar='FILE', help='write the plans to FILE')
+    parser.add_argument('--baseline', metavar='FILE', help='compare the plans with FILE')
+    parser.add_argument('--tolerance', type=float, default=50.0,
+                        help='percent slowdown that counts as a regression (default 50)')
+    parser.add_argument('--min-delta-ms', type=float, default=5.0,
+                        help='ignore slowdowns smaller than this (default 5 ms)')
+    parser.add_argument('--forbid-seq-scan', nargs='*', default=[], metavar='TABLE',
+                        help='fail on any Seq Scan of these tables, e.g. APPOINTMENT')
+    args = parser.parse_args()
+
+    if args.seed_users:
+        seed(args.seed_users)
+
+    engine = create_db_engine(pool_size=1, max_overflow=0)
+    plans = {}
+    try:
+        with engine.connect() as conn:
+            queries.CREATE_JOB_APPLICATIONS_VIEW.execute(conn)
+            conn.commit()
+            sizes = table_sizes(conn)
+            print(f"{'Query':<24} {'Rows':>9} {'Plan ms':>9} {'Exec ms':>10} {'Misest.':>8}  Seq scans")
+            print('-' * 90)
+            for query in REPORT_QUERIES:
+                plan = plans[query.name] = explain_query(conn, query, args.repeat)
+                print(f"{query.name:<24} {plan['actual_rows']!s:>9} {plan['planning_ms']:>9.2f} "
+                      f"{plan['median_execution_ms']:>10.2f} {plan['worst_misestimate']['factor']:>7}x  "
+                      f"{', '.join(plan['seq_scans']) or '-'}")
+            # EXPLAIN ANALYZE executes the statements; leave nothing behind
+            conn.rollback()
+    finally:
+        engine.dispose()
+
+    report = {
+        'created': datetime.now().isoformat(timespec='seconds'),
+        'table_sizes': sizes,
+        'plans': plans,
+    }
+    if args.save_baseline:
+        Path(args.save_baseline).write_text(json.dumps(report, indent=2), encoding='utf-8')
+        print(f'\nBaseline written to {args.save_baseline}')
+
+    failures = []
+    if args.baseline or args.forbid_seq_scan:
+        baseline = (json.loads(Path(args.baseline).read_text(encoding='utf-8'))
+                    if args.baseline else {'plans': {}, 'table_sizes': {}})
+        resized = [table for table, rows in sizes.items()
+                   if abs(rows - baseline['table_sizes'].get(table, rows)) > 0.1 * max(rows, 1)]
+        if resized:
+            print(f"\nNote: {', '.join(resized)} differ in size from the baseline by more than 10%")
+        failures, warnings = compare(plans, baseline, args)
+        for warning in warnings:
+            print(f'  WARNING {warning}')
+        for failure in failures:
+            print(f'  REGRESSION {failure}')
+        if not failures:
+            print('\n  No plan regressions')
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,351 @@
+"""
+HTTP load benchmark for every route of app.py
+
+Starts the app under gunicorn (or uses --url), then drives each list,
+view, create, edit and delete route at fixed concurrency levels with
+loadgen.py and reports requests/second and p50/p95/p99 latency per route.
+Results can be saved as a JSON baseline; a later run compared against it
+flags routes whose throughput dropped or whose p95 grew by more than
+--threshold percent, and exits with status 1.
+
+Write routes really write: run this against a scratch database filled by
+generate_data.py. Rows created by the benchmark are the ones it edits and
+deletes again, except for caregivers, members and addresses: their edit
+routes post the sampled rows' current values back, so repeated runs leave
+the data as generate_data.py made it. Delete routes stop early once the rows created by this
+run are used up.
+
+    python generate_data.py --users 100000
+    python benchmarks/http_bench.py --save-baseline benchmarks/baseline.json
+    ... change something ...
+    python benchmarks/http_bench.py --baseline benchmarks/baseline.json
+"""
+
+import argparse
+import asyncio
+import itertools
+import json
+import random
+import re
+import subprocess
+import sys
+import time
+from datetime import date, datetime, timedelta
+from pathlib import Path
+
+from sqlalchemy import text
+
+from loadgen import run_load
+from servers import ROOT, running_server
+
+sys.path.insert(0, str(ROOT))
+from db import create_db_engine  # noqa: E402
+
+# Date given to benchmark job applications so they can be found and deleted
+BENCH_APPLICATION_DATE = '1999-12-31'
+
+ID_POOL_SIZE = 2000
+
+
+class IdPools:
+    """Existing ids to request, sampled from the database"""
+
+    def __init__(self, engine):
+        self.engine = engine
+        self.pools = {}
+        self.current = {}
+        self.rng = random.Random(341)
+        self.counter = itertools.count(1)
+        self.run_id = datetime.now().strftime('%Y%m%d%H%M%S')
+
+    def load(self, name, sql, params=None):
+        with self.engine.connect() as conn:
+            rows = conn.execute(text(sql), params or {}).fetchall()
+        self.pools[name] = [row[0] if len(row) == 1 else tuple(row) for row in rows]
+        self.rng.shuffle(self.pools[name])
+
+    def load_existing(self):
+        sample = f'ORDER BY random() LIMIT {ID_POOL_SIZE}'
+        self.load('users', f'SELECT user_id FROM "USER" {sample}')
+        self.load('caregivers', f'SELECT caregiver_user_id FROM CAREGIVER {sample}')
+        self.load('members', f'SELECT member_user_id FROM MEMBER {sample}')
+        self.load('addresses', f'SELECT member_user_id FROM ADDRESS {sample}')
+        self.load('jobs', f'SELECT job_id FROM JOB {sample}')
+        self.load('appointments', f'SELECT appointment_id FROM APPOINTMENT {sample}')
+        self.load_current('caregivers', 'SELECT caregiver_user_id, photo, gender, caregiving_type, hourly_rate '
+                          'FROM CAREGIVER WHERE caregiver_user_id = ANY(:ids)')
+        self.load_current('members', 'SELECT member_user_id, house_rules, dependent_description '
+                          'FROM MEMBER WHERE member_user_id = ANY(:ids)')
+        self.load_current('addresses', 'SELECT member_user_id, house_number, street, town '
+                          'FROM ADDRESS WHERE member_user_id = ANY(:ids)')
+        with self.engine.connect() as conn:
+            self.high_water = {
+                'user': conn.execute(text('SELECT COALESCE(MAX(user_id), 0) FROM "USER"')).scalar(),
+                'job': conn.execute(text('SELECT COALESCE(MAX(job_id), 0) FROM JOB')).scalar(),
+                'appointment': conn.execute(text('SELECT COALESCE(MAX(appointment_id), 0) FROM APPOINTMENT')).scalar(),
+            }
+
+    def load_current(self, name, sql):
+        """
+        Form values of the sampled rows of a pool, for its edit route, and
+        the pool edit_<name> of their ids. Rows with a NULL are left out: the
+        form would write it back as an empty string.
+        """
+        with self.engine.connect() as conn:
+            rows = conn.execute(text(sql), {'ids': self.pools[name]}).fetchall()
+        self.current[name] = {
+            row[0]: {column: str(value) for column, value in list(row._mapping.items())[1:]}
+            for row in rows if None not in row
+        }
+        self.pools[f'edit_{name}'] = list(self.current[name])
+        self.rng.shuffle(self.pools[f'edit_{name}'])
+
+    def load_created(self):
+        """Rows inserted by the create routes, for the edit/delete routes"""
+        self.load('bench_users', 'SELECT user_id FROM "USER" WHERE user_id > :id', {'id': self.high_water['user']})
+        self.load('bench_jobs', 'SELECT job_id FROM JOB WHERE job_id > :id', {'id': self.high_water['job']})
+        self.load('bench_appointments', 'SELECT appointment_id FROM APPOINTMENT WHERE appointment_id > :id',
+                  {'id': self.high_water['appointment']})
+        self.load('bench_applications', 'SELECT caregiver_user_id, job_id FROM JOB_APPLICATION '
+                  'WHERE date_applied = :day', {'day': BENCH_APPLICATION_DATE})
+        self.edit_pools = {name: list(self.pools[name]) for name in self.pools if name.startswith('bench_')}
+
+    def pick(self, name):
+        pool = self.pools.get(name)
+        return self.rng.choice(pool) if pool else None
+
+    def pick_created(self, name):
+        pool = self.edit_pools.get(name)
+        return self.rng.choice(pool) if pool else None
+
+    def take(self, name):
+        """An id that is used only once (for delete routes)"""
+        pool = self.pools.get(name)
+        return pool.pop() if pool else None
+
+    def unique(self):
+        return f'{self.run_id}-{next(self.counter)}'
+
+
+def user_form(ids, email):
+    return {'email': email, 'given_name': 'Bench', 'surname': f'User{ids.rng.randint(1, 999)}',
+            'city': 'Astana', 'phone_number': '+77000000000',
+            'profile_description': 'Created by http_bench.py', 'password': 'pass123'}
+
+
+def appointment_form(ids):
+    # Spread over years of half-hour slots so that the appointment_no_overlap
+    # constraint rarely rejects one (a rejection counts as a bad response)
+    day = date.today() + timedelta(days=ids.rng.randint(1, 3650))
+    minutes = 7 * 60 + 30 * ids.rng.randint(0, 26)
+    return {'caregiver_user_id': ids.pick('caregivers'), 'member_user_id': ids.pick('members'),
+            'appointment_date': day.isoformat(), 'appointment_time': f'{minutes // 60:02d}:{minutes % 60:02d}',
+            'work_hours': '2.5', 'status': 'pending'}
+
+
+def get(path, pool=None):
+    """Request factory for a GET route, optionally with an id from a pool"""
+    def next_request(ids):
+        if pool is None:
+            return 'GET', path
+        value = ids.pick(pool)
+        return None if value is None else ('GET', path.format(value))
+    return next_request
+
+
+def post(path, pool, form, take=False, created=False):
+    """Request factory for a POST route"""
+    def next_request(ids):
+        if pool is None:
+            value = None
+        elif take:
+            value = ids.take(pool)
+        elif created:
+            value = ids.pick_created(pool)
+        else:
+            value = ids.pick(pool)
+        if pool is not None and value is None:
+            return None
+        target = path.format(*value) if isinstance(value, tuple) else path.format(value)
+        return 'POST', target, form(ids, value)
+    return next_request
+
+
+# (phase, route name, request factory, expected status)
+ROUTES = [
+    ('read', 'index', get('/'), 200),
+    ('read', 'list_users', get('/users'), 200),
+    ('read', 'list_caregivers', get('/caregivers'), 200),
+    ('read', 'list_members', get('/members'), 200),
+    ('read', 'list_addresses', get('/addresses'), 200),
+    ('read', 'list_jobs', get('/jobs'), 200),
+    ('read', 'list_job_applications', get('/job_applications'), 200),
+    ('read', 'list_appointments', get('/appointments'), 200),
+    ('read', 'view_user', get('/users/{}', 'users'), 200),
+    ('read', 'search_caregivers', get('/api/caregivers/search?q=an'), 200),
+    ('read', 'search_members', get('/api/members/search?q=ar'), 200),
+    ('read', 'create_user_form', get('/users/create'), 200),
+    ('read', 'create_caregiver_form', get('/caregivers/create'), 200),
+    ('read', 'create_member_form', get('/members/create'), 200),
+    ('read', 'create_address_form', get('/addresses/create'), 200),
+    ('read', 'create_job_form', get('/jobs/create'), 200),
+    ('read', 'create_job_application_form', get('/job_applications/create'), 200),
+    ('read', 'create_appointment_form', get('/appointments/create'), 200),
+    ('read', 'edit_user_form', get('/users/{}/edit', 'users'), 200),
+    ('read', 'edit_caregiver_form', get('/caregivers/{}/edit', 'caregivers'), 200),
+    ('read', 'edit_member_form', get('/members/{}/edit', 'members'), 200),
+    ('read', 'edit_address_form', get('/addresses/{}/edit', 'addresses'), 200),
+    ('read', 'edit_job_form', get('/jobs/{}/edit', 'jobs'), 200),
+    ('read', 'edit_appointment_form', get('/appointments/{}/edit', 'appointments'), 200),
+
+    ('create', 'create_user', post('/users/create', None, lambda ids, _: user_form(
+        ids, f'bench-{ids.unique()}@example.com')), 302),
+    ('create', 'create_job', post('/jobs/create', None, lambda ids, _: {
+        'member_user_id': ids.pick('members'), 'required_caregiving_type': 'babysitter',
+        'other_requirements': 'Created by http_bench.py', 'date_posted': date.today().isoformat()}), 302),
+    ('create', 'create_job_application', post('/job_applications/create', None, lambda ids, _: {
+        'caregiver_user_id': ids.pick('caregivers'), 'job_id': ids.pick('jobs'),
+        'date_applied': BENCH_APPLICATION_DATE}), 302),
+    ('create', 'create_appointment', post('/appointments/create', None,
+                                          lambda ids, _: appointment_form(ids)), 302),
+
+    ('edit', 'edit_user', post('/users/{}/edit', 'bench_users', lambda ids, user_id: user_form(
+        ids, f'bench-{user_id}@example.com'), created=True), 302),
+    # Existing rows: the UPDATE runs, but with the values the row already has
+    ('edit', 'edit_caregiver', post('/caregivers/{}/edit', 'edit_caregivers',
+                                    lambda ids, caregiver_id: ids.current['caregivers'][caregiver_id]), 302),
+    ('edit', 'edit_member', post('/members/{}/edit', 'edit_members',
+                                 lambda ids, member_id: ids.current['members'][member_id]), 302),
+    ('edit', 'edit_address', post('/addresses/{}/edit', 'edit_addresses',
+                                  lambda ids, member_id: ids.current['addresses'][member_id]), 302),
+    ('edit', 'edit_job', post('/jobs/{}/edit', 'bench_jobs', lambda ids, _: {
+        'required_caregiving_type': 'elderly care', 'other_requirements': 'Edited by http_bench.py',
+        'date_posted': date.today().isoformat()}, created=True), 302),
+    ('edit', 'edit_appointment', post('/appointments/{}/edit', 'bench_appointments',
+                                      lambda ids, _: appointment_form(ids), created=True), 302),
+
+    ('delete', 'delete_job_application', post('/job_applications/{}/{}/delete', 'bench_applications',
+                                              lambda ids, _: {}, take=True), 302),
+    ('delete', 'delete_appointment', post('/appointments/{}/delete', 'bench_appointments',
+                                          lambda ids, _: {}, take=True), 302),
+    ('delete', 'delete_job', post('/jobs/{}/delete', 'bench_jobs', lambda ids, _: {}, take=True), 302),
+    ('delete', 'delete_user', post('/users/{}/delete', 'bench_users', lambda ids, _: {}, take=True), 302),
+]
+
+PHASES = ['read', 'create', 'edit', 'delete']
+
+
+def run_route(base_url, ids, name, factory, expected, concurrency, duration):
+    """Drive one route at one concurrency level"""
+    result = asyncio.run(run_load(base_url, concurrency, duration, lambda: factory(ids)))
+    unexpected = sum(count for status, count in result['statuses'].items() if status != expected)
+    failed = sum(count for error, count in result['errors'].items() if not error.startswith('HTTP'))
+    result.update({'route': name, 'expected_status': expected, 'bad': unexpected + failed})
+    return result
+
+
+def compare(results, baseline, threshold):
+    """Regressions of results against a baseline: rps down or p95 up by > threshold %"""
+    previous = {(row['route'], row['concurrency']): row for row in baseline['results']}
+    regressions = []
+    for row in results:
+        old = previous.get((row['route'], row['concurrency']))
+        if not old or not old['requests'] or not row['requests']:
+            continue
+        if row['rps'] < old['rps'] * (1 - threshold / 100):
+            regressions.append((row['route'], row['concurrency'], 'req/s', old['rps'], row['rps']))
+        if old['p95_ms'] and row['p95_ms'] > old['p95_ms'] * (1 + threshold / 100):
+            regressions.append((row['route'], row['concurrency'], 'p95 ms', old['p95_ms'], row['p95_ms']))
+    return regressions
+
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def benchmark(base_url, args):
+    """Run every selected route at every concurrency level, phase by phase"""
+    engine = create_db_engine(pool_size=1, max_overflow=0)
+    ids = IdPools(engine)
+    ids.load_existing()
+    routes = [route for route in ROUTES
+              if route[0] in args.phases and (not args.routes or re.search(args.routes, route[1]))]
+
+    results = []
+    for phase in PHASES:
+        if phase not in args.phases:
+            continue
+        if phase == 'edit':
+            ids.load_created()
+        for _, name, factory, expected in (route for route in routes if route[0] == phase):
+            # Warm up connections, template caches and query plans
+            if phase == 'read':
+                run_route(base_url, ids, name, factory, expected, 1, 0.5)
+            for concurrency in args.concurrency:
+                row = run_route(base_url, ids, name, factory, expected, concurrency, args.duration)
+                results.append(row)
+                print(f"{name:<30} c={concurrency:<4} {row['requests']:>8} {row['rps']:>9.1f} "
+                      f"{row['p50_ms']!s:>8} {row['p95_ms']!s:>8} {row['p99_ms']!s:>8} "
+                      f"{row['bad']:>6}")
+    engine.dispose()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='HTTP load benchmark for every route')
+    parser.add_argument('--url', help='benchmark an already running server instead of starting one')
+    parser.add_argument('--mode', choices=['sync', 'async'], default='sync')
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--threads', type=int, default=1)
+    parser.add_argument('--port', type=int, default=5099)
+    parser.add_argument('-c', '--concurrency', nargs='+', type=int, default=[1, 10, 50])
+    parser.add_argument('-d', '--duration', type=float, default=5.0, help='seconds per route and level')
+    parser.add_argument('--phases', nargs='+', choices=PHASES, default=PHASES)
+    parser.add_argument('--routes', help='only routes whose name matches this regex')
+    parser.add_argument('--save-baseline', metavar='FILE', help='write the results to FILE')
+    parser.add_argument('--baseline', metavar='FILE', help='compare the results with FILE')
+    parser.add_argument('--threshold', type=float, default=15.0,
+                        help='percent change that counts as a regression (default 15)')
+    args = parser.parse_args()
+
+    print(f"{'Route':<30} {'Clients':<6} {'Requests':>8} {'Req/s':>9} {'p50 ms':>8} "
+          f"{'p95 ms':>8} {'p99 ms':>8} {'Bad':>6}")
+    print('-' * 92)
+    started = time.time()
+    if args.url:
+        results = benchmark(args.url.rstrip('/'), args)
+    else:
+        with running_server(args.mode, args.port, args.workers, args.threads) as base_url:
+            results = benchmark(base_url, args)
+
+    report = {
+        'created': datetime.now().isoformat(timespec='seconds'),
+        'revision': git_revision(),
+        'settings': {'mode': args.mode, 'workers': args.workers, 'threads': args.threads,
+                     'duration': args.duration, 'concurrency': args.concurrency},
+        'elapsed_s': round(time.time() - started, 1),
+        'results': results,
+    }
+    if args.save_baseline:
+        Path(args.save_baseline).write_text(json.dumps(report, indent=2), encoding='utf-8')
+        print(f'\nBaseline written to {args.save_baseline}')
+
+    if args.baseline:
+        baseline = json.loads(Path(args.baseline).read_text(encoding='utf-8'))
+        regressions = compare(results, baseline, args.threshold)
+        print(f"\nCompared with {args.baseline} (revision {baseline.get('revision')}, "
+              f"threshold {args.threshold:g}%)")
+        for route, concurrency, metric, old, new in regressions:
+            print(f"  REGRESSION {route} c={concurrency}: {metric} {old} -> {new}")
+        if regressions:
+            return 1
+        print('  No regressions')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
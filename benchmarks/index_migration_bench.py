@@ -0,0 +1,140 @@
+"""
+Before/after benchmark for migrations/001_fk_and_composite_indexes.sql
+
+Measures the access paths the migration targets - lookups by the foreign
+key columns, the cascading delete of a user, status/type filters sorted by
+date and the report queries that join on them - with EXPLAIN ANALYZE,
+first without the migration's indexes, then with them, and prints the
+median times side by side with the scan each plan used.
+
+The "before" pass always runs 001's .down.sql first: schema.sql (and so
+--seed-users) creates the same indexes without recording 001 in
+schema_migrations. The "after" pass runs 001's file alone, so no other
+pending migration lands between the two measurements.
+
+    python benchmarks/index_migration_bench.py --seed-users 500000
+
+--seed-users drops and refills the database with generate_data.py, and
+the deletes are rolled back, but the indexes are really dropped and
+rebuilt: only run this against a local or scratch database.
+"""
+
+import argparse
+import json
+import statistics
+import sys
+from pathlib import Path
+
+from sqlalchemy import text
+
+from explain_queries import explain_query, seed
+from servers import ROOT
+
+sys.path.insert(0, str(ROOT))
+import migrate  # noqa: E402
+import queries  # noqa: E402
+from bulk_load import create_load_engine  # noqa: E402
+from db import DATABASE_URL  # noqa: E402
+
+MIGRATION = '001'
+
+
+def probes(conn):
+    """(name, Query) pairs to measure, using ids sampled from the data"""
+    caregiver_id = conn.execute(text('SELECT caregiver_user_id FROM APPOINTMENT LIMIT 1')).scalar()
+    member_id = conn.execute(text('SELECT member_user_id FROM JOB LIMIT 1')).scalar()
+    job_id = conn.execute(text('SELECT job_id FROM JOB_APPLICATION LIMIT 1')).scalar()
+    sql = {
+        'appointments_of_caregiver': f"""
+            SELECT * FROM APPOINTMENT WHERE caregiver_user_id = {caregiver_id}
+            ORDER BY appointment_date, appointment_time""",
+        'appointments_of_member': f"""
+            SELECT * FROM APPOINTMENT WHERE member_user_id = {member_id}
+            ORDER BY appointment_date, appointment_time""",
+        'jobs_of_member': f"SELECT * FROM JOB WHERE member_user_id = {member_id} ORDER BY date_posted",
+        'applicants_of_job': f"SELECT * FROM JOB_APPLICATION WHERE job_id = {job_id}",
+        'upcoming_confirmed': """
+            SELECT * FROM APPOINTMENT WHERE status = 'confirmed' AND appointment_date >= CURRENT_DATE
+            ORDER BY appointment_date, appointment_time LIMIT 50""",
+        'recent_jobs_by_type': """
+            SELECT * FROM JOB WHERE required_caregiving_type = 'elderly care'
+            ORDER BY date_posted DESC LIMIT 50""",
+        'delete_member_cascade': f'DELETE FROM "USER" WHERE user_id = {member_id}',
+        'delete_caregiver_cascade': f'DELETE FROM "USER" WHERE user_id = {caregiver_id}',
+    }
+    result = [(name, queries.Query(name, statement, prepare=False)) for name, statement in sql.items()]
+    result += [(query.name, query) for query in (queries.QUERY_5_1, queries.QUERY_5_3,
+                                                 queries.QUERY_6_2, queries.QUERY_6_1)]
+    return result
+
+
+def measure(engine, repeat):
+    """{probe: plan summary}; every run is rolled back, so deletes repeat"""
+    results = {}
+    with engine.connect() as conn:
+        for name, query in probes(conn):
+            runs = []
+            for _ in range(repeat):
+                runs.append(explain_query(conn, query, 1))
+                conn.rollback()
+            runs.sort(key=lambda run: run['execution_ms'])
+            results[name] = runs[len(runs) // 2]
+            results[name]['median_execution_ms'] = round(
+                statistics.median(run['execution_ms'] for run in runs), 3)
+    return results
+
+
+def access_path(plan):
+    """Short description of how the plan reaches its tables"""
+    scans = [line.strip() for line in plan['shape'] if 'Scan' in line]
+    return '; '.join(scans[:2]) + ('; ...' if len(scans) > 2 else '')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Before/after benchmark of the FK/composite index migration')
+    parser.add_argument('--seed-users', type=int, metavar='N',
+                        help='first refill the database with generate_data.py (N users)')
+    parser.add_argument('--repeat', type=int, default=5, help='runs per probe; the median is kept')
+    parser.add_argument('--json', help='also write the raw results to this file')
+    args = parser.parse_args()
+
+    if args.seed_users:
+        seed(args.seed_users)
+
+    name, path, down_path = migrate.available()[MIGRATION]
+    engine = create_load_engine(DATABASE_URL)
+    try:
+        conn = migrate.autocommit_connection(engine)
+        try:
+            print(f"Dropping the migration's indexes with {down_path.name}...")
+            migrate.run_file(conn, down_path)
+            conn.execute(text('DELETE FROM schema_migrations WHERE version = :version'), {'version': MIGRATION})
+            print("\nMeasuring without the migration's indexes...")
+            before = measure(engine, args.repeat)
+
+            print(f"\nApplying {path.name}...")
+            migrate.run_file(conn, path)
+            conn.execute(text('INSERT INTO schema_migrations (version, name) VALUES (:version, :name) '
+                              'ON CONFLICT (version) DO NOTHING'), {'version': MIGRATION, 'name': name})
+            print("\nMeasuring with the migration's indexes...")
+            after = measure(engine, args.repeat)
+        finally:
+            conn.close()
+    finally:
+        engine.dispose()
+
+    print(f"\n{'Probe':<28} {'Before ms':>10} {'After ms':>10} {'Speedup':>8}  Access path after")
+    print('-' * 110)
+    for name in before:
+        old, new = before[name]['median_execution_ms'], after[name]['median_execution_ms']
+        speedup = f'{old / new:.1f}x' if new else '-'
+        print(f"{name:<28} {old:>10.2f} {new:>10.2f} {speedup:>8}  {access_path(after[name])}")
+        print(f"{'':<59}  before: {access_path(before[name])}")
+
+    if args.json:
+        Path(args.json).write_text(json.dumps({'before': before, 'after': after}, indent=2), encoding='utf-8')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
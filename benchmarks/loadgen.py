@@ -0,0 +1,161 @@
+"""
+Closed-loop HTTP load generator used by the benchmark scripts
+
+Each of `concurrency` clients keeps one keep-alive connection open and
+sends requests back to back for `duration` seconds: GETs of one URL, or
+whatever a next_request() callback returns (method, path and form data),
+so write routes can be driven with varying ids. Only the standard library
+is used, so it runs anywhere the application does.
+
+    python benchmarks/loadgen.py http://localhost:5001/users -c 100 -d 10
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import time
+from urllib.parse import urlencode, urlsplit
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return None
+    rank = max(1, math.ceil(pct / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+async def read_response(reader):
+    """Read one HTTP/1.1 response; returns (status, body length, keep-alive)"""
+    status_line = await reader.readline()
+    if not status_line:
+        raise ConnectionError('connection closed by server')
+    version, status = status_line.split()[:2]
+    status = int(status)
+
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b'\n', b''):
+            break
+        name, _, value = line.decode('latin-1').partition(':')
+        headers[name.strip().lower()] = value.strip()
+
+    length = 0
+    if headers.get('transfer-encoding', '').lower() == 'chunked':
+        while True:
+            size = int((await reader.readline()).split(b';')[0], 16)
+            await reader.readexactly(size + 2)
+            length += size
+            if size == 0:
+                break
+    elif 'content-length' in headers:
+        length = int(headers['content-length'])
+        await reader.readexactly(length)
+    else:
+        length = len(await reader.read())
+        return status, length, False
+
+    if version == b'HTTP/1.0':
+        return status, length, headers.get('connection', '').lower() == 'keep-alive'
+    return status, length, headers.get('connection', '').lower() != 'close'
+
+
+def encode_request(host, port, method, target, form=None):
+    """Raw HTTP/1.1 request bytes; form data is sent url-encoded"""
+    body = urlencode(form).encode('utf-8') if form is not None else b''
+    head = f'{method} {target} HTTP/1.1\r\nHost: {host}:{port}\r\nAccept: */*\r\n'
+    if form is not None:
+        head += f'Content-Type: application/x-www-form-urlencoded\r\nContent-Length: {len(body)}\r\n'
+    return (head + '\r\n').encode('latin-1') + body
+
+
+async def client(host, port, next_request, deadline, latencies, statuses, errors):
+    """One simulated user sending requests until the deadline (or until
+    next_request() returns None)"""
+    reader = writer = None
+    while time.perf_counter() < deadline:
+        spec = next_request()
+        if spec is None:
+            break
+        request = encode_request(host, port, *spec)
+
+        start = time.perf_counter()
+        try:
+            if writer is None:
+                reader, writer = await asyncio.open_connection(host, port)
+            writer.write(request)
+            await writer.drain()
+            status, _, keep_alive = await read_response(reader)
+        except (OSError, ConnectionError, ValueError, asyncio.IncompleteReadError) as e:
+            errors[type(e).__name__] = errors.get(type(e).__name__, 0) + 1
+            if writer is not None:
+                writer.close()
+            reader = writer = None
+            await asyncio.sleep(0.01)
+            continue
+
+        latencies.append(time.perf_counter() - start)
+        statuses[status] = statuses.get(status, 0) + 1
+        if status >= 400:
+            errors[f'HTTP {status}'] = errors.get(f'HTTP {status}', 0) + 1
+        if not keep_alive:
+            writer.close()
+            reader = writer = None
+
+    if writer is not None:
+        writer.close()
+
+
+async def run_load(url, concurrency=10, duration=10.0, next_request=None):
+    """
+    Run the load test and return throughput and latency statistics.
+
+    url is the page to GET, or the server's base URL when next_request is
+    given; next_request() returns (method, path, form-or-None) for each
+    request, or None when there is nothing left to send.
+    """
+    parts = urlsplit(url)
+    host, port = parts.hostname, parts.port or 80
+    if next_request is None:
+        target = (parts.path or '/') + (f'?{parts.query}' if parts.query else '')
+        next_request = lambda: ('GET', target)
+
+    latencies = []
+    statuses = {}
+    errors = {}
+    started = time.perf_counter()
+    deadline = started + duration
+    await asyncio.gather(*(client(host, port, next_request, deadline, latencies, statuses, errors)
+                           for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    ms = lambda value: round(value * 1000, 2) if value is not None else None
+    return {
+        'url': url,
+        'concurrency': concurrency,
+        'duration_s': round(elapsed, 2),
+        'requests': len(latencies),
+        'statuses': statuses,
+        'errors': errors,
+        'rps': round(len(latencies) / elapsed, 1),
+        'p50_ms': ms(percentile(latencies, 50)),
+        'p95_ms': ms(percentile(latencies, 95)),
+        'p99_ms': ms(percentile(latencies, 99)),
+        'max_ms': ms(latencies[-1] if latencies else None),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('url')
+    parser.add_argument('-c', '--concurrency', type=int, default=10)
+    parser.add_argument('-d', '--duration', type=float, default=10.0)
+    args = parser.parse_args()
+    print(json.dumps(asyncio.run(run_load(args.url, args.concurrency, args.duration)), indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,49 @@
+"""
+Start and stop the application under gunicorn for the benchmark scripts
+"""
+
+import os
+import signal
+import subprocess
+import time
+import urllib.request
+from contextlib import contextmanager
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+
+def server_command(mode, port, workers, threads):
+    """gunicorn command line for the sync (app:app) or async (asgi.py) mode"""
+    if mode == 'sync':
+        return ['gunicorn', 'app:app', '--bind', f'127.0.0.1:{port}',
+                '--workers', str(workers), '--threads', str(threads)]
+    return ['gunicorn', 'asgi:application', '--bind', f'127.0.0.1:{port}',
+            '--workers', str(workers), '--worker-class', 'uvicorn.workers.UvicornWorker']
+
+
+def wait_until_ready(base_url, timeout=30.0):
+    """Poll the home page until the server answers"""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with urllib.request.urlopen(base_url + '/', timeout=1):
+                return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError(f'Server at {base_url} did not start within {timeout}s')
+
+
+@contextmanager
+def running_server(mode='sync', port=5099, workers=2, threads=1):
+    """Run the app in a gunicorn subprocess; yields its base URL"""
+    base_url = f'http://127.0.0.1:{port}'
+    server = subprocess.Popen(server_command(mode, port, workers, threads),
+                              cwd=ROOT, env=os.environ.copy(),
+                              stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        wait_until_ready(base_url)
+        yield base_url
+    finally:
+        server.send_signal(signal.SIGTERM)
+        server.wait(timeout=30)
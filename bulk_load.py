@@ -0,0 +1,351 @@
+"""
+Bulk loader for database.sql and other schema + data SQL files
+
+load_db.py and load_render_db.py normally send one statement per round
+trip. With --bulk they hand the file to load_file() instead, which
+streams the statements from the file (see sql_script.py) and:
+
+  1. ships the rows of INSERT ... VALUES statements with COPY ... FROM
+     STDIN (or multi-row INSERT batches with --mode batch); consecutive
+     INSERTs into the same table and columns share batches, so a dump with
+     one row per INSERT (pg_dump --inserts) still loads batch_size rows per
+     round trip and commit,
+  2. runs every other statement (DROP/CREATE TABLE, sequence resets) as is,
+  3. creates the indexes (and exclusion constraints) only after all data
+     is loaded.
+
+Progress is printed per table as rows loaded and rows/sec.
+
+Usage:
+    python bulk_load.py [DATABASE_URL] [--file database.sql] [--mode copy|batch] [--batch-size N]
+"""
+
+import argparse
+import io
+import os
+import re
+import sys
+import time
+
+from psycopg2.extras import execute_values
+from sqlalchemy import create_engine
+
+from db import DATABASE_URL, connect_args
+from sql_script import iter_statements
+
+# Rows sent per COPY / INSERT round trip
+BATCH_SIZE = int(os.getenv('BULK_BATCH_SIZE', '10000'))
+
+# Seconds between progress lines for one table
+PROGRESS_INTERVAL = 2.0
+
+INSERT_VALUES = re.compile(
+    r'^INSERT\s+INTO\s+(?P<table>"[^"]+"|[\w.]+)\s*\((?P<columns>[^)]*)\)\s*VALUES\s*(?P<values>.*)$',
+    re.IGNORECASE | re.DOTALL
+)
+# Index builds deferred until the data is loaded, including the index of an
+# exclusion constraint added with ALTER TABLE
+CREATE_INDEX = re.compile(
+    r'^(CREATE\s+(UNIQUE\s+)?INDEX|ALTER\s+TABLE\s+\S+\s+ADD\s+CONSTRAINT\s+\w+\s+EXCLUDE)\b',
+    re.IGNORECASE
+)
+NUMBER = re.compile(r'[+-]?(\d+(\.\d*)?|\.\d+)([eE][+-]?\d+)?')
+CAST = re.compile(r'::\s*[\w ]+(\(\d+(,\s*\d+)?\))?')
+
+
+def parse_values(values_sql):
+    """
+    Parse the literal tuples of a VALUES list into rows of Python values.
+
+    Strings and numbers stay text (PostgreSQL casts them to the column type
+    on load), NULL becomes None. Anything that is not a plain literal -
+    function calls, DEFAULT, sub-selects, ON CONFLICT - raises ValueError so
+    the caller can fall back to executing the statement as written.
+    """
+    rows = []
+    pos = 0
+    length = len(values_sql)
+
+    def skip_space(pos):
+        while pos < length and values_sql[pos].isspace():
+            pos += 1
+        return pos
+
+    while True:
+        pos = skip_space(pos)
+        if pos >= length or values_sql[pos] != '(':
+            raise ValueError(f'expected ( at offset {pos}')
+        pos += 1
+        row = []
+        while True:
+            pos = skip_space(pos)
+            if values_sql[pos] == "'":
+                end = pos + 1
+                chunks = []
+                while True:
+                    quote = values_sql.index("'", end)
+                    chunks.append(values_sql[end:quote])
+                    if values_sql.startswith("''", quote):
+                        chunks.append("'")
+                        end = quote + 2
+                    else:
+                        pos = quote + 1
+                        break
+                value = ''.join(chunks)
+            else:
+                match = NUMBER.match(values_sql, pos)
+                if match:
+                    value = match.group(0)
+                    pos = match.end()
+                elif values_sql[pos:pos + 4].upper() == 'NULL':
+                    value = None
+                    pos += 4
+                elif values_sql[pos:pos + 4].upper() == 'TRUE':
+                    value = 't'
+                    pos += 4
+                elif values_sql[pos:pos + 5].upper() == 'FALSE':
+                    value = 'f'
+                    pos += 5
+                else:
+                    raise ValueError(f'unsupported value at offset {pos}')
+            cast = CAST.match(values_sql, skip_space(pos))
+            if cast:
+                pos = cast.end()
+            row.append(value)
+
+            pos = skip_space(pos)
+            if values_sql[pos] == ',':
+                pos += 1
+            elif values_sql[pos] == ')':
+                pos += 1
+                break
+            else:
+                raise ValueError(f'expected , or ) at offset {pos}')
+        rows.append(row)
+
+        pos = skip_space(pos)
+        if pos >= length:
+            return rows
+        if values_sql[pos] != ',':
+            raise ValueError(f'unexpected text after VALUES at offset {pos}')
+        pos += 1
+
+
+def copy_text(value):
+    """Encode one value for COPY ... (FORMAT text)"""
+    if value is None:
+        return '\\N'
+    return (str(value).replace('\\', '\\\\').replace('\t', '\\t')
+            .replace('\n', '\\n').replace('\r', '\\r'))
+
+
+def batches(rows, size):
+    """Yield lists of at most size rows"""
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+class Progress:
+    """Prints rows loaded and rows/sec for one table"""
+
+    def __init__(self, table):
+        self.table = table
+        self.rows = 0
+        self.started = time.perf_counter()
+        self.reported = self.started
+
+    def add(self, count):
+        self.rows += count
+        now = time.perf_counter()
+        if now - self.reported >= PROGRESS_INTERVAL:
+            self.reported = now
+            print(f"  {self.table}: {self.rows:,} rows ({self.rate():,.0f} rows/sec)")
+
+    def rate(self):
+        elapsed = time.perf_counter() - self.started
+        return self.rows / elapsed if elapsed > 0 else 0.0
+
+    def done(self):
+        elapsed = time.perf_counter() - self.started
+        print(f"  ✓ {self.table}: {self.rows:,} rows in {elapsed:.2f}s ({self.rate():,.0f} rows/sec)")
+
+
+def copy_rows(cursor, table, columns, rows, batch_size=BATCH_SIZE, progress=None):
+    """Load rows with COPY FROM STDIN, batch_size rows per round trip"""
+    column_list = ', '.join(columns)
+    sql = f'COPY {table} ({column_list}) FROM STDIN'
+    total = 0
+    for batch in batches(rows, batch_size):
+        buffer = io.StringIO()
+        for row in batch:
+            buffer.write('\t'.join(copy_text(value) for value in row))
+            buffer.write('\n')
+        buffer.seek(0)
+        cursor.copy_expert(sql, buffer)
+        total += len(batch)
+        if progress:
+            progress.add(len(batch))
+    return total
+
+
+def insert_rows(cursor, table, columns, rows, batch_size=BATCH_SIZE, progress=None):
+    """Load rows with multi-row INSERT statements of batch_size rows each"""
+    column_list = ', '.join(columns)
+    sql = f'INSERT INTO {table} ({column_list}) VALUES %s'
+    total = 0
+    for batch in batches(rows, batch_size):
+        execute_values(cursor, sql, batch, page_size=batch_size)
+        total += len(batch)
+        if progress:
+            progress.add(len(batch))
+    return total
+
+
+def parse_insert(statement):
+    """(table, columns, rows) of an INSERT ... VALUES statement, or None if
+    it is not one or its VALUES are not plain literals"""
+    match = INSERT_VALUES.match(statement)
+    if not match:
+        return None
+    try:
+        rows = parse_values(match.group('values'))
+    except (ValueError, IndexError):
+        return None
+    columns = [column.strip() for column in match.group('columns').split(',')]
+    return match.group('table'), columns, rows
+
+
+class PendingRows:
+    """
+    Rows of a run of consecutive INSERTs into the same table and columns.
+
+    Full batches are loaded and committed as the rows arrive; the rest waits
+    for more INSERTs of the run or for finish().
+    """
+
+    def __init__(self, raw, load_rows, batch_size=BATCH_SIZE):
+        self.raw = raw
+        self.cursor = raw.cursor()
+        self.load_rows = load_rows
+        self.batch_size = batch_size
+        self.key = None
+        self.rows = []
+        self.progress = None
+        self.total = 0
+
+    def add(self, table, columns, rows):
+        key = (table, tuple(columns))
+        if key != self.key:
+            self.finish()
+            self.key = key
+            self.progress = Progress(table)
+        self.rows.extend(rows)
+        if len(self.rows) >= self.batch_size:
+            full = len(self.rows) - len(self.rows) % self.batch_size
+            self._load(self.rows[:full])
+            del self.rows[:full]
+
+    def _load(self, rows):
+        table, columns = self.key
+        self.total += self.load_rows(self.cursor, table, columns, rows, self.batch_size, self.progress)
+        self.raw.commit()
+
+    def finish(self):
+        """Load what is left of the current run and report its table"""
+        if self.key is None:
+            return
+        if self.rows:
+            self._load(self.rows)
+            self.rows = []
+        self.progress.done()
+        self.key = None
+        self.progress = None
+
+
+def create_indexes(cursor, indexes):
+    """Run the deferred CREATE INDEX statements, then refresh statistics"""
+    print(f"Creating {len(indexes)} indexes...")
+    for statement in indexes:
+        started = time.perf_counter()
+        cursor.execute(statement)
+        summary = statement.split(' ON ')[0].split(' EXCLUDE ')[0]
+        print(f"  ✓ {' '.join(summary.split())} ({time.perf_counter() - started:.2f}s)")
+    cursor.execute('ANALYZE')
+
+
+def create_load_engine(database_url):
+    """Engine for a loader script, with SSL for Render URLs"""
+    extra = connect_args
+    if 'render.com' in database_url and 'sslmode' not in database_url:
+        extra = {'sslmode': 'require'}
+    return create_engine(database_url, connect_args=extra)
+
+
+def load_file(engine, path, mode='copy', batch_size=BATCH_SIZE):
+    """Bulk load a schema + data SQL file; returns the number of rows loaded"""
+    load_rows = copy_rows if mode == 'copy' else insert_rows
+    print(f"Bulk loading {path} (mode={mode}, indexes deferred)...")
+    started = time.perf_counter()
+    indexes = []
+
+    raw = engine.raw_connection()
+    try:
+        cursor = raw.cursor()
+        # The whole load is retried from scratch on failure, so a crash
+        # losing the last few commits is harmless
+        cursor.execute('SET synchronous_commit TO OFF')
+
+        # Statements are streamed from the file and run in order, except
+        # that CREATE INDEX waits until all data is in
+        pending = PendingRows(raw, load_rows, batch_size)
+        for statement in iter_statements(path):
+            if CREATE_INDEX.match(statement):
+                indexes.append(statement)
+                continue
+            insert = parse_insert(statement)
+            if insert is None:
+                pending.finish()
+                cursor.execute(statement)
+                continue
+            pending.add(*insert)
+        pending.finish()
+        raw.commit()
+        total = pending.total
+
+        create_indexes(cursor, indexes)
+        raw.commit()
+    except Exception:
+        raw.rollback()
+        raise
+    finally:
+        raw.close()
+
+    elapsed = time.perf_counter() - started
+    print(f"✓ Loaded {total:,} rows in {elapsed:.2f}s ({total / elapsed if elapsed else 0:,.0f} rows/sec)")
+    return total
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Bulk load a schema + data SQL file')
+    parser.add_argument('database_url', nargs='?', default=DATABASE_URL)
+    parser.add_argument('--file', default='database.sql')
+    parser.add_argument('--mode', choices=['copy', 'batch'], default='copy')
+    parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+    args = parser.parse_args()
+
+    engine = create_load_engine(args.database_url)
+    try:
+        load_file(engine, args.file, args.mode, args.batch_size)
+    finally:
+        engine.dispose()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
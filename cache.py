@@ -0,0 +1,118 @@
+"""
+In-process caches for the caregiver platform web application
+
+Each gunicorn worker keeps its own copy, so explicit invalidation only
+reaches the worker that handled the write; the TTL bounds how long the
+other workers can serve stale data.
+
+Loads are single-flight: when several threads miss the same key at once,
+one of them runs the loader and the others wait for its result, so an
+expensive value is computed at most once per expiry per worker.
+"""
+
+import threading
+import time
+
+
+class _Flight:
+    """A load in progress that other threads can wait for"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class TTLCache:
+    """Thread-safe key/value cache whose entries expire after ttl seconds"""
+
+    def __init__(self, name, ttl):
+        self.name = name
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self.coalesced = 0
+        self._entries = {}
+        self._flights = {}
+        self._lock = threading.Lock()
+
+    def get(self, key, loader):
+        """
+        Return the cached value for key, calling loader() on a miss.
+
+        Concurrent misses for the same key share one loader() call (its
+        exception, if any, is raised in every waiting thread). A value
+        whose load started before an invalidate() of its key is returned
+        to the threads that asked for it but not cached.
+        """
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry[0] > now:
+                self.hits += 1
+                return entry[1]
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                self.misses += 1
+                flight = self._flights[key] = _Flight()
+            else:
+                self.coalesced += 1
+
+        if leader:
+            return self._load(key, loader, flight)
+        flight.done.wait()
+        if flight.error is not None:
+            raise flight.error
+        return flight.value
+
+    def _load(self, key, loader, flight):
+        """Run loader() for a flight this thread leads"""
+        try:
+            flight.value = loader()
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                # invalidate() removes the flight, so a stale load is not stored
+                if self._flights.get(key) is flight:
+                    del self._flights[key]
+                    if flight.error is None:
+                        self._entries[key] = (time.monotonic() + self.ttl, flight.value)
+            flight.done.set()
+        return flight.value
+
+    def peek(self, key):
+        """The cached value for key, or None when it is missing or expired; never loads"""
+        with self._lock:
+            entry = self._entries.get(key)
+            return entry[1] if entry and entry[0] > time.monotonic() else None
+
+    def invalidate(self, *keys):
+        """Drop the given keys, or every entry when no keys are given"""
+        with self._lock:
+            if keys:
+                for key in keys:
+                    self._entries.pop(key, None)
+                    self._flights.pop(key, None)
+            else:
+                self._entries.clear()
+                self._flights.clear()
+            self.invalidations += 1
+
+    def stats(self):
+        """Hit/miss counters and current size"""
+        with self._lock:
+            lookups = self.hits + self.misses + self.coalesced
+            return {
+                'name': self.name,
+                'ttl': self.ttl,
+                'entries': len(self._entries),
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': round((self.hits + self.coalesced) / lookups, 3) if lookups else None,
+                'coalesced': self.coalesced,
+                'invalidations': self.invalidations,
+            }
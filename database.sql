@@ -8,6 +8,8 @@
 -- ============================================================================
 
 -- Drop existing tables if they exist (in reverse order of dependencies)
+DROP TABLE IF EXISTS TABLE_VERSION CASCADE;
+DROP TABLE IF EXISTS CAREGIVER_EARNINGS CASCADE;
 DROP TABLE IF EXISTS APPOINTMENT CASCADE;
 DROP TABLE IF EXISTS JOB_APPLICATION CASCADE;
 DROP TABLE IF EXISTS JOB CASCADE;
@@ -62,6 +64,7 @@ CREATE TABLE JOB (
     required_caregiving_type VARCHAR(50) NOT NULL CHECK (required_caregiving_type IN ('babysitter', 'elderly care', 'playmate for children')),
     other_requirements TEXT,
     date_posted DATE NOT NULL,
+    applicant_count INTEGER NOT NULL DEFAULT 0,
     FOREIGN KEY (member_user_id) REFERENCES MEMBER(member_user_id) ON DELETE CASCADE
 );
 
@@ -84,17 +87,254 @@ CREATE TABLE APPOINTMENT (
     appointment_time TIME NOT NULL,
     work_hours DECIMAL(4, 2) NOT NULL CHECK (work_hours > 0),
     status VARCHAR(20) NOT NULL CHECK (status IN ('pending', 'confirmed', 'declined', 'completed')),
+    -- When the caregiver is busy: [start, start + work_hours)
+    appointment_period TSRANGE GENERATED ALWAYS AS (
+        tsrange(appointment_date + appointment_time,
+                appointment_date + appointment_time + work_hours * INTERVAL '1 hour')
+    ) STORED,
     FOREIGN KEY (caregiver_user_id) REFERENCES CAREGIVER(caregiver_user_id) ON DELETE CASCADE,
     FOREIGN KEY (member_user_id) REFERENCES MEMBER(member_user_id) ON DELETE CASCADE
 );
 
+-- Caregiver earnings rollup: confirmed hours, appointment count and
+-- sum(hourly_rate * work_hours) per caregiver, kept current by the
+-- statement-level triggers below. Reports 6.2-6.4 and 7 read it instead of
+-- aggregating APPOINTMENT; maintenance.py rebuilds and checks it.
+CREATE TABLE CAREGIVER_EARNINGS (
+    caregiver_user_id INTEGER PRIMARY KEY,
+    confirmed_hours NUMERIC NOT NULL DEFAULT 0,
+    confirmed_appointments INTEGER NOT NULL DEFAULT 0,
+    confirmed_cost NUMERIC NOT NULL DEFAULT 0,
+    FOREIGN KEY (caregiver_user_id) REFERENCES CAREGIVER(caregiver_user_id) ON DELETE CASCADE
+);
+
+-- Adds the confirmed appointments of one statement to the rollup as a
+-- single delta per caregiver (inserted rows count +1, deleted rows -1, an
+-- update both). The join with CAREGIVER drops deltas for caregivers being
+-- deleted by the same ON DELETE CASCADE.
+CREATE OR REPLACE FUNCTION caregiver_earnings_apply() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        INSERT INTO CAREGIVER_EARNINGS AS e (caregiver_user_id, confirmed_hours, confirmed_appointments, confirmed_cost)
+        SELECT d.caregiver_user_id, d.hours, d.n, c.hourly_rate * d.hours
+        FROM (SELECT caregiver_user_id, sum(work_hours) AS hours, count(*) AS n
+              FROM new_rows WHERE status = 'confirmed' GROUP BY caregiver_user_id) d
+        JOIN CAREGIVER c ON c.caregiver_user_id = d.caregiver_user_id
+        ON CONFLICT (caregiver_user_id) DO UPDATE
+        SET confirmed_hours = e.confirmed_hours + EXCLUDED.confirmed_hours,
+            confirmed_appointments = e.confirmed_appointments + EXCLUDED.confirmed_appointments,
+            confirmed_cost = e.confirmed_cost + EXCLUDED.confirmed_cost;
+    ELSIF TG_OP = 'DELETE' THEN
+        UPDATE CAREGIVER_EARNINGS e
+        SET confirmed_hours = e.confirmed_hours - d.hours,
+            confirmed_appointments = e.confirmed_appointments - d.n,
+            confirmed_cost = e.confirmed_cost - c.hourly_rate * d.hours
+        FROM (SELECT caregiver_user_id, sum(work_hours) AS hours, count(*) AS n
+              FROM old_rows WHERE status = 'confirmed' GROUP BY caregiver_user_id) d
+        JOIN CAREGIVER c ON c.caregiver_user_id = d.caregiver_user_id
+        WHERE e.caregiver_user_id = d.caregiver_user_id;
+    ELSE
+        INSERT INTO CAREGIVER_EARNINGS AS e (caregiver_user_id, confirmed_hours, confirmed_appointments, confirmed_cost)
+        SELECT d.caregiver_user_id, d.hours, d.n, c.hourly_rate * d.hours
+        FROM (SELECT caregiver_user_id, sum(hours) AS hours, sum(n) AS n
+              FROM (SELECT caregiver_user_id, work_hours AS hours, 1 AS n
+                    FROM new_rows WHERE status = 'confirmed'
+                    UNION ALL
+                    SELECT caregiver_user_id, -work_hours, -1
+                    FROM old_rows WHERE status = 'confirmed') changes
+              GROUP BY caregiver_user_id) d
+        JOIN CAREGIVER c ON c.caregiver_user_id = d.caregiver_user_id
+        WHERE d.n <> 0 OR d.hours <> 0
+        ON CONFLICT (caregiver_user_id) DO UPDATE
+        SET confirmed_hours = e.confirmed_hours + EXCLUDED.confirmed_hours,
+            confirmed_appointments = e.confirmed_appointments + EXCLUDED.confirmed_appointments,
+            confirmed_cost = e.confirmed_cost + EXCLUDED.confirmed_cost;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- A new hourly rate reprices all of the caregiver's confirmed hours
+CREATE OR REPLACE FUNCTION caregiver_earnings_reprice() RETURNS trigger AS $$
+BEGIN
+    UPDATE CAREGIVER_EARNINGS e
+    SET confirmed_cost = c.hourly_rate * e.confirmed_hours
+    FROM new_rows c
+    WHERE e.caregiver_user_id = c.caregiver_user_id
+      AND e.confirmed_cost <> c.hourly_rate * e.confirmed_hours;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER appointment_earnings_insert AFTER INSERT ON APPOINTMENT
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION caregiver_earnings_apply();
+CREATE TRIGGER appointment_earnings_update AFTER UPDATE ON APPOINTMENT
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION caregiver_earnings_apply();
+CREATE TRIGGER appointment_earnings_delete AFTER DELETE ON APPOINTMENT
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION caregiver_earnings_apply();
+CREATE TRIGGER caregiver_earnings_rate AFTER UPDATE ON CAREGIVER
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION caregiver_earnings_reprice();
+
+-- JOB.applicant_count is the number of JOB_APPLICATION rows of the job,
+-- adjusted by one delta per job for every statement that adds or removes
+-- applications (cascades included). Report 6.1 and the "most applicants"
+-- sort of the jobs list read it; maintenance.py reconciles it.
+CREATE OR REPLACE FUNCTION job_applicant_count_apply() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        UPDATE JOB j
+        SET applicant_count = j.applicant_count + d.n
+        FROM (SELECT job_id, count(*) AS n FROM new_rows GROUP BY job_id) d
+        WHERE j.job_id = d.job_id;
+    ELSIF TG_OP = 'DELETE' THEN
+        UPDATE JOB j
+        SET applicant_count = j.applicant_count - d.n
+        FROM (SELECT job_id, count(*) AS n FROM old_rows GROUP BY job_id) d
+        WHERE j.job_id = d.job_id;
+    ELSE
+        UPDATE JOB j
+        SET applicant_count = j.applicant_count + d.n
+        FROM (SELECT job_id, sum(n) AS n
+              FROM (SELECT job_id, 1 AS n FROM new_rows
+                    UNION ALL
+                    SELECT job_id, -1 FROM old_rows) changes
+              GROUP BY job_id) d
+        WHERE j.job_id = d.job_id AND d.n <> 0;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER job_application_count_insert AFTER INSERT ON JOB_APPLICATION
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION job_applicant_count_apply();
+CREATE TRIGGER job_application_count_update AFTER UPDATE ON JOB_APPLICATION
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION job_applicant_count_apply();
+CREATE TRIGGER job_application_count_delete AFTER DELETE ON JOB_APPLICATION
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION job_applicant_count_apply();
+
+-- Version stamp per table for the conditional GETs of app.py (ETag and
+-- Last-Modified). The first statement of a transaction that changes a
+-- table, cascades included, bumps its row, so a new version becomes
+-- visible together with the data. The price is that concurrent write
+-- transactions on the same table queue on that row lock from their first
+-- write until they commit; the CRUD routes commit right after a single
+-- statement, so the wait is one commit. Long write transactions should
+-- not run next to latency-sensitive writers of the same table.
+CREATE TABLE TABLE_VERSION (
+    table_name TEXT PRIMARY KEY,
+    version BIGINT NOT NULL DEFAULT 1,
+    modified_at TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+
+CREATE OR REPLACE FUNCTION table_version_bump() RETURNS trigger AS $$
+DECLARE
+    bumped TEXT := 'table_version.' || lower(TG_TABLE_NAME);
+BEGIN
+    -- Once per transaction and table (the flag is transaction-local): the
+    -- first write takes the row lock, later ones would only repeat the update
+    IF current_setting(bumped, true) IS DISTINCT FROM 'yes' THEN
+        -- clock_timestamp(), not now(): the lock may have been granted long
+        -- after the transaction started, and modified_at never goes back
+        INSERT INTO TABLE_VERSION AS v (table_name, modified_at)
+        VALUES (upper(TG_TABLE_NAME), clock_timestamp())
+        ON CONFLICT (table_name) DO UPDATE
+        SET version = v.version + 1,
+            modified_at = greatest(v.modified_at, clock_timestamp());
+        PERFORM set_config(bumped, 'yes', true);
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER user_version AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON "USER"
+    FOR EACH STATEMENT EXECUTE FUNCTION table_version_bump();
+CREATE TRIGGER caregiver_version AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON CAREGIVER
+    FOR EACH STATEMENT EXECUTE FUNCTION table_version_bump();
+CREATE TRIGGER member_version AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON MEMBER
+    FOR EACH STATEMENT EXECUTE FUNCTION table_version_bump();
+CREATE TRIGGER address_version AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON ADDRESS
+    FOR EACH STATEMENT EXECUTE FUNCTION table_version_bump();
+CREATE TRIGGER job_version AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON JOB
+    FOR EACH STATEMENT EXECUTE FUNCTION table_version_bump();
+CREATE TRIGGER job_application_version AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON JOB_APPLICATION
+    FOR EACH STATEMENT EXECUTE FUNCTION table_version_bump();
+CREATE TRIGGER appointment_version AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON APPOINTMENT
+    FOR EACH STATEMENT EXECUTE FUNCTION table_version_bump();
+
 -- Create indexes for better query performance
 CREATE INDEX idx_caregiver_type ON CAREGIVER(caregiving_type);
-CREATE INDEX idx_job_type ON JOB(required_caregiving_type);
-CREATE INDEX idx_appointment_status ON APPOINTMENT(status);
 CREATE INDEX idx_appointment_date ON APPOINTMENT(appointment_date);
 CREATE INDEX idx_user_city ON "USER"(city);
 
+-- Indexes matching the list page sort order (keyset pagination)
+CREATE INDEX idx_appointment_schedule ON APPOINTMENT(appointment_date, appointment_time, appointment_id);
+CREATE INDEX idx_job_application_job ON JOB_APPLICATION(job_id, date_applied, caregiver_user_id);
+
+-- Foreign key indexes for the joins and the cascading deletes from "USER"
+-- (JOB_APPLICATION.job_id is covered by idx_job_application_job)
+CREATE INDEX idx_appointment_caregiver ON APPOINTMENT(caregiver_user_id);
+CREATE INDEX idx_appointment_member ON APPOINTMENT(member_user_id);
+CREATE INDEX idx_job_member ON JOB(member_user_id);
+
+-- Composite indexes for filtering by status/type and sorting by date
+CREATE INDEX idx_appointment_status_schedule ON APPOINTMENT(status, appointment_date, appointment_time);
+CREATE INDEX idx_job_type_posted ON JOB(required_caregiving_type, date_posted);
+
+-- Jobs list sorted by number of applicants (keyset pagination, scanned backwards)
+CREATE INDEX idx_job_popularity ON JOB(applicant_count, job_id);
+
+-- Date range filter of the job applications list
+CREATE INDEX idx_job_application_applied ON JOB_APPLICATION(date_applied);
+
+-- A caregiver cannot have two appointments at once (declined ones aside).
+-- The GiST index behind the constraint finds a clash in O(log n).
+CREATE EXTENSION IF NOT EXISTS btree_gist;
+ALTER TABLE APPOINTMENT ADD CONSTRAINT appointment_no_overlap
+    EXCLUDE USING gist (caregiver_user_id WITH =, appointment_period WITH &&) WHERE (status <> 'declined');
+
+-- Indexes for the caregiver/member name typeahead (prefix and substring search)
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+CREATE INDEX idx_user_full_name_prefix ON "USER"(lower(given_name || ' ' || surname) text_pattern_ops);
+CREATE INDEX idx_user_full_name_trgm ON "USER" USING gin ((given_name || ' ' || surname) gin_trgm_ops);
+
+-- Full-text (ranked /search) and trigram (substring, ILIKE) indexes on the text columns
+CREATE INDEX idx_job_requirements_fts ON JOB USING gin (to_tsvector('english', coalesce(other_requirements, '')));
+CREATE INDEX idx_member_text_fts ON MEMBER USING gin (to_tsvector('english', coalesce(house_rules, '') || ' ' || coalesce(dependent_description, '')));
+CREATE INDEX idx_user_profile_fts ON "USER" USING gin (to_tsvector('english', coalesce(profile_description, '')));
+CREATE INDEX idx_job_requirements_trgm ON JOB USING gin (other_requirements gin_trgm_ops);
+CREATE INDEX idx_member_house_rules_trgm ON MEMBER USING gin (house_rules gin_trgm_ops);
+CREATE INDEX idx_member_dependent_trgm ON MEMBER USING gin (dependent_description gin_trgm_ops);
+CREATE INDEX idx_user_profile_trgm ON "USER" USING gin (profile_description gin_trgm_ops);
+
+-- Job applications with the job, member and caregiver details (query 8).
+-- No ORDER BY: readers sort, so a filtered or paginated read of the view
+-- only sorts the rows it returns.
+CREATE OR REPLACE VIEW job_applications_view AS
+SELECT
+    ja.job_id,
+    j.required_caregiving_type,
+    j.other_requirements,
+    j.date_posted,
+    u_member.given_name || ' ' || u_member.surname AS member_name,
+    ja.caregiver_user_id,
+    u_caregiver.given_name || ' ' || u_caregiver.surname AS applicant_name,
+    c.caregiving_type AS applicant_caregiving_type,
+    c.hourly_rate,
+    ja.date_applied
+FROM JOB_APPLICATION ja
+JOIN JOB j ON ja.job_id = j.job_id
+JOIN MEMBER m ON j.member_user_id = m.member_user_id
+JOIN "USER" u_member ON m.member_user_id = u_member.user_id
+JOIN CAREGIVER c ON ja.caregiver_user_id = c.caregiver_user_id
+JOIN "USER" u_caregiver ON c.caregiver_user_id = u_caregiver.user_id;
+
 -- ============================================================================
 -- PART 2: SAMPLE DATA INSERTION
 -- ============================================================================
@@ -0,0 +1,335 @@
+"""
+Database connection configuration shared by app.py and main.py
+
+Connection credentials and connection pool settings are read from
+environment variables:
+
+    DB_USER, DB_PASSWORD, DB_HOST, DB_PORT, DB_NAME
+    DB_POOL_SIZE          connections kept open per process (default 5)
+    DB_MAX_OVERFLOW       extra connections allowed under load (default 10)
+    DB_POOL_TIMEOUT       seconds to wait for a free connection (default 30)
+    DB_POOL_RECYCLE       seconds before a connection is replaced (default 1800)
+    DB_POOL_PRE_PING      test connections on checkout (default true)
+    DB_POOL_WAIT_WARNING  log checkouts that waited longer than this (default 0.5)
+
+Read replicas are optional:
+
+    DB_REPLICA_HOSTS            comma-separated host[:port] list; same user,
+                                password and database as the primary
+    DB_REPLICA_CONNECT_TIMEOUT  seconds before a replica counts as down (default 2)
+    DB_REPLICA_CHECK_INTERVAL   seconds between health checks (default 5)
+    DB_REPLICA_MAX_LAG          replicas further behind are skipped (default 10)
+
+create_replica_set() wraps them in a ReplicaSet that hands out a healthy
+replica per read, round-robin, and falls back to the primary;
+create_async_replica_engines() adds asyncpg engines for the same replicas.
+
+create_async_db_engine() builds the asyncpg engine used by asgi.py with
+the same settings; it needs the packages in requirements-async.txt.
+"""
+
+import logging
+import os
+import threading
+import time
+
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.pool import QueuePool
+
+logger = logging.getLogger(__name__)
+
+DB_USER = os.getenv('DB_USER', 'dimerryy')
+DB_PASSWORD = os.getenv('DB_PASSWORD', '')
+DB_HOST = os.getenv('DB_HOST', 'localhost')
+DB_PORT = os.getenv('DB_PORT', '5432')
+DB_NAME = os.getenv('DB_NAME', 'caregiver_platform')
+
+DATABASE_URL = f"postgresql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
+ASYNC_DATABASE_URL = f"postgresql+asyncpg://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
+
+# Render requires SSL, so add connect_args for SSL if using Render
+connect_args = {}
+async_connect_args = {}
+if 'render.com' in DB_HOST.lower() or os.getenv('RENDER'):
+    connect_args = {'sslmode': 'require'}
+    async_connect_args = {'ssl': 'require'}
+
+
+def env_flag(name, default):
+    """Read a boolean environment variable"""
+    value = os.getenv(name)
+    if value is None:
+        return default
+    return value.strip().lower() in ('1', 'true', 'yes', 'on')
+
+
+DB_REPLICA_HOSTS = [host.strip() for host in os.getenv('DB_REPLICA_HOSTS', '').split(',') if host.strip()]
+REPLICA_CONNECT_TIMEOUT = int(os.getenv('DB_REPLICA_CONNECT_TIMEOUT', '2'))
+REPLICA_CHECK_INTERVAL = float(os.getenv('DB_REPLICA_CHECK_INTERVAL', '5'))
+REPLICA_MAX_LAG = float(os.getenv('DB_REPLICA_MAX_LAG', '10'))
+
+POOL_SIZE = int(os.getenv('DB_POOL_SIZE', '5'))
+POOL_MAX_OVERFLOW = int(os.getenv('DB_MAX_OVERFLOW', '10'))
+POOL_TIMEOUT = float(os.getenv('DB_POOL_TIMEOUT', '30'))
+# Render closes idle connections, so recycle them before that happens
+POOL_RECYCLE = int(os.getenv('DB_POOL_RECYCLE', '1800'))
+POOL_PRE_PING = env_flag('DB_POOL_PRE_PING', True)
+POOL_WAIT_WARNING = float(os.getenv('DB_POOL_WAIT_WARNING', '0.5'))
+
+
+class TimedQueuePool(QueuePool):
+    """QueuePool that records how long checkouts wait for a free connection"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._wait_lock = threading.Lock()
+        self.wait_count = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self.timeouts = 0
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        except Exception:
+            with self._wait_lock:
+                self.timeouts += 1
+            raise
+        finally:
+            waited = time.perf_counter() - start
+            with self._wait_lock:
+                self.wait_count += 1
+                self.wait_total += waited
+                self.wait_max = max(self.wait_max, waited)
+            if waited > POOL_WAIT_WARNING:
+                logger.warning("Waited %.3fs for a database connection (%s)",
+                               waited, self.status())
+
+
+def create_db_engine(url=DATABASE_URL, **kwargs):
+    """Create an engine with the configured connection pool"""
+    options = {
+        'echo': False,
+        'connect_args': connect_args,
+        'poolclass': TimedQueuePool,
+        'pool_size': POOL_SIZE,
+        'max_overflow': POOL_MAX_OVERFLOW,
+        'pool_timeout': POOL_TIMEOUT,
+        'pool_recycle': POOL_RECYCLE,
+        'pool_pre_ping': POOL_PRE_PING,
+    }
+    options.update(kwargs)
+    return create_engine(url, **options)
+
+
+def create_async_db_engine(url=ASYNC_DATABASE_URL, **kwargs):
+    """Create an asyncpg engine with the same pool settings"""
+    options = {
+        'echo': False,
+        'connect_args': async_connect_args,
+        'pool_size': POOL_SIZE,
+        'max_overflow': POOL_MAX_OVERFLOW,
+        'pool_timeout': POOL_TIMEOUT,
+        'pool_recycle': POOL_RECYCLE,
+        'pool_pre_ping': POOL_PRE_PING,
+    }
+    options.update(kwargs)
+    return create_async_engine(url, **options)
+
+
+def pool_status(engine):
+    """Checked-out, idle and overflow connections plus checkout wait times"""
+    pool = engine.pool
+    status = {
+        'size': pool.size(),
+        'checked_out': pool.checkedout(),
+        'idle': pool.checkedin(),
+        'overflow': max(pool.overflow(), 0),
+        'max_overflow': getattr(pool, '_max_overflow', None),
+        'timeout': getattr(pool, '_timeout', None),
+        'recycle': pool._recycle,
+        'pre_ping': pool._pre_ping,
+    }
+    if isinstance(pool, TimedQueuePool):
+        with pool._wait_lock:
+            status.update({
+                'checkouts': pool.wait_count,
+                'timeouts': pool.timeouts,
+                'wait_avg_ms': round(1000 * pool.wait_total / pool.wait_count, 3) if pool.wait_count else 0.0,
+                'wait_max_ms': round(1000 * pool.wait_max, 3),
+            })
+    return status
+
+
+# ============================================================================
+# READ REPLICAS
+# ============================================================================
+
+# Seconds of replay lag; 0 when the replica has replayed everything it
+# received (an idle primary would otherwise look like growing lag)
+REPLICA_LAG = text("""
+    SELECT CASE
+        WHEN NOT pg_is_in_recovery() THEN 0
+        WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp())
+    END
+""")
+PRIMARY_LSN = text("SELECT pg_current_wal_lsn()::text")
+REPLAYED_LSN = text("""
+    SELECT CASE WHEN pg_is_in_recovery()
+                THEN pg_last_wal_replay_lsn() >= CAST(:lsn AS pg_lsn)
+                ELSE true END
+""")
+
+
+def replica_url(host, driver='postgresql'):
+    """DATABASE_URL with the host (and optionally port) of a replica"""
+    host, _, port = host.partition(':')
+    return f"{driver}://{DB_USER}:{DB_PASSWORD}@{host}:{port or DB_PORT}/{DB_NAME}"
+
+
+class Replica:
+    """A replica engine and the result of its last health check"""
+
+    def __init__(self, name, engine):
+        self.name = name
+        self.engine = engine
+        self.healthy = True
+        self.lag = None
+        self.error = None
+        self.checked_at = 0.0
+        event.listen(engine, 'handle_error', self._on_error)
+
+    def _on_error(self, context):
+        """A lost connection takes the replica out of rotation until its next check"""
+        if context.is_disconnect:
+            self.healthy = False
+            self.error = 'disconnected'
+            self.checked_at = time.monotonic()
+
+    def check(self):
+        """Connect and measure replication lag; never raises"""
+        try:
+            with self.engine.connect() as connection:
+                lag = connection.execute(REPLICA_LAG).scalar()
+            self.lag = float('inf') if lag is None else float(lag)
+            self.healthy = self.lag <= REPLICA_MAX_LAG
+            self.error = None if self.healthy else f'lag {self.lag:.1f}s'
+        except Exception as e:
+            self.healthy = False
+            self.error = str(e).splitlines()[0] if str(e) else type(e).__name__
+        if not self.healthy:
+            logger.warning("Replica %s unavailable: %s", self.name, self.error)
+        return self.healthy
+
+    def has_replayed(self, lsn):
+        """Whether the replica has replayed the primary's WAL up to lsn"""
+        try:
+            with self.engine.connect() as connection:
+                return bool(connection.execute(REPLAYED_LSN, {'lsn': lsn}).scalar())
+        except Exception:
+            return False
+
+
+class ReplicaSet:
+    """
+    Round-robin over the replicas that passed their last health check.
+
+    Each replica is re-checked at most every REPLICA_CHECK_INTERVAL seconds,
+    by whichever request picks it first after that; the others keep using
+    the previous result meanwhile. When no replica is healthy every read
+    goes to the primary.
+    """
+
+    def __init__(self, primary, replicas=()):
+        self.primary = primary
+        self.replicas = list(replicas)
+        self.reads = {'replica': 0, 'primary': 0}
+        self._next = 0
+        self._lock = threading.Lock()
+
+    def __bool__(self):
+        return bool(self.replicas)
+
+    def _candidates(self):
+        """The replicas in round-robin order, starting after the last one used"""
+        with self._lock:
+            start = self._next
+            self._next = (self._next + 1) % max(len(self.replicas), 1)
+        return self.replicas[start:] + self.replicas[:start]
+
+    def _due(self, replica):
+        """Claim the next health check of replica, so only one caller runs it"""
+        with self._lock:
+            if time.monotonic() - replica.checked_at < REPLICA_CHECK_INTERVAL:
+                return False
+            replica.checked_at = time.monotonic()
+            return True
+
+    def _count(self, kind):
+        with self._lock:
+            self.reads[kind] += 1
+
+    def engine_for_read(self, lsn=None):
+        """
+        Engine for a read-only unit of work.
+
+        With lsn (from primary_lsn()) only a replica that has replayed the
+        primary's writes up to that point qualifies.
+        """
+        for replica in self._candidates():
+            if self._due(replica):
+                replica.check()
+            if replica.healthy and (lsn is None or replica.has_replayed(lsn)):
+                self._count('replica')
+                return replica.engine
+        self._count('primary')
+        return self.primary
+
+    def primary_lsn(self):
+        """Current WAL position of the primary, for engine_for_read(lsn=...)"""
+        with self.primary.connect() as connection:
+            return connection.execute(PRIMARY_LSN).scalar()
+
+    def status(self):
+        """Health of every replica plus how many reads each side served"""
+        with self._lock:
+            reads = dict(self.reads)
+        return {
+            'reads': reads,
+            'replicas': [{
+                'name': replica.name,
+                'healthy': replica.healthy,
+                'lag_seconds': replica.lag,
+                'error': replica.error,
+                'pool': pool_status(replica.engine),
+            } for replica in self.replicas],
+        }
+
+
+def create_replica_set(primary, hosts=DB_REPLICA_HOSTS, **kwargs):
+    """ReplicaSet over one engine per DB_REPLICA_HOSTS entry (none by default)"""
+    options = {'connect_args': dict(connect_args, connect_timeout=REPLICA_CONNECT_TIMEOUT)}
+    options.update(kwargs)
+    return ReplicaSet(primary, [Replica(host, create_db_engine(replica_url(host), **options))
+                                for host in hosts])
+
+
+def create_async_replica_engines(replica_set, **kwargs):
+    """
+    {replica engine: asyncpg engine on the same host} for asgi.py.
+
+    The ReplicaSet keeps choosing (and health-checking) by the sync engines;
+    a lost connection on the asyncpg engine takes the replica out of
+    rotation as well.
+    """
+    options = {'connect_args': dict(async_connect_args, timeout=REPLICA_CONNECT_TIMEOUT)}
+    options.update(kwargs)
+    engines = {}
+    for replica in replica_set.replicas:
+        async_engine = create_async_db_engine(replica_url(replica.name, 'postgresql+asyncpg'), **options)
+        event.listen(async_engine.sync_engine, 'handle_error', replica._on_error)
+        engines[replica.engine] = async_engine
+    return engines
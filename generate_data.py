@@ -0,0 +1,366 @@
+"""
+Synthetic dataset generator for capacity testing
+
+Recreates the tables from schema.sql and fills every table with a
+production-sized dataset of N users, loaded with COPY (see bulk_load.py).
+Indexes are created after the data, then sequences are reset and the
+tables analyzed.
+
+Every FK and CHECK constraint in schema.sql holds: caregivers and members
+are disjoint subsets of the users, every member has at most one address
+in their own city, applications are unique per (caregiver, job) and
+usually come from caregivers of the job's caregiving type, and statuses
+and dates follow a realistic mix (past appointments are mostly completed,
+future ones pending or confirmed), and no caregiver has two appointments
+on the same day.
+
+Rows are generated lazily, so memory stays around a few bytes per user
+and job even for 10M users. The same --seed always produces the same data.
+
+Usage:
+    python generate_data.py [DATABASE_URL] --users 1000000
+    python generate_data.py --users 10000000 --jobs-per-member 2 --seed 7
+
+THIS DROPS AND RECREATES ALL TABLES in the target database.
+"""
+
+import argparse
+import math
+import random
+import sys
+import time
+from array import array
+from datetime import date, timedelta
+
+from bulk_load import BATCH_SIZE, CREATE_INDEX, Progress, copy_rows, create_indexes, create_load_engine
+from db import DATABASE_URL
+from sql_script import iter_statements
+
+CAREGIVING_TYPES = ['babysitter', 'elderly care', 'playmate for children']
+
+# Share of caregivers offering each type, and of jobs asking for it
+CAREGIVER_TYPE_WEIGHTS = [45, 35, 20]
+JOB_TYPE_WEIGHTS = [40, 45, 15]
+
+# Median hourly rate per caregiving type; rates are log-normal around it
+HOURLY_RATE_MEDIANS = [9.0, 12.5, 8.0]
+HOURLY_RATE_SIGMA = 0.25
+
+CITIES = ['Almaty', 'Astana', 'Shymkent', 'Karaganda', 'Aktobe', 'Taraz', 'Pavlodar',
+          'Oskemen', 'Semey', 'Atyrau', 'Kostanay', 'Kyzylorda']
+CITY_WEIGHTS = [30, 25, 10, 6, 5, 4, 4, 4, 3, 3, 3, 3]
+
+GIVEN_NAMES = ['Aigerim', 'Arman', 'Amina', 'Dana', 'Daniyar', 'Aruzhan', 'Nurlan', 'Madina',
+               'Yerlan', 'Zhanna', 'Timur', 'Aliya', 'Askar', 'Saule', 'Bekzat', 'Dinara',
+               'Maria', 'John', 'Anna', 'Olga', 'Ivan', 'Elena', 'Sergey', 'Gulnara',
+               'Talgat', 'Kamila', 'Ruslan', 'Asel', 'Marat', 'Laura']
+SURNAMES = ['Armanov', 'Aminova', 'Nurlanov', 'Akhmetova', 'Zhaksybekov', 'Omarova', 'Iskakov',
+            'Sadykova', 'Tulegenov', 'Kassymova', 'Garcia', 'Smith', 'Kim', 'Ivanova',
+            'Petrov', 'Abenova', 'Serikbayev', 'Mukhanova', 'Bekov', 'Talgatov']
+STREETS = ['Abay Avenue', 'Kabanbay Batyr', 'Turan Avenue', 'Mangilik El', 'Dostyk Avenue',
+           'Al-Farabi Avenue', 'Tole Bi', 'Satpayev Street', 'Kenesary', 'Respublika Avenue']
+
+PROFILE_DESCRIPTIONS = [
+    'Experienced babysitter with {years} years of experience',
+    'Professional caregiver for elderly, certified nurse',
+    'Creative playmate, loves arts and crafts',
+    'Patient and caring, first aid certified',
+    'Former teacher, {years} years with children',
+    None,
+]
+HOUSE_RULES = [
+    'No pets.', 'No smoking. Please remove shoes at entrance.', 'No pets. Quiet hours after 9pm.',
+    'Please be punctual.', 'No phone use while caring for the children.', None,
+]
+DEPENDENT_DESCRIPTIONS = [
+    'I have a {age}-year old son who likes painting.',
+    'I have a {age}-year old daughter who needs help with homework.',
+    'My {age}-year old mother needs assistance with daily activities.',
+    'My father is {age} and needs company during the day.',
+    'Twins aged {age} who love outdoor games.',
+]
+OTHER_REQUIREMENTS = [
+    'Must be patient and soft-spoken with children.',
+    'Experience with elderly care required.',
+    'Should be available on weekends.',
+    'Non-smoker, first aid certificate preferred.',
+    'Soft-spoken and calm, experience with special needs.',
+    None,
+]
+
+# Past appointments are mostly completed, future ones pending or confirmed
+PAST_STATUSES = (['completed', 'confirmed', 'declined'], [70, 15, 15])
+FUTURE_STATUSES = (['pending', 'confirmed', 'declined'], [55, 35, 10])
+WORK_HOURS = ['1.00', '1.50', '2.00', '2.50', '3.00', '3.50', '4.00', '5.00', '6.00', '8.00']
+WORK_HOURS_WEIGHTS = [4, 6, 14, 14, 18, 12, 14, 8, 6, 4]
+
+# Appointments fall in the APPOINTMENT_DAYS days ending 60 days from today.
+# A caregiver's k-th appointment is on day (start + 7k) of that window, with
+# a start derived from the caregiver id, so no caregiver works twice on one
+# day and appointment_no_overlap holds (the latest shift, 20:00 plus 8 hours,
+# ends before the earliest one, 07:00, of the next day). 7 and the start
+# multiplier are coprime with 426, so every day of the window gets used.
+APPOINTMENT_DAYS = 426
+APPOINTMENT_DAY_STRIDE = 7
+
+# Caregiving type of a caregiver is type_by_bucket[caregiver_user_id % 20],
+# so caregivers of a given type can be drawn without keeping a list of them
+TYPE_BUCKETS = 20
+
+# Serial columns whose sequences are moved past the generated ids
+SERIAL_COLUMNS = [('"USER"', 'user_id'), ('JOB', 'job_id'), ('APPOINTMENT', 'appointment_id')]
+
+
+def poisson(rng, mean):
+    """Poisson-distributed count (Knuth's method, fine for small means)"""
+    limit = math.exp(-mean)
+    count = 0
+    product = rng.random()
+    while product > limit:
+        count += 1
+        product *= rng.random()
+    return count
+
+
+class DataGenerator:
+    """Lazily generates the rows of every table for a dataset of N users"""
+
+    def __init__(self, users, caregiver_share=0.4, jobs_per_member=1.5,
+                 applications_per_job=3.0, appointments_per_member=2.0, seed=341, today=None):
+        self.users = users
+        self.caregivers = max(1, int(users * caregiver_share))
+        self.members = users - self.caregivers
+        if self.members < 1:
+            raise ValueError('Need at least one member; lower --caregiver-share or add --users')
+        self.jobs_per_member = jobs_per_member
+        self.applications_per_job = applications_per_job
+        self.appointments_per_member = appointments_per_member
+        self.rng = random.Random(seed)
+        self.today = today or date.today()
+
+        self.type_by_bucket = self._buckets(CAREGIVER_TYPE_WEIGHTS)
+        self.buckets_by_type = [[b for b in range(TYPE_BUCKETS) if self.type_by_bucket[b] == t]
+                                for t in range(len(CAREGIVING_TYPES))]
+
+        # Compact per-row state needed by later tables
+        self.user_city = array('B')
+        self.job_type = array('B')
+        self.job_posted = array('i')
+
+    def _buckets(self, weights):
+        """Spread TYPE_BUCKETS buckets over the types in proportion to weights"""
+        total = sum(weights)
+        buckets = []
+        for type_index, weight in enumerate(weights):
+            buckets += [type_index] * round(TYPE_BUCKETS * weight / total)
+        return (buckets + [0] * TYPE_BUCKETS)[:TYPE_BUCKETS]
+
+    def caregiver_type(self, caregiver_id):
+        return self.type_by_bucket[caregiver_id % TYPE_BUCKETS]
+
+    def random_caregiver(self, type_index=None):
+        """Random caregiver id, optionally of one caregiving type"""
+        if type_index is not None and self.buckets_by_type[type_index]:
+            # Ids in bucket b are b, b + 20, b + 40, ... (bucket 0 starts at 20)
+            first = self.rng.choice(self.buckets_by_type[type_index]) or TYPE_BUCKETS
+            if first <= self.caregivers:
+                return first + TYPE_BUCKETS * self.rng.randint(0, (self.caregivers - first) // TYPE_BUCKETS)
+        return self.rng.randint(1, self.caregivers)
+
+    def past_date(self, days):
+        return self.today - timedelta(days=self.rng.randint(0, days))
+
+    # ------------------------------------------------------------------
+    # Tables, in foreign key order
+    # ------------------------------------------------------------------
+
+    def user_rows(self):
+        rng = self.rng
+        for user_id in range(1, self.users + 1):
+            given_name = rng.choice(GIVEN_NAMES)
+            surname = rng.choice(SURNAMES)
+            city = rng.choices(range(len(CITIES)), CITY_WEIGHTS)[0]
+            self.user_city.append(city)
+            description = rng.choice(PROFILE_DESCRIPTIONS)
+            yield (
+                user_id,
+                f'{given_name}.{surname}.{user_id}@example.com'.lower(),
+                given_name,
+                surname,
+                CITIES[city],
+                f'+770{rng.randint(0, 99999999):08d}',
+                description.format(years=rng.randint(1, 20)) if description else None,
+                'pass123',
+            )
+
+    def caregiver_rows(self):
+        rng = self.rng
+        for caregiver_id in range(1, self.caregivers + 1):
+            type_index = self.caregiver_type(caregiver_id)
+            rate = HOURLY_RATE_MEDIANS[type_index] * math.exp(rng.gauss(0, HOURLY_RATE_SIGMA))
+            yield (
+                caregiver_id,
+                f'caregiver_{caregiver_id}.jpg' if rng.random() < 0.8 else None,
+                'Female' if rng.random() < 0.7 else 'Male',
+                CAREGIVING_TYPES[type_index],
+                f'{rate:.2f}',
+            )
+
+    def member_rows(self):
+        rng = self.rng
+        for member_id in range(self.caregivers + 1, self.users + 1):
+            yield (
+                member_id,
+                rng.choice(HOUSE_RULES),
+                rng.choice(DEPENDENT_DESCRIPTIONS).format(age=rng.randint(2, 90)),
+            )
+
+    def address_rows(self):
+        rng = self.rng
+        for member_id in range(self.caregivers + 1, self.users + 1):
+            if rng.random() < 0.97:
+                yield (
+                    member_id,
+                    str(rng.randint(1, 250)),
+                    rng.choice(STREETS),
+                    CITIES[self.user_city[member_id - 1]],
+                )
+
+    def job_rows(self):
+        rng = self.rng
+        job_id = 0
+        for member_id in range(self.caregivers + 1, self.users + 1):
+            for _ in range(poisson(rng, self.jobs_per_member)):
+                job_id += 1
+                type_index = rng.choices(range(len(CAREGIVING_TYPES)), JOB_TYPE_WEIGHTS)[0]
+                posted = self.past_date(730)
+                self.job_type.append(type_index)
+                self.job_posted.append(posted.toordinal())
+                yield (job_id, member_id, CAREGIVING_TYPES[type_index],
+                       rng.choice(OTHER_REQUIREMENTS), posted)
+
+    def job_application_rows(self):
+        rng = self.rng
+        for job_index, type_index in enumerate(self.job_type):
+            count = min(poisson(rng, self.applications_per_job), self.caregivers)
+            posted = date.fromordinal(self.job_posted[job_index])
+            applicants = set()
+            while len(applicants) < count:
+                # Most applicants offer the caregiving type the job asks for
+                applicants.add(self.random_caregiver(type_index if rng.random() < 0.85 else None))
+            for caregiver_id in sorted(applicants):
+                applied = min(posted + timedelta(days=rng.randint(0, 30)), self.today)
+                yield (caregiver_id, job_index + 1, applied)
+
+    def appointment_rows(self):
+        rng = self.rng
+        appointment_id = 0
+        first_day = self.today + timedelta(days=60 - APPOINTMENT_DAYS + 1)
+        booked = array('H', [0]) * (self.caregivers + 1)
+        for member_id in range(self.caregivers + 1, self.users + 1):
+            for _ in range(poisson(rng, self.appointments_per_member)):
+                caregiver_id = self.random_caregiver()
+                if booked[caregiver_id] >= APPOINTMENT_DAYS:
+                    continue
+                offset = (caregiver_id * 151 + booked[caregiver_id] * APPOINTMENT_DAY_STRIDE) % APPOINTMENT_DAYS
+                booked[caregiver_id] += 1
+                appointment_id += 1
+                day = first_day + timedelta(days=offset)
+                statuses, weights = PAST_STATUSES if day < self.today else FUTURE_STATUSES
+                minutes = 7 * 60 + 30 * rng.randint(0, 26)
+                yield (
+                    appointment_id,
+                    caregiver_id,
+                    member_id,
+                    day,
+                    f'{minutes // 60:02d}:{minutes % 60:02d}:00',
+                    rng.choices(WORK_HOURS, WORK_HOURS_WEIGHTS)[0],
+                    rng.choices(statuses, weights)[0],
+                )
+
+    def tables(self):
+        """(table, columns, rows) for every table, parents first"""
+        yield ('"USER"', ['user_id', 'email', 'given_name', 'surname', 'city', 'phone_number',
+                          'profile_description', 'password'], self.user_rows())
+        yield ('CAREGIVER', ['caregiver_user_id', 'photo', 'gender', 'caregiving_type', 'hourly_rate'],
+               self.caregiver_rows())
+        yield ('MEMBER', ['member_user_id', 'house_rules', 'dependent_description'], self.member_rows())
+        yield ('ADDRESS', ['member_user_id', 'house_number', 'street', 'town'], self.address_rows())
+        yield ('JOB', ['job_id', 'member_user_id', 'required_caregiving_type', 'other_requirements',
+                       'date_posted'], self.job_rows())
+        yield ('JOB_APPLICATION', ['caregiver_user_id', 'job_id', 'date_applied'],
+               self.job_application_rows())
+        yield ('APPOINTMENT', ['appointment_id', 'caregiver_user_id', 'member_user_id', 'appointment_date',
+                               'appointment_time', 'work_hours', 'status'], self.appointment_rows())
+
+
+def generate(engine, generator, schema_path='schema.sql', batch_size=BATCH_SIZE):
+    """Recreate the schema and COPY the generated rows; returns rows loaded"""
+    started = time.perf_counter()
+    total = 0
+    indexes = []
+
+    raw = engine.raw_connection()
+    try:
+        cursor = raw.cursor()
+        # A failed run is simply started again, so skip waiting for WAL flushes
+        cursor.execute('SET synchronous_commit TO OFF')
+
+        print(f"Recreating tables from {schema_path} (indexes deferred)...")
+        for statement in iter_statements(schema_path):
+            if CREATE_INDEX.match(statement):
+                indexes.append(statement)
+            else:
+                cursor.execute(statement)
+        raw.commit()
+
+        print(f"Generating {generator.users:,} users "
+              f"({generator.caregivers:,} caregivers, {generator.members:,} members)...")
+        for table, columns, rows in generator.tables():
+            progress = Progress(table)
+            total += copy_rows(cursor, table, columns, rows, batch_size, progress)
+            progress.done()
+            raw.commit()
+
+        for table, column in SERIAL_COLUMNS:
+            cursor.execute(f"SELECT setval(pg_get_serial_sequence('{table}', '{column}'), "
+                           f"COALESCE(MAX({column}), 0) + 1, false) FROM {table}")
+        create_indexes(cursor, indexes)
+        raw.commit()
+    except Exception:
+        raw.rollback()
+        raise
+    finally:
+        raw.close()
+
+    elapsed = time.perf_counter() - started
+    print(f"✓ Generated {total:,} rows in {elapsed:.1f}s ({total / elapsed if elapsed else 0:,.0f} rows/sec)")
+    return total
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Fill the database with a synthetic dataset')
+    parser.add_argument('database_url', nargs='?', default=DATABASE_URL)
+    parser.add_argument('--users', type=int, default=100000, help='total users (default 100000)')
+    parser.add_argument('--caregiver-share', type=float, default=0.4,
+                        help='fraction of users who are caregivers (default 0.4)')
+    parser.add_argument('--jobs-per-member', type=float, default=1.5)
+    parser.add_argument('--applications-per-job', type=float, default=3.0)
+    parser.add_argument('--appointments-per-member', type=float, default=2.0)
+    parser.add_argument('--seed', type=int, default=341)
+    parser.add_argument('--schema', default='schema.sql')
+    parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+    args = parser.parse_args()
+
+    generator = DataGenerator(args.users, args.caregiver_share, args.jobs_per_member,
+                              args.applications_per_job, args.appointments_per_member, args.seed)
+    engine = create_load_engine(args.database_url)
+    try:
+        generate(engine, generator, args.schema, args.batch_size)
+    finally:
+        engine.dispose()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
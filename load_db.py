@@ -5,10 +5,18 @@ Use this if you're deploying to PythonAnywhere with ElephantSQL or similar
 
 from sqlalchemy import create_engine, text
 import sys
+import os
+
+import bulk_load
+from sql_script import execute_script
 
 # Get database URL from command line or update here
-if len(sys.argv) > 1:
-    DATABASE_URL = sys.argv[1]
+# --bulk loads the data with COPY and builds indexes afterwards (see bulk_load.py)
+BULK = '--bulk' in sys.argv
+args = [arg for arg in sys.argv[1:] if arg != '--bulk']
+
+if args:
+    DATABASE_URL = args[0]
 else:
     # Update these with your database credentials
     # For Supabase: user='postgres', host='db.xxxxx.supabase.co', db='postgres'
@@ -27,32 +35,20 @@ print("Connecting to database...")
 engine = create_engine(DATABASE_URL)
 
 try:
-    # Read database.sql file
-    with open('database.sql', 'r', encoding='utf-8') as f:
-        sql_content = f.read()
-    
-    # Remove comments and split by semicolon
-    lines = []
-    for line in sql_content.split('\n'):
-        stripped = line.strip()
-        if stripped and not stripped.startswith('--'):
-            lines.append(line)
-    
-    cleaned_sql = '\n'.join(lines)
-    statements = [stmt.strip() for stmt in cleaned_sql.split(';') if stmt.strip()]
-    
-    print(f"Executing {len(statements)} SQL statements...")
-    
-    with engine.connect() as conn:
-        for i, statement in enumerate(statements, 1):
-            if statement:
-                try:
-                    conn.execute(text(statement))
-                    if i % 10 == 0:
-                        print(f"  Processed {i}/{len(statements)} statements...")
-                except Exception as e:
-                    print(f"  Warning on statement {i}: {e}")
-        conn.commit()
+    if BULK:
+        bulk_load.load_file(engine, 'database.sql')
+    else:
+        # Statements are streamed from the file; each runs in a savepoint so
+        # a failing statement is reported without aborting the load
+        print("Executing SQL statements from database.sql...")
+
+        def report_error(i, statement, e):
+            print(f"  Warning on statement {i}: {e}")
+
+        with engine.connect() as conn:
+            count = execute_script(conn, 'database.sql', on_error=report_error,
+                                   progress=lambda i: print(f"  Processed {i} statements..."))
+        print(f"Executed {count} SQL statements")
     
     print("✓ Database schema loaded successfully!")
     
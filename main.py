@@ -14,65 +14,35 @@ This script executes all required database operations:
 - View operation
 """
 
-from sqlalchemy import create_engine, text
 from sqlalchemy.orm import sessionmaker
-import os
 from pathlib import Path
 
-# Database connection configuration
-# Update these values according to your PostgreSQL setup
-DB_USER = os.getenv('DB_USER', 'dimerryy')
-DB_PASSWORD = os.getenv('DB_PASSWORD', '')
-DB_HOST = os.getenv('DB_HOST', 'localhost')
-DB_PORT = os.getenv('DB_PORT', '5432')
-DB_NAME = os.getenv('DB_NAME', 'caregiver_platform')
-
-# Create database connection string
-DATABASE_URL = f"postgresql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
+from db import create_db_engine, create_replica_set
+from sql_script import execute_script
+import queries
 
 # Create engine and session
-# Render requires SSL, so add connect_args for SSL if using Render
-connect_args = {}
-if 'render.com' in DB_HOST.lower() or os.getenv('RENDER'):
-    connect_args = {'sslmode': 'require'}
-
-engine = create_engine(DATABASE_URL, echo=False, connect_args=connect_args)
+# Connection settings come from the DB_* environment variables (see db.py)
+engine = create_db_engine()
 Session = sessionmaker(bind=engine)
 session = Session()
 
-
-def read_sql_file(file_path):
-    """Read SQL file and return its contents"""
-    sql_file = Path(file_path)
-    if not sql_file.exists():
-        raise FileNotFoundError(f"SQL file not found: {file_path}")
-    return sql_file.read_text(encoding='utf-8')
+# Sections 5-7 only read, so main() moves them to a replica (DB_REPLICA_HOSTS)
+# that has already replayed the writes of sections 1-4, if there is one
+replicas = create_replica_set(engine)
+report_session = session
 
 
 def execute_sql_file(file_path, description=""):
-    """Execute SQL statements from a file"""
+    """Execute SQL statements from a file, streaming them one at a time"""
     if description:
         print(f"{description}")
-    sql_content = read_sql_file(file_path)
-    
-    # Remove comments (lines starting with --) and empty lines
-    lines = []
-    for line in sql_content.split('\n'):
-        stripped = line.strip()
-        # Skip comment-only lines and empty lines
-        if stripped and not stripped.startswith('--'):
-            lines.append(line)
-    
-    # Rejoin and split by semicolon to get individual statements
-    cleaned_sql = '\n'.join(lines)
-    statements = [stmt.strip() for stmt in cleaned_sql.split(';') if stmt.strip()]
-    
+    if not Path(file_path).exists():
+        raise FileNotFoundError(f"SQL file not found: {file_path}")
+
     try:
-        for statement in statements:
-            if statement:  # Skip empty statements
-                # Execute each statement
-                session.execute(text(statement))
-        session.commit()
+        # Commits every SQL_BATCH_STATEMENTS statements (see sql_script.py)
+        execute_script(session, file_path)
         return True
     except Exception as e:
         session.rollback()
@@ -86,12 +56,12 @@ def print_section(title):
     print("="*80 + "\n")
 
 
-def execute_and_print(query, description):
-    """Helper function to execute query and print results"""
+def execute_and_print(query, description, db=None):
+    """Helper function to execute a registered query and print results"""
     print(f"\n{description}")
     print("-" * 80)
     try:
-        result = session.execute(text(query))
+        result = query.execute(db or report_session)
         rows = result.fetchall()
         
         if rows:
@@ -160,23 +130,13 @@ def update_operations():
     
     # 3.1 Update phone number of Arman Armanov
     print("\n3.1 Updating phone number of Arman Armanov to +77773414141")
-    update_phone_query = """
-    UPDATE "USER"
-    SET phone_number = '+77773414141'
-    WHERE given_name = 'Arman' AND surname = 'Armanov';
-    """
     try:
-        result = session.execute(text(update_phone_query))
+        result = queries.UPDATE_ARMAN_PHONE.execute(session)
         session.commit()
         print(f"✓ Updated {result.rowcount} row(s)")
         
         # Verify the update
-        verify_query = """
-        SELECT user_id, given_name, surname, phone_number
-        FROM "USER"
-        WHERE given_name = 'Arman' AND surname = 'Armanov';
-        """
-        execute_and_print(verify_query, "Verification - Arman Armanov's phone number:")
+        execute_and_print(queries.VERIFY_ARMAN_PHONE, "Verification - Arman Armanov's phone number:")
     except Exception as e:
         session.rollback()
         print(f"✗ Error updating phone number: {e}")
@@ -185,29 +145,13 @@ def update_operations():
     print("\n3.2 Adding commission fee to Caregivers' hourly rates")
     print("    - If hourly_rate < $10: add $0.3")
     print("    - If hourly_rate >= $10: add 10%")
-    update_commission_query = """
-    UPDATE CAREGIVER
-    SET hourly_rate = CASE
-        WHEN hourly_rate < 10 THEN hourly_rate + 0.3
-        ELSE hourly_rate * 1.10
-    END;
-    """
     try:
-        result = session.execute(text(update_commission_query))
+        result = queries.ADD_COMMISSION.execute(session)
         session.commit()
         print(f"✓ Updated {result.rowcount} caregiver(s)")
         
         # Show updated rates
-        verify_query = """
-        SELECT caregiver_user_id, 
-               u.given_name || ' ' || u.surname AS caregiver_name,
-               caregiving_type,
-               hourly_rate
-        FROM CAREGIVER c
-        JOIN "USER" u ON c.caregiver_user_id = u.user_id
-        ORDER BY caregiver_user_id;
-        """
-        execute_and_print(verify_query, "Verification - Updated hourly rates:")
+        execute_and_print(queries.CAREGIVER_RATES, "Verification - Updated hourly rates:")
     except Exception as e:
         session.rollback()
         print(f"✗ Error updating commission: {e}")
@@ -223,62 +167,48 @@ def delete_operations():
     
     # 4.1 Delete jobs posted by Amina Aminova
     print("\n4.1 Deleting jobs posted by Amina Aminova")
-    delete_jobs_query = """
-    DELETE FROM JOB
-    WHERE member_user_id IN (
-        SELECT member_user_id
-        FROM MEMBER m
-        JOIN "USER" u ON m.member_user_id = u.user_id
-        WHERE u.given_name = 'Amina' AND u.surname = 'Aminova'
-    );
-    """
     try:
-        result = session.execute(text(delete_jobs_query))
+        result = queries.DELETE_AMINA_JOBS.execute(session)
         session.commit()
         print(f"✓ Deleted {result.rowcount} job(s)")
         
         # Verify deletion
-        verify_query = """
-        SELECT j.job_id, u.given_name, u.surname, j.required_caregiving_type
-        FROM JOB j
-        JOIN MEMBER m ON j.member_user_id = m.member_user_id
-        JOIN "USER" u ON m.member_user_id = u.user_id
-        WHERE u.given_name = 'Amina' AND u.surname = 'Aminova';
-        """
-        execute_and_print(verify_query, "Verification - Remaining jobs by Amina Aminova:")
+        execute_and_print(queries.VERIFY_AMINA_JOBS, "Verification - Remaining jobs by Amina Aminova:")
     except Exception as e:
         session.rollback()
         print(f"✗ Error deleting jobs: {e}")
     
     # 4.2 Delete members who live on Kabanbay Batyr street
     print("\n4.2 Deleting members who live on Kabanbay Batyr street")
-    delete_members_query = """
-    DELETE FROM MEMBER
-    WHERE member_user_id IN (
-        SELECT a.member_user_id
-        FROM ADDRESS a
-        WHERE a.street = 'Kabanbay Batyr Avenue'
-    );
-    """
     try:
-        result = session.execute(text(delete_members_query))
+        result = queries.DELETE_KABANBAY_MEMBERS.execute(session)
         session.commit()
         print(f"✓ Deleted {result.rowcount} member(s)")
         
         # Verify deletion
-        verify_query = """
-        SELECT m.member_user_id, u.given_name, u.surname, a.street
-        FROM MEMBER m
-        JOIN "USER" u ON m.member_user_id = u.user_id
-        LEFT JOIN ADDRESS a ON m.member_user_id = a.member_user_id
-        WHERE a.street = 'Kabanbay Batyr Avenue';
-        """
-        execute_and_print(verify_query, "Verification - Remaining members on Kabanbay Batyr Avenue:")
+        execute_and_print(queries.VERIFY_KABANBAY_MEMBERS, "Verification - Remaining members on Kabanbay Batyr Avenue:")
     except Exception as e:
         session.rollback()
         print(f"✗ Error deleting members: {e}")
 
 
+# ============================================================================
+# REPORTS ON A REPLICA
+# ============================================================================
+
+def open_report_session():
+    """Point the report sections at a replica that has caught up with the writes so far"""
+    global report_session
+    if not replicas:
+        return
+    report_engine = replicas.engine_for_read(lsn=replicas.primary_lsn())
+    if report_engine is not engine:
+        report_session = Session(bind=report_engine)
+        print(f"Reports read from replica {report_engine.url.host}")
+    else:
+        print("No replica has caught up; reports read from the primary")
+
+
 # ============================================================================
 # 5. SIMPLE QUERIES
 # ============================================================================
@@ -288,67 +218,17 @@ def simple_queries():
     print_section("5. SIMPLE QUERIES")
     
     # 5.1 Select caregiver and member names for accepted appointments
-    query_5_1 = """
-    SELECT 
-        u1.given_name || ' ' || u1.surname AS caregiver_name,
-        u2.given_name || ' ' || u2.surname AS member_name,
-        a.appointment_date,
-        a.appointment_time,
-        a.work_hours
-    FROM APPOINTMENT a
-    JOIN CAREGIVER c ON a.caregiver_user_id = c.caregiver_user_id
-    JOIN "USER" u1 ON c.caregiver_user_id = u1.user_id
-    JOIN MEMBER m ON a.member_user_id = m.member_user_id
-    JOIN "USER" u2 ON m.member_user_id = u2.user_id
-    WHERE a.status = 'confirmed'
-    ORDER BY a.appointment_date, a.appointment_time;
-    """
-    execute_and_print(query_5_1, "5.1 Caregiver and member names for accepted appointments:")
+    execute_and_print(queries.QUERY_5_1, "5.1 Caregiver and member names for accepted appointments:")
     
     # 5.2 List job ids that contain 'soft-spoken' in their other requirements
-    query_5_2 = """
-    SELECT job_id, required_caregiving_type, other_requirements
-    FROM JOB
-    WHERE other_requirements ILIKE '%soft-spoken%'
-    ORDER BY job_id;
-    """
-    execute_and_print(query_5_2, "5.2 Job IDs containing 'soft-spoken' in other requirements:")
+    execute_and_print(queries.QUERY_5_2, "5.2 Job IDs containing 'soft-spoken' in other requirements:")
     
     # 5.3 List the work hours of all babysitter positions
     # Note: "babysitter positions" likely refers to appointments with babysitter caregivers
-    query_5_3 = """
-    SELECT 
-        a.appointment_id,
-        u.given_name || ' ' || u.surname AS caregiver_name,
-        a.appointment_date,
-        a.work_hours,
-        a.status
-    FROM APPOINTMENT a
-    JOIN CAREGIVER c ON a.caregiver_user_id = c.caregiver_user_id
-    JOIN "USER" u ON c.caregiver_user_id = u.user_id
-    WHERE c.caregiving_type = 'babysitter'
-    ORDER BY a.appointment_date;
-    """
-    execute_and_print(query_5_3, "5.3 Work hours of all babysitter positions:")
+    execute_and_print(queries.QUERY_5_3, "5.3 Work hours of all babysitter positions:")
     
     # 5.4 List members looking for Elderly Care in Astana with "No pets." rule
-    query_5_4 = """
-    SELECT 
-        u.user_id,
-        u.given_name || ' ' || u.surname AS member_name,
-        u.city,
-        m.house_rules,
-        j.job_id,
-        j.required_caregiving_type
-    FROM MEMBER m
-    JOIN "USER" u ON m.member_user_id = u.user_id
-    JOIN JOB j ON m.member_user_id = j.member_user_id
-    WHERE u.city = 'Astana'
-      AND j.required_caregiving_type = 'elderly care'
-      AND m.house_rules ILIKE '%No pets%'
-    ORDER BY u.surname, u.given_name;
-    """
-    execute_and_print(query_5_4, "5.4 Members looking for Elderly Care in Astana with 'No pets' rule:")
+    execute_and_print(queries.QUERY_5_4, "5.4 Members looking for Elderly Care in Astana with 'No pets' rule:")
 
 
 # ============================================================================
@@ -360,85 +240,18 @@ def complex_queries():
     print_section("6. COMPLEX QUERIES")
     
     # 6.1 Count the number of applicants for each job posted by a member
-    query_6_1 = """
-    SELECT 
-        j.job_id,
-        u.given_name || ' ' || u.surname AS member_name,
-        j.required_caregiving_type,
-        COUNT(ja.caregiver_user_id) AS number_of_applicants
-    FROM JOB j
-    JOIN MEMBER m ON j.member_user_id = m.member_user_id
-    JOIN "USER" u ON m.member_user_id = u.user_id
-    LEFT JOIN JOB_APPLICATION ja ON j.job_id = ja.job_id
-    GROUP BY j.job_id, u.given_name, u.surname, j.required_caregiving_type
-    ORDER BY number_of_applicants DESC, j.job_id;
-    """
-    execute_and_print(query_6_1, "6.1 Number of applicants for each job:")
+    execute_and_print(queries.QUERY_6_1, "6.1 Number of applicants for each job:")
     
     # 6.2 Total hours spent by caregivers for all accepted appointments
-    query_6_2 = """
-    SELECT 
-        c.caregiver_user_id,
-        u.given_name || ' ' || u.surname AS caregiver_name,
-        c.caregiving_type,
-        SUM(a.work_hours) AS total_hours
-    FROM APPOINTMENT a
-    JOIN CAREGIVER c ON a.caregiver_user_id = c.caregiver_user_id
-    JOIN "USER" u ON c.caregiver_user_id = u.user_id
-    WHERE a.status = 'confirmed'
-    GROUP BY c.caregiver_user_id, u.given_name, u.surname, c.caregiving_type
-    ORDER BY total_hours DESC;
-    """
-    execute_and_print(query_6_2, "6.2 Total hours spent by caregivers for accepted appointments:")
+    execute_and_print(queries.QUERY_6_2, "6.2 Total hours spent by caregivers for accepted appointments:")
     
     # 6.3 Average pay of caregivers based on accepted appointments
     # Average pay = average of (hourly_rate * work_hours) for each appointment
-    query_6_3 = """
-    SELECT 
-        c.caregiver_user_id,
-        u.given_name || ' ' || u.surname AS caregiver_name,
-        c.caregiving_type,
-        ROUND(AVG(c.hourly_rate * a.work_hours), 2) AS average_pay_per_appointment
-    FROM APPOINTMENT a
-    JOIN CAREGIVER c ON a.caregiver_user_id = c.caregiver_user_id
-    JOIN "USER" u ON c.caregiver_user_id = u.user_id
-    WHERE a.status = 'confirmed'
-    GROUP BY c.caregiver_user_id, u.given_name, u.surname, c.caregiving_type
-    ORDER BY average_pay_per_appointment DESC;
-    """
-    execute_and_print(query_6_3, "6.3 Average pay of caregivers based on accepted appointments:")
+    execute_and_print(queries.QUERY_6_3, "6.3 Average pay of caregivers based on accepted appointments:")
     
     # 6.4 Caregivers who earn above average based on accepted appointments
     # This requires a nested query to calculate the overall average first
-    query_6_4 = """
-    WITH caregiver_earnings AS (
-        SELECT 
-            c.caregiver_user_id,
-            u.given_name || ' ' || u.surname AS caregiver_name,
-            c.caregiving_type,
-            AVG(c.hourly_rate * a.work_hours) AS avg_earnings
-        FROM APPOINTMENT a
-        JOIN CAREGIVER c ON a.caregiver_user_id = c.caregiver_user_id
-        JOIN "USER" u ON c.caregiver_user_id = u.user_id
-        WHERE a.status = 'confirmed'
-        GROUP BY c.caregiver_user_id, u.given_name, u.surname, c.caregiving_type
-    ),
-    overall_avg AS (
-        SELECT AVG(avg_earnings) AS overall_average
-        FROM caregiver_earnings
-    )
-    SELECT 
-        ce.caregiver_user_id,
-        ce.caregiver_name,
-        ce.caregiving_type,
-        ROUND(ce.avg_earnings, 2) AS average_earnings,
-        ROUND(oa.overall_average, 2) AS overall_average
-    FROM caregiver_earnings ce
-    CROSS JOIN overall_avg oa
-    WHERE ce.avg_earnings > oa.overall_average
-    ORDER BY ce.avg_earnings DESC;
-    """
-    execute_and_print(query_6_4, "6.4 Caregivers earning above average based on accepted appointments:")
+    execute_and_print(queries.QUERY_6_4, "6.4 Caregivers earning above average based on accepted appointments:")
 
 
 # ============================================================================
@@ -449,14 +262,7 @@ def derived_attribute_query():
     """Calculate total cost for all accepted appointments"""
     print_section("7. DERIVED ATTRIBUTE QUERY")
     
-    query = """
-    SELECT 
-        SUM(c.hourly_rate * a.work_hours) AS total_cost
-    FROM APPOINTMENT a
-    JOIN CAREGIVER c ON a.caregiver_user_id = c.caregiver_user_id
-    WHERE a.status = 'confirmed';
-    """
-    execute_and_print(query, "7. Total cost to pay for caregivers for all accepted appointments:")
+    execute_and_print(queries.QUERY_7, "7. Total cost to pay for caregivers for all accepted appointments:")
 
 
 # ============================================================================
@@ -468,30 +274,9 @@ def view_operation():
     print_section("8. VIEW OPERATION")
     
     # Create view
-    create_view_query = """
-    CREATE OR REPLACE VIEW job_applications_view AS
-    SELECT 
-        ja.job_id,
-        j.required_caregiving_type,
-        j.other_requirements,
-        j.date_posted,
-        u_member.given_name || ' ' || u_member.surname AS member_name,
-        ja.caregiver_user_id,
-        u_caregiver.given_name || ' ' || u_caregiver.surname AS applicant_name,
-        c.caregiving_type AS applicant_caregiving_type,
-        c.hourly_rate,
-        ja.date_applied
-    FROM JOB_APPLICATION ja
-    JOIN JOB j ON ja.job_id = j.job_id
-    JOIN MEMBER m ON j.member_user_id = m.member_user_id
-    JOIN "USER" u_member ON m.member_user_id = u_member.user_id
-    JOIN CAREGIVER c ON ja.caregiver_user_id = c.caregiver_user_id
-    JOIN "USER" u_caregiver ON c.caregiver_user_id = u_caregiver.user_id
-    ORDER BY ja.job_id, ja.date_applied;
-    """
     
     try:
-        session.execute(text(create_view_query))
+        queries.CREATE_JOB_APPLICATIONS_VIEW.execute(session)
         session.commit()
         print("✓ View 'job_applications_view' created successfully!")
     except Exception as e:
@@ -500,10 +285,21 @@ def view_operation():
         return
     
     # Query the view
-    query_view = """
-    SELECT * FROM job_applications_view;
-    """
-    execute_and_print(query_view, "8. View: All job applications and applicants:")
+    # On the primary: a replica may not have replayed the CREATE VIEW yet
+    execute_and_print(queries.JOB_APPLICATIONS_VIEW, "8. View: All job applications and applicants:", session)
+
+
+# ============================================================================
+# QUERY TIMINGS
+# ============================================================================
+
+def print_query_stats():
+    """Print call counts and timings of every statement that ran"""
+    print_section("QUERY TIMINGS")
+    print(f"{'Query':<32} {'Calls':>6} {'Total ms':>10} {'p95 ms':>10}")
+    print("-" * 80)
+    for row in queries.stats():
+        print(f"{row['name']:<32} {row['calls']:>6} {row['total_ms']:>10.3f} {row['p95_ms']:>10.3f}")
 
 
 # ============================================================================
@@ -519,7 +315,7 @@ def main():
     
     try:
         # Test database connection
-        session.execute(text("SELECT 1"))
+        queries.PING.execute(session)
         print("\n✓ Database connection successful!\n")
         
         # Execute all operations in order
@@ -527,6 +323,7 @@ def main():
         insert_sample_data()
         update_operations()
         delete_operations()
+        open_report_session()
         simple_queries()
         complex_queries()
         derived_attribute_query()
@@ -534,6 +331,7 @@ def main():
         
         print_section("EXECUTION COMPLETE")
         print("✓ All operations executed successfully!")
+        print_query_stats()
         
     except Exception as e:
         print(f"\n✗ Error during execution: {e}")
@@ -541,7 +339,10 @@ def main():
         raise
     finally:
         session.close()
+        report_session.close()
         engine.dispose()
+        for replica in replicas.replicas:
+            replica.engine.dispose()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,158 @@
+"""
+Maintenance commands for the derived data kept by triggers
+
+CAREGIVER_EARNINGS (confirmed hours, appointment count and cost per
+caregiver) is updated by triggers on APPOINTMENT and CAREGIVER as part of
+every write. It only needs attention after something bypasses them - a
+restore of APPOINTMENT alone, ALTER TABLE ... DISABLE TRIGGER, a manual
+fix in psql:
+
+    python maintenance.py check-earnings      report caregivers whose rollup
+                                              differs from APPOINTMENT (exit 1)
+    python maintenance.py rebuild-earnings    recompute the whole rollup
+
+JOB.applicant_count is likewise kept by triggers on JOB_APPLICATION:
+
+    python maintenance.py check-applicants      report jobs whose count differs
+                                                from JOB_APPLICATION (exit 1)
+    python maintenance.py reconcile-applicants  fix the jobs that differ
+
+The rebuild and the reconcile lock their source tables against writes
+(reads carry on) for as long as the aggregation takes.
+
+The appointment_no_overlap constraint (migrations/006) cannot be added
+while a caregiver is double-booked:
+
+    python maintenance.py check-overlaps      list the appointments that
+                                              overlap (exit 1)
+
+Usage:
+    python maintenance.py [--database-url URL] COMMAND
+"""
+
+import argparse
+import sys
+import time
+
+from bulk_load import create_load_engine
+from db import DATABASE_URL
+import queries
+
+# Drift rows printed by the check commands
+MAX_REPORTED = 20
+
+
+def rebuild_earnings(conn):
+    """Recompute CAREGIVER_EARNINGS from APPOINTMENT in one transaction"""
+    started = time.perf_counter()
+    queries.LOCK_EARNINGS_SOURCES.execute(conn)
+    queries.CLEAR_CAREGIVER_EARNINGS.execute(conn)
+    rows = queries.FILL_CAREGIVER_EARNINGS.execute(conn).rowcount
+    conn.commit()
+    print(f"✓ Rebuilt CAREGIVER_EARNINGS: {rows:,} caregivers in {time.perf_counter() - started:.2f}s")
+    return 0
+
+
+def check_earnings(conn):
+    """Compare CAREGIVER_EARNINGS with a fresh aggregation of APPOINTMENT"""
+    started = time.perf_counter()
+    drift = queries.CAREGIVER_EARNINGS_DRIFT.execute(conn).fetchall()
+    conn.rollback()
+    elapsed = time.perf_counter() - started
+    if not drift:
+        print(f"✓ CAREGIVER_EARNINGS matches APPOINTMENT ({elapsed:.2f}s)")
+        return 0
+    print(f"✗ CAREGIVER_EARNINGS differs for {len(drift):,} caregivers ({elapsed:.2f}s):")
+    for row in drift[:MAX_REPORTED]:
+        print(f"  caregiver {row.caregiver_user_id}: "
+              f"hours {row.stored_hours} vs {row.live_hours}, "
+              f"appointments {row.stored_appointments} vs {row.live_appointments}, "
+              f"cost {row.stored_cost} vs {row.live_cost}")
+    if len(drift) > MAX_REPORTED:
+        print(f"  ... and {len(drift) - MAX_REPORTED:,} more")
+    print("Run 'python maintenance.py rebuild-earnings' to fix it.")
+    return 1
+
+
+def report_counts(rows):
+    for row in rows[:MAX_REPORTED]:
+        print(f"  job {row.job_id}: applicant_count {row.stored_count}, applications {row.live_count}")
+    if len(rows) > MAX_REPORTED:
+        print(f"  ... and {len(rows) - MAX_REPORTED:,} more")
+
+
+def check_applicants(conn):
+    """Compare JOB.applicant_count with a count of JOB_APPLICATION"""
+    started = time.perf_counter()
+    drift = queries.APPLICANT_COUNT_DRIFT.execute(conn).fetchall()
+    conn.rollback()
+    elapsed = time.perf_counter() - started
+    if not drift:
+        print(f"✓ JOB.applicant_count matches JOB_APPLICATION ({elapsed:.2f}s)")
+        return 0
+    print(f"✗ JOB.applicant_count differs for {len(drift):,} jobs ({elapsed:.2f}s):")
+    report_counts(drift)
+    print("Run 'python maintenance.py reconcile-applicants' to fix it.")
+    return 1
+
+
+def reconcile_applicants(conn):
+    """Set JOB.applicant_count where it differs from JOB_APPLICATION"""
+    started = time.perf_counter()
+    queries.LOCK_APPLICANT_COUNT_SOURCES.execute(conn)
+    repaired = queries.REPAIR_APPLICANT_COUNTS.execute(conn).fetchall()
+    conn.commit()
+    elapsed = time.perf_counter() - started
+    if not repaired:
+        print(f"✓ JOB.applicant_count was already correct ({elapsed:.2f}s)")
+        return 0
+    print(f"✓ Repaired applicant_count of {len(repaired):,} jobs ({elapsed:.2f}s):")
+    report_counts(repaired)
+    return 0
+
+
+def check_overlaps(conn):
+    """List the pairs of appointments that double-book a caregiver"""
+    started = time.perf_counter()
+    overlaps = queries.APPOINTMENT_OVERLAPS.execute(conn).fetchall()
+    conn.rollback()
+    elapsed = time.perf_counter() - started
+    if not overlaps:
+        print(f"✓ No caregiver has overlapping appointments ({elapsed:.2f}s)")
+        return 0
+    print(f"✗ {len(overlaps):,} pairs of overlapping appointments ({elapsed:.2f}s):")
+    for row in overlaps[:MAX_REPORTED]:
+        print(f"  caregiver {row.caregiver_user_id}: "
+              f"#{row.appointment_id} {row.appointment_date} {row.appointment_time} ({row.work_hours}h) and "
+              f"#{row.other_appointment_id} {row.other_date} {row.other_time} ({row.other_work_hours}h)")
+    if len(overlaps) > MAX_REPORTED:
+        print(f"  ... and {len(overlaps) - MAX_REPORTED:,} more")
+    print("Reschedule or decline one appointment of each pair.")
+    return 1
+
+
+COMMANDS = {
+    'check-earnings': check_earnings,
+    'rebuild-earnings': rebuild_earnings,
+    'check-applicants': check_applicants,
+    'reconcile-applicants': reconcile_applicants,
+    'check-overlaps': check_overlaps,
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Check and rebuild trigger-maintained data')
+    parser.add_argument('command', choices=sorted(COMMANDS))
+    parser.add_argument('--database-url', default=DATABASE_URL)
+    args = parser.parse_args()
+
+    engine = create_load_engine(args.database_url)
+    try:
+        with engine.connect() as conn:
+            return COMMANDS[args.command](conn)
+    finally:
+        engine.dispose()
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,95 @@
+"""
+Caregiver-job matching
+
+MatchIndex holds every caregiver in memory, bucketed by (caregiving_type,
+city) - the two things a job requires - with each bucket kept sorted by
+rank. The top K caregivers for a job are then a dict lookup and a slice,
+with no query beyond fetching the job itself.
+
+Rank: most confirmed hours first (experience on the platform, from the
+CAREGIVER_EARNINGS rollup), then the lowest hourly rate, then the lowest id.
+
+The index is built with one query and then updated one caregiver at a time
+with refresh() when a route changes a caregiver, its user row or its
+appointments. Like the caches in cache.py it is per worker: app.py rebuilds
+it every MATCH_INDEX_TTL seconds so that writes handled by other workers
+show up too.
+"""
+
+import bisect
+import threading
+import time
+
+import queries
+
+
+class MatchIndex:
+    """Caregivers bucketed by (caregiving_type, city), sorted by rank"""
+
+    def __init__(self):
+        self.built_at = time.time()
+        self._buckets = {}      # (caregiving_type, city) -> sorted [(rank, caregiver), ...]
+        self._positions = {}    # caregiver_user_id -> (bucket key, rank)
+        self._lock = threading.Lock()
+
+    @classmethod
+    def load(cls, connection):
+        """Build the index from every caregiver"""
+        index = cls()
+        for row in queries.MATCH_CANDIDATES.execute(connection):
+            caregiver = dict(row._mapping)
+            bucket_key = (caregiver['caregiving_type'], caregiver['city'])
+            rank = cls.rank(caregiver)
+            index._buckets.setdefault(bucket_key, []).append((rank, caregiver))
+            index._positions[caregiver['caregiver_user_id']] = (bucket_key, rank)
+        for bucket in index._buckets.values():
+            bucket.sort(key=lambda entry: entry[0])
+        return index
+
+    @staticmethod
+    def rank(caregiver):
+        return (-caregiver['confirmed_hours'], caregiver['hourly_rate'], caregiver['caregiver_user_id'])
+
+    def _add(self, caregiver):
+        bucket_key = (caregiver['caregiving_type'], caregiver['city'])
+        rank = self.rank(caregiver)
+        bisect.insort(self._buckets.setdefault(bucket_key, []), (rank, caregiver))
+        self._positions[caregiver['caregiver_user_id']] = (bucket_key, rank)
+
+    def _remove(self, caregiver_id):
+        position = self._positions.pop(caregiver_id, None)
+        if position is None:
+            return
+        bucket_key, rank = position
+        bucket = self._buckets[bucket_key]
+        del bucket[bisect.bisect_left(bucket, (rank,))]
+        if not bucket:
+            del self._buckets[bucket_key]
+
+    def refresh(self, connection, caregiver_ids):
+        """Re-read the given caregivers; ids that are no longer caregivers are dropped"""
+        caregiver_ids = sorted({int(caregiver_id) for caregiver_id in caregiver_ids if caregiver_id is not None})
+        if not caregiver_ids:
+            return
+        rows = [dict(row._mapping) for row in
+                queries.MATCH_CANDIDATES_BY_ID.execute(connection, {'caregiver_ids': caregiver_ids})]
+        with self._lock:
+            for caregiver_id in caregiver_ids:
+                self._remove(caregiver_id)
+            for row in rows:
+                self._add(row)
+
+    def top(self, caregiving_type, city, limit):
+        """(best `limit` caregivers, number of candidates) for a job"""
+        with self._lock:
+            bucket = self._buckets.get((caregiving_type, city), [])
+            return [dict(caregiver) for _, caregiver in bucket[:limit]], len(bucket)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'caregivers': len(self._positions),
+                'buckets': len(self._buckets),
+                'largest_bucket': max(map(len, self._buckets.values()), default=0),
+                'age_seconds': round(time.time() - self.built_at, 1),
+            }
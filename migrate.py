@@ -0,0 +1,180 @@
+"""
+Schema migration runner
+
+Applies the numbered SQL files in migrations/ (001_name.sql, 002_...) that
+have not run yet, in order, and records each one in schema_migrations.
+Statements run one at a time in autocommit mode, because CREATE INDEX
+CONCURRENTLY cannot run inside a transaction block; migrations are
+therefore written to be idempotent (IF NOT EXISTS / IF EXISTS) so a failed
+run can simply be repeated. A migration whose steps must happen together
+wraps them in its own BEGIN; ... COMMIT;.
+
+A concurrent index build that fails leaves an INVALID index behind, which
+IF NOT EXISTS would then skip; such leftovers are dropped before the
+statement is retried.
+
+A migration can ship a NNN_name.down.sql file to revert it (--revert NNN).
+
+Usage:
+    python migrate.py [DATABASE_URL]              apply pending migrations
+    python migrate.py [DATABASE_URL] --list       show applied/pending
+    python migrate.py [DATABASE_URL] --revert 001 run 001_*.down.sql
+"""
+
+import argparse
+import re
+import sys
+import time
+from pathlib import Path
+
+from sqlalchemy import text
+
+from bulk_load import create_load_engine
+from db import DATABASE_URL
+from sql_script import iter_statements
+
+MIGRATIONS_DIR = Path(__file__).resolve().parent / 'migrations'
+
+MIGRATION_FILE = re.compile(r'^(?P<version>\d+)_(?P<name>\w+?)(?P<down>\.down)?\.sql$')
+CREATE_INDEX_CONCURRENTLY = re.compile(
+    r'^CREATE\s+(UNIQUE\s+)?INDEX\s+CONCURRENTLY\s+(IF\s+NOT\s+EXISTS\s+)?(?P<name>\w+)', re.IGNORECASE
+)
+
+# Key for pg_advisory_lock so two runners never interleave
+LOCK_KEY = 341015
+
+
+def available(directory=MIGRATIONS_DIR):
+    """{version: (name, path, down_path or None)} of the migration files"""
+    migrations = {}
+    downs = {}
+    for path in sorted(directory.glob('*.sql')):
+        match = MIGRATION_FILE.match(path.name)
+        if not match:
+            continue
+        if match.group('down'):
+            downs[match.group('version')] = path
+        else:
+            migrations[match.group('version')] = (match.group('name'), path)
+    return {version: (name, path, downs.get(version))
+            for version, (name, path) in sorted(migrations.items())}
+
+
+def ensure_table(conn):
+    conn.execute(text("""
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+            version VARCHAR(20) PRIMARY KEY,
+            name VARCHAR(255) NOT NULL,
+            applied_at TIMESTAMP NOT NULL DEFAULT now()
+        )
+    """))
+
+
+def applied(conn):
+    """{version: applied_at} of the migrations already run"""
+    rows = conn.execute(text('SELECT version, applied_at FROM schema_migrations ORDER BY version'))
+    return {version: applied_at for version, applied_at in rows}
+
+
+def drop_invalid_index(conn, name):
+    """Drop an index left INVALID by an interrupted concurrent build"""
+    invalid = conn.execute(text("""
+        SELECT 1 FROM pg_class c JOIN pg_index i ON i.indexrelid = c.oid
+        WHERE c.relname = lower(:name) AND NOT i.indisvalid
+    """), {'name': name}).first()
+    if invalid:
+        print(f"  ! dropping invalid index {name} from an earlier failed build")
+        conn.exec_driver_sql(f'DROP INDEX CONCURRENTLY IF EXISTS {name}')
+
+
+def run_file(conn, path):
+    """Run every statement of a migration file, one at a time"""
+    for statement in iter_statements(path):
+        index = CREATE_INDEX_CONCURRENTLY.match(statement)
+        if index:
+            drop_invalid_index(conn, index.group('name'))
+        started = time.perf_counter()
+        conn.exec_driver_sql(statement)
+        summary = ' '.join(statement.split())
+        if len(summary) > 90:
+            summary = summary[:87] + '...'
+        print(f"  ✓ {summary} ({time.perf_counter() - started:.2f}s)")
+
+
+def autocommit_connection(engine):
+    conn = engine.connect().execution_options(isolation_level='AUTOCOMMIT')
+    conn.execute(text('SELECT pg_advisory_lock(:key)'), {'key': LOCK_KEY})
+    ensure_table(conn)
+    return conn
+
+
+def migrate(engine, directory=MIGRATIONS_DIR):
+    """Apply every pending migration; returns the versions applied"""
+    conn = autocommit_connection(engine)
+    try:
+        done = applied(conn)
+        pending = [(version, name, path) for version, (name, path, _) in available(directory).items()
+                   if version not in done]
+        if not pending:
+            print("✓ Database is up to date")
+        for version, name, path in pending:
+            print(f"Applying {path.name}...")
+            started = time.perf_counter()
+            run_file(conn, path)
+            conn.execute(text('INSERT INTO schema_migrations (version, name) VALUES (:version, :name)'),
+                         {'version': version, 'name': name})
+            print(f"✓ {version}_{name} applied in {time.perf_counter() - started:.2f}s")
+        return [version for version, _, _ in pending]
+    finally:
+        conn.close()
+
+
+def revert(engine, version, directory=MIGRATIONS_DIR):
+    """Run the .down.sql file of an applied migration"""
+    migration = available(directory).get(version)
+    if migration is None or migration[2] is None:
+        raise ValueError(f'No migration {version} with a .down.sql file in {directory}')
+    name, _, down_path = migration
+    conn = autocommit_connection(engine)
+    try:
+        if version not in applied(conn):
+            raise ValueError(f'Migration {version} has not been applied')
+        print(f"Reverting {down_path.name}...")
+        run_file(conn, down_path)
+        conn.execute(text('DELETE FROM schema_migrations WHERE version = :version'), {'version': version})
+        print(f"✓ {version}_{name} reverted")
+    finally:
+        conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Apply the SQL migrations in migrations/')
+    parser.add_argument('database_url', nargs='?', default=DATABASE_URL)
+    parser.add_argument('--list', action='store_true', help='show applied and pending migrations')
+    parser.add_argument('--revert', metavar='VERSION', help='run the .down.sql file of VERSION')
+    args = parser.parse_args()
+
+    engine = create_load_engine(args.database_url)
+    try:
+        if args.list:
+            with engine.connect() as conn:
+                ensure_table(conn)
+                conn.commit()
+                done = applied(conn)
+            for version, (name, _, _) in available().items():
+                state = f'applied {done[version]:%Y-%m-%d %H:%M}' if version in done else 'pending'
+                print(f"{version}_{name:<40} {state}")
+        elif args.revert:
+            revert(engine, args.revert)
+        else:
+            migrate(engine)
+    except ValueError as e:
+        print(f"✗ {e}")
+        return 1
+    finally:
+        engine.dispose()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,16 @@
+-- 001 (revert): back to the single-column status/type indexes
+--
+-- Leaves the pagination and typeahead indexes in place; they are part of
+-- schema.sql from before this migration.
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_appointment_status ON APPOINTMENT(status);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_job_type ON JOB(required_caregiving_type);
+
+DROP INDEX CONCURRENTLY IF EXISTS idx_appointment_caregiver;
+DROP INDEX CONCURRENTLY IF EXISTS idx_appointment_member;
+DROP INDEX CONCURRENTLY IF EXISTS idx_job_member;
+DROP INDEX CONCURRENTLY IF EXISTS idx_appointment_status_schedule;
+DROP INDEX CONCURRENTLY IF EXISTS idx_job_type_posted;
+
+ANALYZE APPOINTMENT;
+ANALYZE JOB;
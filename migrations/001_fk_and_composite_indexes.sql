@@ -0,0 +1,31 @@
+-- 001: foreign key and composite indexes for the join-heavy pages
+--
+-- Brings a database created from an older schema.sql up to the current
+-- set of indexes. Every statement is idempotent and the indexes are built
+-- with CREATE INDEX CONCURRENTLY, so this can run against a live database
+-- without blocking writes (migrate.py runs it outside a transaction).
+
+-- Indexes added to schema.sql earlier (keyset pagination, name typeahead)
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_appointment_schedule ON APPOINTMENT(appointment_date, appointment_time, appointment_id);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_job_application_job ON JOB_APPLICATION(job_id, date_applied, caregiver_user_id);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_user_full_name_prefix ON "USER"(lower(given_name || ' ' || surname) text_pattern_ops);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_user_full_name_trgm ON "USER" USING gin ((given_name || ' ' || surname) gin_trgm_ops);
+
+-- Foreign key indexes for the joins and the cascading deletes from "USER"
+-- (JOB_APPLICATION.job_id is covered by idx_job_application_job)
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_appointment_caregiver ON APPOINTMENT(caregiver_user_id);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_appointment_member ON APPOINTMENT(member_user_id);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_job_member ON JOB(member_user_id);
+
+-- Composite indexes for filtering by status/type and sorting by date
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_appointment_status_schedule ON APPOINTMENT(status, appointment_date, appointment_time);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_job_type_posted ON JOB(required_caregiving_type, date_posted);
+
+-- The composites lead with the same column, so these are redundant
+DROP INDEX CONCURRENTLY IF EXISTS idx_appointment_status;
+DROP INDEX CONCURRENTLY IF EXISTS idx_job_type;
+
+ANALYZE APPOINTMENT;
+ANALYZE JOB;
+ANALYZE JOB_APPLICATION;
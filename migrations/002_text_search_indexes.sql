@@ -0,0 +1,22 @@
+-- 002: full-text and trigram indexes for the text columns
+--
+-- The idx_*_fts expression indexes serve the ranked full-text search of
+-- /search (the expressions must stay identical to the *_DOCUMENT
+-- expressions in queries.py). The idx_*_trgm indexes serve substring
+-- search and make ILIKE '%...%' filters such as queries 5.2 and 5.4
+-- index scans instead of full table scans.
+
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_job_requirements_fts ON JOB USING gin (to_tsvector('english', coalesce(other_requirements, '')));
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_member_text_fts ON MEMBER USING gin (to_tsvector('english', coalesce(house_rules, '') || ' ' || coalesce(dependent_description, '')));
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_user_profile_fts ON "USER" USING gin (to_tsvector('english', coalesce(profile_description, '')));
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_job_requirements_trgm ON JOB USING gin (other_requirements gin_trgm_ops);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_member_house_rules_trgm ON MEMBER USING gin (house_rules gin_trgm_ops);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_member_dependent_trgm ON MEMBER USING gin (dependent_description gin_trgm_ops);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_user_profile_trgm ON "USER" USING gin (profile_description gin_trgm_ops);
+
+ANALYZE JOB;
+ANALYZE MEMBER;
+ANALYZE "USER";
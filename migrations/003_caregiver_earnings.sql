@@ -0,0 +1,105 @@
+-- 003: caregiver earnings rollup
+--
+-- Creates CAREGIVER_EARNINGS and the triggers that keep it current, then
+-- fills it from APPOINTMENT. Runs as one transaction holding a lock that
+-- blocks writes to APPOINTMENT and CAREGIVER, so no change can slip in
+-- between the backfill and the triggers taking over.
+
+BEGIN;
+
+LOCK TABLE APPOINTMENT, CAREGIVER IN SHARE ROW EXCLUSIVE MODE;
+
+CREATE TABLE IF NOT EXISTS CAREGIVER_EARNINGS (
+    caregiver_user_id INTEGER PRIMARY KEY,
+    confirmed_hours NUMERIC NOT NULL DEFAULT 0,
+    confirmed_appointments INTEGER NOT NULL DEFAULT 0,
+    confirmed_cost NUMERIC NOT NULL DEFAULT 0,
+    FOREIGN KEY (caregiver_user_id) REFERENCES CAREGIVER(caregiver_user_id) ON DELETE CASCADE
+);
+
+-- Adds the confirmed appointments of one statement to the rollup as a
+-- single delta per caregiver (inserted rows count +1, deleted rows -1, an
+-- update both). The join with CAREGIVER drops deltas for caregivers being
+-- deleted by the same ON DELETE CASCADE.
+CREATE OR REPLACE FUNCTION caregiver_earnings_apply() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        INSERT INTO CAREGIVER_EARNINGS AS e (caregiver_user_id, confirmed_hours, confirmed_appointments, confirmed_cost)
+        SELECT d.caregiver_user_id, d.hours, d.n, c.hourly_rate * d.hours
+        FROM (SELECT caregiver_user_id, sum(work_hours) AS hours, count(*) AS n
+              FROM new_rows WHERE status = 'confirmed' GROUP BY caregiver_user_id) d
+        JOIN CAREGIVER c ON c.caregiver_user_id = d.caregiver_user_id
+        ON CONFLICT (caregiver_user_id) DO UPDATE
+        SET confirmed_hours = e.confirmed_hours + EXCLUDED.confirmed_hours,
+            confirmed_appointments = e.confirmed_appointments + EXCLUDED.confirmed_appointments,
+            confirmed_cost = e.confirmed_cost + EXCLUDED.confirmed_cost;
+    ELSIF TG_OP = 'DELETE' THEN
+        UPDATE CAREGIVER_EARNINGS e
+        SET confirmed_hours = e.confirmed_hours - d.hours,
+            confirmed_appointments = e.confirmed_appointments - d.n,
+            confirmed_cost = e.confirmed_cost - c.hourly_rate * d.hours
+        FROM (SELECT caregiver_user_id, sum(work_hours) AS hours, count(*) AS n
+              FROM old_rows WHERE status = 'confirmed' GROUP BY caregiver_user_id) d
+        JOIN CAREGIVER c ON c.caregiver_user_id = d.caregiver_user_id
+        WHERE e.caregiver_user_id = d.caregiver_user_id;
+    ELSE
+        INSERT INTO CAREGIVER_EARNINGS AS e (caregiver_user_id, confirmed_hours, confirmed_appointments, confirmed_cost)
+        SELECT d.caregiver_user_id, d.hours, d.n, c.hourly_rate * d.hours
+        FROM (SELECT caregiver_user_id, sum(hours) AS hours, sum(n) AS n
+              FROM (SELECT caregiver_user_id, work_hours AS hours, 1 AS n
+                    FROM new_rows WHERE status = 'confirmed'
+                    UNION ALL
+                    SELECT caregiver_user_id, -work_hours, -1
+                    FROM old_rows WHERE status = 'confirmed') changes
+              GROUP BY caregiver_user_id) d
+        JOIN CAREGIVER c ON c.caregiver_user_id = d.caregiver_user_id
+        WHERE d.n <> 0 OR d.hours <> 0
+        ON CONFLICT (caregiver_user_id) DO UPDATE
+        SET confirmed_hours = e.confirmed_hours + EXCLUDED.confirmed_hours,
+            confirmed_appointments = e.confirmed_appointments + EXCLUDED.confirmed_appointments,
+            confirmed_cost = e.confirmed_cost + EXCLUDED.confirmed_cost;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- A new hourly rate reprices all of the caregiver's confirmed hours
+CREATE OR REPLACE FUNCTION caregiver_earnings_reprice() RETURNS trigger AS $$
+BEGIN
+    UPDATE CAREGIVER_EARNINGS e
+    SET confirmed_cost = c.hourly_rate * e.confirmed_hours
+    FROM new_rows c
+    WHERE e.caregiver_user_id = c.caregiver_user_id
+      AND e.confirmed_cost <> c.hourly_rate * e.confirmed_hours;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS appointment_earnings_insert ON APPOINTMENT;
+DROP TRIGGER IF EXISTS appointment_earnings_update ON APPOINTMENT;
+DROP TRIGGER IF EXISTS appointment_earnings_delete ON APPOINTMENT;
+DROP TRIGGER IF EXISTS caregiver_earnings_rate ON CAREGIVER;
+CREATE TRIGGER appointment_earnings_insert AFTER INSERT ON APPOINTMENT
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION caregiver_earnings_apply();
+CREATE TRIGGER appointment_earnings_update AFTER UPDATE ON APPOINTMENT
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION caregiver_earnings_apply();
+CREATE TRIGGER appointment_earnings_delete AFTER DELETE ON APPOINTMENT
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION caregiver_earnings_apply();
+CREATE TRIGGER caregiver_earnings_rate AFTER UPDATE ON CAREGIVER
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION caregiver_earnings_reprice();
+
+DELETE FROM CAREGIVER_EARNINGS;
+INSERT INTO CAREGIVER_EARNINGS (caregiver_user_id, confirmed_hours, confirmed_appointments, confirmed_cost)
+SELECT a.caregiver_user_id, SUM(a.work_hours), COUNT(*), SUM(c.hourly_rate * a.work_hours)
+FROM APPOINTMENT a
+JOIN CAREGIVER c ON a.caregiver_user_id = c.caregiver_user_id
+WHERE a.status = 'confirmed'
+GROUP BY a.caregiver_user_id;
+
+COMMIT;
+
+ANALYZE CAREGIVER_EARNINGS;
@@ -0,0 +1,63 @@
+-- 004: denormalized applicant count on JOB
+--
+-- Adds JOB.applicant_count and the JOB_APPLICATION triggers that keep it
+-- current, then fills it. The column, triggers and backfill run as one
+-- transaction that blocks writes to JOB_APPLICATION, so no application can
+-- be added or removed between the backfill and the triggers taking over.
+-- The backfill rewrites every job that has applicants.
+
+BEGIN;
+
+LOCK TABLE JOB_APPLICATION IN SHARE ROW EXCLUSIVE MODE;
+
+ALTER TABLE JOB ADD COLUMN IF NOT EXISTS applicant_count INTEGER NOT NULL DEFAULT 0;
+
+CREATE OR REPLACE FUNCTION job_applicant_count_apply() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        UPDATE JOB j
+        SET applicant_count = j.applicant_count + d.n
+        FROM (SELECT job_id, count(*) AS n FROM new_rows GROUP BY job_id) d
+        WHERE j.job_id = d.job_id;
+    ELSIF TG_OP = 'DELETE' THEN
+        UPDATE JOB j
+        SET applicant_count = j.applicant_count - d.n
+        FROM (SELECT job_id, count(*) AS n FROM old_rows GROUP BY job_id) d
+        WHERE j.job_id = d.job_id;
+    ELSE
+        UPDATE JOB j
+        SET applicant_count = j.applicant_count + d.n
+        FROM (SELECT job_id, sum(n) AS n
+              FROM (SELECT job_id, 1 AS n FROM new_rows
+                    UNION ALL
+                    SELECT job_id, -1 FROM old_rows) changes
+              GROUP BY job_id) d
+        WHERE j.job_id = d.job_id AND d.n <> 0;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS job_application_count_insert ON JOB_APPLICATION;
+DROP TRIGGER IF EXISTS job_application_count_update ON JOB_APPLICATION;
+DROP TRIGGER IF EXISTS job_application_count_delete ON JOB_APPLICATION;
+CREATE TRIGGER job_application_count_insert AFTER INSERT ON JOB_APPLICATION
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION job_applicant_count_apply();
+CREATE TRIGGER job_application_count_update AFTER UPDATE ON JOB_APPLICATION
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION job_applicant_count_apply();
+CREATE TRIGGER job_application_count_delete AFTER DELETE ON JOB_APPLICATION
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION job_applicant_count_apply();
+
+UPDATE JOB j
+SET applicant_count = c.n
+FROM (SELECT job_id, count(*) AS n FROM JOB_APPLICATION GROUP BY job_id) c
+WHERE j.job_id = c.job_id AND j.applicant_count <> c.n;
+
+COMMIT;
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_job_popularity ON JOB(applicant_count, job_id);
+
+ANALYZE JOB;
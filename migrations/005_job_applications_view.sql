@@ -0,0 +1,26 @@
+-- 005: job_applications_view without ORDER BY, and a date_applied index
+--
+-- The view used to sort the whole join on every read. Readers now add
+-- their own ORDER BY, so the filtered and paginated job applications list
+-- only sorts the rows it returns. The index serves its date range filter.
+
+CREATE OR REPLACE VIEW job_applications_view AS
+SELECT
+    ja.job_id,
+    j.required_caregiving_type,
+    j.other_requirements,
+    j.date_posted,
+    u_member.given_name || ' ' || u_member.surname AS member_name,
+    ja.caregiver_user_id,
+    u_caregiver.given_name || ' ' || u_caregiver.surname AS applicant_name,
+    c.caregiving_type AS applicant_caregiving_type,
+    c.hourly_rate,
+    ja.date_applied
+FROM JOB_APPLICATION ja
+JOIN JOB j ON ja.job_id = j.job_id
+JOIN MEMBER m ON j.member_user_id = m.member_user_id
+JOIN "USER" u_member ON m.member_user_id = u_member.user_id
+JOIN CAREGIVER c ON ja.caregiver_user_id = c.caregiver_user_id
+JOIN "USER" u_caregiver ON c.caregiver_user_id = u_caregiver.user_id;
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_job_application_applied ON JOB_APPLICATION(date_applied);
@@ -0,0 +1,4 @@
+-- 006 (revert): drops the overlap constraint and the appointment_period column
+
+ALTER TABLE APPOINTMENT DROP CONSTRAINT IF EXISTS appointment_no_overlap;
+ALTER TABLE APPOINTMENT DROP COLUMN IF EXISTS appointment_period;
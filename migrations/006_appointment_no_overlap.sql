@@ -0,0 +1,30 @@
+-- 006: no double-booked caregivers
+--
+-- Adds APPOINTMENT.appointment_period, the [start, start + work_hours)
+-- range of each appointment, and an exclusion constraint that rejects a
+-- second appointment of the same caregiver overlapping it (declined
+-- appointments do not count). The constraint's GiST index finds a clash in
+-- O(log n).
+--
+-- Fails, changing nothing, if a caregiver is already double-booked; run
+-- 'python maintenance.py check-overlaps' to list the appointments to fix.
+-- Adding the stored column rewrites APPOINTMENT, and the constraint's index
+-- cannot be built concurrently, so the table is locked against reads and
+-- writes for the duration.
+
+CREATE EXTENSION IF NOT EXISTS btree_gist;
+
+BEGIN;
+
+ALTER TABLE APPOINTMENT ADD COLUMN IF NOT EXISTS appointment_period TSRANGE GENERATED ALWAYS AS (
+    tsrange(appointment_date + appointment_time,
+            appointment_date + appointment_time + work_hours * INTERVAL '1 hour')
+) STORED;
+
+ALTER TABLE APPOINTMENT DROP CONSTRAINT IF EXISTS appointment_no_overlap;
+ALTER TABLE APPOINTMENT ADD CONSTRAINT appointment_no_overlap
+    EXCLUDE USING gist (caregiver_user_id WITH =, appointment_period WITH &&) WHERE (status <> 'declined');
+
+COMMIT;
+
+ANALYZE APPOINTMENT;
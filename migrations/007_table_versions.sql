@@ -0,0 +1,63 @@
+-- 007: per-table version stamps for conditional GETs
+--
+-- Adds TABLE_VERSION and the statement-level triggers that bump a table's
+-- row on the first write of each transaction. app.py answers repeated GETs of the list pages and
+-- the user page with 304 Not Modified while the tables they read keep
+-- their versions. Existing tables start at version 1 from now; everything
+-- runs in one transaction.
+
+BEGIN;
+
+CREATE TABLE IF NOT EXISTS TABLE_VERSION (
+    table_name TEXT PRIMARY KEY,
+    version BIGINT NOT NULL DEFAULT 1,
+    modified_at TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+
+CREATE OR REPLACE FUNCTION table_version_bump() RETURNS trigger AS $$
+DECLARE
+    bumped TEXT := 'table_version.' || lower(TG_TABLE_NAME);
+BEGIN
+    -- Once per transaction and table (the flag is transaction-local): the
+    -- first write takes the row lock, later ones would only repeat the update
+    IF current_setting(bumped, true) IS DISTINCT FROM 'yes' THEN
+        -- clock_timestamp(), not now(): the lock may have been granted long
+        -- after the transaction started, and modified_at never goes back
+        INSERT INTO TABLE_VERSION AS v (table_name, modified_at)
+        VALUES (upper(TG_TABLE_NAME), clock_timestamp())
+        ON CONFLICT (table_name) DO UPDATE
+        SET version = v.version + 1,
+            modified_at = greatest(v.modified_at, clock_timestamp());
+        PERFORM set_config(bumped, 'yes', true);
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS user_version ON "USER";
+CREATE TRIGGER user_version AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON "USER"
+    FOR EACH STATEMENT EXECUTE FUNCTION table_version_bump();
+DROP TRIGGER IF EXISTS caregiver_version ON CAREGIVER;
+CREATE TRIGGER caregiver_version AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON CAREGIVER
+    FOR EACH STATEMENT EXECUTE FUNCTION table_version_bump();
+DROP TRIGGER IF EXISTS member_version ON MEMBER;
+CREATE TRIGGER member_version AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON MEMBER
+    FOR EACH STATEMENT EXECUTE FUNCTION table_version_bump();
+DROP TRIGGER IF EXISTS address_version ON ADDRESS;
+CREATE TRIGGER address_version AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON ADDRESS
+    FOR EACH STATEMENT EXECUTE FUNCTION table_version_bump();
+DROP TRIGGER IF EXISTS job_version ON JOB;
+CREATE TRIGGER job_version AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON JOB
+    FOR EACH STATEMENT EXECUTE FUNCTION table_version_bump();
+DROP TRIGGER IF EXISTS job_application_version ON JOB_APPLICATION;
+CREATE TRIGGER job_application_version AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON JOB_APPLICATION
+    FOR EACH STATEMENT EXECUTE FUNCTION table_version_bump();
+DROP TRIGGER IF EXISTS appointment_version ON APPOINTMENT;
+CREATE TRIGGER appointment_version AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON APPOINTMENT
+    FOR EACH STATEMENT EXECUTE FUNCTION table_version_bump();
+
+INSERT INTO TABLE_VERSION (table_name)
+SELECT unnest(ARRAY['USER', 'CAREGIVER', 'MEMBER', 'ADDRESS', 'JOB', 'JOB_APPLICATION', 'APPOINTMENT'])
+ON CONFLICT (table_name) DO NOTHING;
+
+COMMIT;
@@ -0,0 +1,980 @@
+"""
+Query registry for the caregiver platform
+
+Every SQL statement used by app.py and main.py is defined here once and
+compiled once at import time. Each Query records how often it ran and how
+long it took, so /internal/queries (and the end of main.py) can show which
+statements dominate database time.
+
+The *_LIST queries are the base SELECT of each list page and export; the
+web app appends the WHERE/ORDER BY/LIMIT for keyset pagination and
+registers the result as a derived query.
+
+Set DB_PREPARED_STATEMENTS=1 to run registered statements as server-side
+prepared statements (PREPARE once per connection, then EXECUTE), which
+skips repeated parse/plan work on hot paths. Leave it off when connecting
+through a transaction-pooling proxy such as PgBouncer.
+"""
+
+import math
+import os
+import re
+import threading
+import time
+from collections import deque
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+PREPARED_STATEMENTS = os.getenv('DB_PREPARED_STATEMENTS', '').strip().lower() in ('1', 'true', 'yes', 'on')
+
+# Number of recent execution times kept per statement for percentiles
+TIMING_SAMPLES = int(os.getenv('QUERY_TIMING_SAMPLES', '1000'))
+
+# Same pattern SQLAlchemy's text() uses to find :name bind parameters
+BIND_PARAM = re.compile(r'(?<![:\w\x5c]):(\w+)(?!:)')
+
+REGISTRY = {}
+_registry_lock = threading.Lock()
+
+
+class Query:
+    """A named, precompiled SQL statement with execution statistics"""
+
+    def __init__(self, name, sql, prepare=True):
+        self.name = name
+        self.sql = sql
+        self.statement = text(sql)
+        self.prepare = prepare
+        self.calls = 0
+        self.total_time = 0.0
+        self._samples = deque(maxlen=TIMING_SAMPLES)
+        self._lock = threading.Lock()
+
+        # PREPARE form: :name parameters become $1, $2, ... in order of
+        # first appearance
+        self.param_names = []
+        self.prepared_name = 'q_' + re.sub(r'\W', '_', name)
+        self.prepared_sql = BIND_PARAM.sub(self._positional, sql.strip().rstrip(';'))
+
+    def _positional(self, match):
+        if match.group(1) not in self.param_names:
+            self.param_names.append(match.group(1))
+        return f'${self.param_names.index(match.group(1)) + 1}'
+
+    def derive(self, suffix, sql, prepare=None):
+        """Register (once) a variant of this query, e.g. one page of a list"""
+        return register(f'{self.name}.{suffix}', sql, self.prepare if prepare is None else prepare)
+
+    def execute(self, session, params=None, **kwargs):
+        """Execute on a Session or Connection and record the timing"""
+        params = params or {}
+        start = time.perf_counter()
+        try:
+            if PREPARED_STATEMENTS and self.prepare and not kwargs:
+                return self._execute_prepared(session, params)
+            return session.execute(self.statement, params, **kwargs)
+        finally:
+            self.record(time.perf_counter() - start)
+
+    async def execute_async(self, connection, params=None):
+        """Execute on an AsyncConnection (see asgi.py) and record the timing"""
+        start = time.perf_counter()
+        try:
+            return await connection.execute(self.statement, params or {})
+        finally:
+            self.record(time.perf_counter() - start)
+
+    def _execute_prepared(self, session, params):
+        connection = session.connection() if isinstance(session, Session) else session
+        prepared = connection.connection.info.setdefault('prepared_statements', set())
+        if self.prepared_name not in prepared:
+            connection.exec_driver_sql(f'PREPARE {self.prepared_name} AS {self.prepared_sql}')
+            prepared.add(self.prepared_name)
+        if not self.param_names:
+            return connection.exec_driver_sql(f'EXECUTE {self.prepared_name}')
+        placeholders = ', '.join(f'%({name})s' for name in self.param_names)
+        return connection.exec_driver_sql(
+            f'EXECUTE {self.prepared_name} ({placeholders})',
+            {name: params[name] for name in self.param_names}
+        )
+
+    def record(self, seconds):
+        """Add one execution time to the statistics"""
+        with self._lock:
+            self.calls += 1
+            self.total_time += seconds
+            self._samples.append(seconds)
+
+    def stats(self):
+        """Call count, cumulative time and p50/p95 of recent executions"""
+        with self._lock:
+            samples = sorted(self._samples)
+            calls = self.calls
+            total = self.total_time
+        return {
+            'name': self.name,
+            'calls': calls,
+            'total_ms': round(total * 1000, 3),
+            'mean_ms': round(total * 1000 / calls, 3) if calls else None,
+            'p50_ms': round(percentile(samples, 50) * 1000, 3) if samples else None,
+            'p95_ms': round(percentile(samples, 95) * 1000, 3) if samples else None,
+        }
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list"""
+    rank = max(1, math.ceil(pct / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+def register(name, sql, prepare=True):
+    """Define a statement once; registering the same name again returns it"""
+    with _registry_lock:
+        query = REGISTRY.get(name)
+        if query is None:
+            query = REGISTRY[name] = Query(name, sql, prepare)
+        elif query.sql != sql:
+            raise ValueError(f'Query {name!r} is already registered with different SQL')
+        return query
+
+
+def stats():
+    """Statistics for every statement that has run, most expensive first"""
+    rows = [query.stats() for query in list(REGISTRY.values()) if query.calls]
+    return sorted(rows, key=lambda row: row['total_ms'], reverse=True)
+
+
+def reset_stats():
+    """Clear the counters of every statement"""
+    for query in list(REGISTRY.values()):
+        with query._lock:
+            query.calls = 0
+            query.total_time = 0.0
+            query._samples.clear()
+
+
+# ============================================================================
+# USER
+# ============================================================================
+
+USER_LIST = register('user_list', """
+    SELECT user_id, email, given_name, surname, city, phone_number, profile_description
+    FROM "USER"
+""")
+
+INSERT_USER = register('insert_user', """
+    INSERT INTO "USER" (email, given_name, surname, city, phone_number, profile_description, password)
+    VALUES (:email, :given_name, :surname, :city, :phone_number, :profile_description, :password)
+""")
+
+USER_BY_ID = register('user_by_id', 'SELECT * FROM "USER" WHERE user_id = :user_id')
+
+UPDATE_USER = register('update_user', """
+    UPDATE "USER"
+    SET email = :email, given_name = :given_name, surname = :surname,
+        city = :city, phone_number = :phone_number,
+        profile_description = :profile_description, password = :password
+    WHERE user_id = :user_id
+""")
+
+DELETE_USER = register('delete_user', 'DELETE FROM "USER" WHERE user_id = :user_id')
+
+# ============================================================================
+# CAREGIVER
+# ============================================================================
+
+CAREGIVER_LIST = register('caregiver_list', """
+    SELECT c.*, u.given_name, u.surname, u.email, u.city, u.phone_number
+    FROM CAREGIVER c
+    JOIN "USER" u ON c.caregiver_user_id = u.user_id
+""")
+
+INSERT_CAREGIVER = register('insert_caregiver', """
+    INSERT INTO CAREGIVER (caregiver_user_id, photo, gender, caregiving_type, hourly_rate)
+    VALUES (:caregiver_user_id, :photo, :gender, :caregiving_type, :hourly_rate)
+""")
+
+UPDATE_CAREGIVER = register('update_caregiver', """
+    UPDATE CAREGIVER
+    SET photo = :photo, gender = :gender, caregiving_type = :caregiving_type,
+        hourly_rate = :hourly_rate
+    WHERE caregiver_user_id = :caregiver_user_id
+""")
+
+CAREGIVER_BY_ID = register('caregiver_by_id', """
+    SELECT c.*, u.given_name, u.surname
+    FROM CAREGIVER c
+    JOIN "USER" u ON c.caregiver_user_id = u.user_id
+    WHERE c.caregiver_user_id = :caregiver_id
+""")
+
+DELETE_CAREGIVER = register('delete_caregiver', "DELETE FROM CAREGIVER WHERE caregiver_user_id = :caregiver_id")
+
+# ============================================================================
+# MEMBER
+# ============================================================================
+
+MEMBER_LIST = register('member_list', """
+    SELECT m.*, u.given_name, u.surname, u.email, u.city, u.phone_number
+    FROM MEMBER m
+    JOIN "USER" u ON m.member_user_id = u.user_id
+""")
+
+INSERT_MEMBER = register('insert_member', """
+    INSERT INTO MEMBER (member_user_id, house_rules, dependent_description)
+    VALUES (:member_user_id, :house_rules, :dependent_description)
+""")
+
+UPDATE_MEMBER = register('update_member', """
+    UPDATE MEMBER
+    SET house_rules = :house_rules, dependent_description = :dependent_description
+    WHERE member_user_id = :member_user_id
+""")
+
+MEMBER_BY_ID = register('member_by_id', """
+    SELECT m.*, u.given_name, u.surname
+    FROM MEMBER m
+    JOIN "USER" u ON m.member_user_id = u.user_id
+    WHERE m.member_user_id = :member_id
+""")
+
+DELETE_MEMBER = register('delete_member', "DELETE FROM MEMBER WHERE member_user_id = :member_id")
+
+# ============================================================================
+# ADDRESS
+# ============================================================================
+
+ADDRESS_LIST = register('address_list', """
+    SELECT a.*, u.given_name, u.surname
+    FROM ADDRESS a
+    JOIN MEMBER m ON a.member_user_id = m.member_user_id
+    JOIN "USER" u ON m.member_user_id = u.user_id
+""")
+
+INSERT_ADDRESS = register('insert_address', """
+    INSERT INTO ADDRESS (member_user_id, house_number, street, town)
+    VALUES (:member_user_id, :house_number, :street, :town)
+""")
+
+UPDATE_ADDRESS = register('update_address', """
+    UPDATE ADDRESS
+    SET house_number = :house_number, street = :street, town = :town
+    WHERE member_user_id = :member_user_id
+""")
+
+ADDRESS_BY_MEMBER = register('address_by_member', """
+    SELECT a.*, u.given_name, u.surname
+    FROM ADDRESS a
+    JOIN MEMBER m ON a.member_user_id = m.member_user_id
+    JOIN "USER" u ON m.member_user_id = u.user_id
+    WHERE a.member_user_id = :member_id
+""")
+
+DELETE_ADDRESS = register('delete_address', "DELETE FROM ADDRESS WHERE member_user_id = :member_id")
+
+# ============================================================================
+# JOB
+# ============================================================================
+
+JOB_LIST = register('job_list', """
+    SELECT j.*, u.given_name, u.surname
+    FROM JOB j
+    JOIN MEMBER m ON j.member_user_id = m.member_user_id
+    JOIN "USER" u ON m.member_user_id = u.user_id
+""")
+
+INSERT_JOB = register('insert_job', """
+    INSERT INTO JOB (member_user_id, required_caregiving_type, other_requirements, date_posted)
+    VALUES (:member_user_id, :required_caregiving_type, :other_requirements, :date_posted)
+""")
+
+UPDATE_JOB = register('update_job', """
+    UPDATE JOB
+    SET required_caregiving_type = :required_caregiving_type,
+        other_requirements = :other_requirements,
+        date_posted = :date_posted
+    WHERE job_id = :job_id
+""")
+
+JOB_BY_ID = register('job_by_id', """
+    SELECT j.*, u.given_name, u.surname
+    FROM JOB j
+    JOIN MEMBER m ON j.member_user_id = m.member_user_id
+    JOIN "USER" u ON m.member_user_id = u.user_id
+    WHERE j.job_id = :job_id
+""")
+
+DELETE_JOB = register('delete_job', "DELETE FROM JOB WHERE job_id = :job_id")
+
+# ============================================================================
+# JOB_APPLICATION
+# ============================================================================
+
+# job_applications_view (section 8 below) already joins the job, member and
+# caregiver names; the list page filters and pages through it
+JOB_APPLICATION_LIST = register('job_application_list', """
+    SELECT * FROM job_applications_view
+""")
+
+INSERT_JOB_APPLICATION = register('insert_job_application', """
+    INSERT INTO JOB_APPLICATION (caregiver_user_id, job_id, date_applied)
+    VALUES (:caregiver_user_id, :job_id, :date_applied)
+""")
+
+DELETE_JOB_APPLICATION = register('delete_job_application', """
+    DELETE FROM JOB_APPLICATION 
+    WHERE caregiver_user_id = :caregiver_id AND job_id = :job_id
+""")
+
+# ============================================================================
+# APPOINTMENT
+# ============================================================================
+
+APPOINTMENT_LIST = register('appointment_list', """
+    SELECT a.*,
+           u_caregiver.given_name || ' ' || u_caregiver.surname AS caregiver_name,
+           u_member.given_name || ' ' || u_member.surname AS member_name
+    FROM APPOINTMENT a
+    JOIN CAREGIVER c ON a.caregiver_user_id = c.caregiver_user_id
+    JOIN "USER" u_caregiver ON c.caregiver_user_id = u_caregiver.user_id
+    JOIN MEMBER m ON a.member_user_id = m.member_user_id
+    JOIN "USER" u_member ON m.member_user_id = u_member.user_id
+""")
+
+INSERT_APPOINTMENT = register('insert_appointment', """
+    INSERT INTO APPOINTMENT (caregiver_user_id, member_user_id, appointment_date, 
+                            appointment_time, work_hours, status)
+    VALUES (:caregiver_user_id, :member_user_id, :appointment_date,
+            :appointment_time, :work_hours, :status)
+""")
+
+UPDATE_APPOINTMENT = register('update_appointment', """
+    UPDATE APPOINTMENT
+    SET caregiver_user_id = :caregiver_user_id,
+        member_user_id = :member_user_id,
+        appointment_date = :appointment_date,
+        appointment_time = :appointment_time,
+        work_hours = :work_hours,
+        status = :status
+    WHERE appointment_id = :appointment_id
+""")
+
+APPOINTMENT_BY_ID = register('appointment_by_id', """
+    SELECT a.*,
+           u_caregiver.given_name || ' ' || u_caregiver.surname AS caregiver_name,
+           u_member.given_name || ' ' || u_member.surname AS member_name
+    FROM APPOINTMENT a
+    JOIN "USER" u_caregiver ON a.caregiver_user_id = u_caregiver.user_id
+    JOIN "USER" u_member ON a.member_user_id = u_member.user_id
+    WHERE a.appointment_id = :appointment_id
+""")
+
+DELETE_APPOINTMENT = register('delete_appointment', "DELETE FROM APPOINTMENT WHERE appointment_id = :appointment_id")
+
+APPOINTMENT_CAREGIVER = register('appointment_caregiver', """
+    SELECT caregiver_user_id FROM APPOINTMENT WHERE appointment_id = :appointment_id
+""")
+
+# Same range as the generated APPOINTMENT.appointment_period column
+_REQUESTED_PERIOD = """tsrange(
+        CAST(:appointment_date AS DATE) + CAST(:appointment_time AS TIME),
+        CAST(:appointment_date AS DATE) + CAST(:appointment_time AS TIME)
+            + CAST(:work_hours AS NUMERIC) * INTERVAL '1 hour')"""
+
+# The caregiver's first appointment that overlaps the requested one, found
+# through the GiST index of the appointment_no_overlap constraint. Pass
+# appointment_id 0 for a new appointment.
+APPOINTMENT_CONFLICT = register('appointment_conflict', f"""
+    SELECT a.appointment_id, a.appointment_date, a.appointment_time, a.work_hours, a.status,
+           u.given_name || ' ' || u.surname AS member_name
+    FROM APPOINTMENT a
+    JOIN "USER" u ON a.member_user_id = u.user_id
+    WHERE a.caregiver_user_id = :caregiver_user_id
+      AND a.status <> 'declined'
+      AND a.appointment_period && {_REQUESTED_PERIOD}
+      AND a.appointment_id <> :appointment_id
+    ORDER BY a.appointment_date, a.appointment_time
+    LIMIT 1
+""")
+
+APPOINTMENT_PARTY_NAMES = register('appointment_party_names', """
+    SELECT (SELECT given_name || ' ' || surname FROM "USER" WHERE user_id = :caregiver_user_id) AS caregiver_name,
+           (SELECT given_name || ' ' || surname FROM "USER" WHERE user_id = :member_user_id) AS member_name
+""")
+
+
+# ============================================================================
+# FORM PICKERS
+# ============================================================================
+
+MEMBER_PICKER = register('member_picker', """
+    SELECT m.member_user_id, u.given_name || ' ' || u.surname AS name
+    FROM MEMBER m
+    JOIN "USER" u ON m.member_user_id = u.user_id
+    ORDER BY m.member_user_id
+""")
+
+JOB_PICKER = register('job_picker', "SELECT job_id, required_caregiving_type FROM JOB ORDER BY job_id")
+
+USERS_WITHOUT_CAREGIVER = register('users_without_caregiver', """
+    SELECT u.user_id, u.given_name || ' ' || u.surname AS name
+    FROM "USER" u
+    LEFT JOIN CAREGIVER c ON u.user_id = c.caregiver_user_id
+    WHERE c.caregiver_user_id IS NULL
+    ORDER BY u.user_id
+""")
+
+USERS_WITHOUT_MEMBER = register('users_without_member', """
+    SELECT u.user_id, u.given_name || ' ' || u.surname AS name
+    FROM "USER" u
+    LEFT JOIN MEMBER m ON u.user_id = m.member_user_id
+    WHERE m.member_user_id IS NULL
+    ORDER BY u.user_id
+""")
+
+MEMBERS_WITHOUT_ADDRESS = register('members_without_address', """
+    SELECT m.member_user_id, u.given_name || ' ' || u.surname AS name
+    FROM MEMBER m
+    JOIN "USER" u ON m.member_user_id = u.user_id
+    LEFT JOIN ADDRESS a ON m.member_user_id = a.member_user_id
+    WHERE a.member_user_id IS NULL
+    ORDER BY m.member_user_id
+""")
+
+
+# ============================================================================
+# TYPEAHEAD SEARCH
+# ============================================================================
+
+# The name expression matches idx_user_full_name_prefix (short prefixes) and
+# idx_user_full_name_trgm (substrings) in schema.sql
+NAME_PREFIX_CONDITION = "lower(u.given_name || ' ' || u.surname) LIKE :pattern"
+NAME_CONTAINS_CONDITION = "(u.given_name || ' ' || u.surname) ILIKE :pattern"
+# Prefix matches come back in the order of the text_pattern_ops index
+# (~<~ is its byte-wise "less than"), so the scan stops after :limit rows
+# instead of sorting every user that starts with one or two letters
+NAME_PREFIX_ORDER = "lower(u.given_name || ' ' || u.surname) USING ~<~, id"
+# Substring matches put names starting with the query first
+NAME_CONTAINS_ORDER = "lower(u.given_name || ' ' || u.surname) LIKE :prefix DESC, name, id"
+
+
+def _name_search(role_join, id_column, condition, order):
+    return f"""
+    SELECT {id_column} AS id, u.given_name || ' ' || u.surname AS name
+    FROM "USER" u
+    {role_join}
+    WHERE {condition}
+    ORDER BY {order}
+    LIMIT :limit
+"""
+
+
+_CAREGIVER_JOIN = 'JOIN CAREGIVER c ON c.caregiver_user_id = u.user_id'
+_MEMBER_JOIN = 'JOIN MEMBER m ON m.member_user_id = u.user_id'
+
+CAREGIVER_NAME_PREFIX = register('caregiver_name_prefix', _name_search(
+    _CAREGIVER_JOIN, 'c.caregiver_user_id', NAME_PREFIX_CONDITION, NAME_PREFIX_ORDER))
+CAREGIVER_NAME_CONTAINS = register('caregiver_name_contains', _name_search(
+    _CAREGIVER_JOIN, 'c.caregiver_user_id', NAME_CONTAINS_CONDITION, NAME_CONTAINS_ORDER))
+MEMBER_NAME_PREFIX = register('member_name_prefix', _name_search(
+    _MEMBER_JOIN, 'm.member_user_id', NAME_PREFIX_CONDITION, NAME_PREFIX_ORDER))
+MEMBER_NAME_CONTAINS = register('member_name_contains', _name_search(
+    _MEMBER_JOIN, 'm.member_user_id', NAME_CONTAINS_CONDITION, NAME_CONTAINS_ORDER))
+
+
+# ============================================================================
+# TEXT SEARCH
+# ============================================================================
+
+# The documents match the GIN expression indexes of migrations/002 exactly
+# (idx_*_fts); the ILIKE conditions use the pg_trgm indexes (idx_*_trgm)
+JOB_DOCUMENT = "to_tsvector('english', coalesce(j.other_requirements, ''))"
+MEMBER_DOCUMENT = ("to_tsvector('english', coalesce(m.house_rules, '') || ' ' || "
+                   "coalesce(m.dependent_description, ''))")
+USER_DOCUMENT = "to_tsvector('english', coalesce(u.profile_description, ''))"
+
+
+def _ranked_search(matches, columns, joins):
+    """
+    Keep the :candidates best-ranked matching ids, then fetch the details of
+    one page. Every match is ranked, but keeping only the best is a top-N
+    sort, and the page is cut from the kept ids alone; total is the number
+    kept.
+    """
+    return f"""
+    WITH matches AS (
+        {matches}
+        ORDER BY rank DESC, id
+        LIMIT :candidates
+    ),
+    ranked AS (
+        SELECT id, rank, count(*) OVER () AS total
+        FROM matches
+        ORDER BY rank DESC, id
+        LIMIT :limit OFFSET :offset
+    )
+    SELECT r.id, r.rank, r.total, {columns}
+    FROM ranked r
+    {joins}
+    ORDER BY r.rank DESC, r.id
+"""
+
+
+def _fulltext_matches(table, id_column, document):
+    return f"""SELECT {id_column} AS id, ts_rank_cd({document}, tsq) AS rank
+        FROM {table}, websearch_to_tsquery('english', :q) tsq
+        WHERE {document} @@ tsq"""
+
+
+def _substring_matches(table, id_column, text_columns):
+    similarity = ', '.join(f"word_similarity(:q, coalesce({column}, ''))" for column in text_columns)
+    condition = ' OR '.join(f'{column} ILIKE :pattern' for column in text_columns)
+    return f"""SELECT {id_column} AS id, greatest({similarity}) AS rank
+        FROM {table}
+        WHERE {condition}"""
+
+
+_JOB_COLUMNS = ("j.required_caregiving_type AS title, j.other_requirements AS body, "
+                "u.given_name || ' ' || u.surname AS name, j.date_posted AS posted")
+_JOB_JOINS = 'JOIN JOB j ON j.job_id = r.id JOIN "USER" u ON u.user_id = j.member_user_id'
+_MEMBER_COLUMNS = ("u.city AS title, concat_ws(' / ', m.house_rules, m.dependent_description) AS body, "
+                   "u.given_name || ' ' || u.surname AS name, NULL AS posted")
+_MEMBER_JOINS = 'JOIN MEMBER m ON m.member_user_id = r.id JOIN "USER" u ON u.user_id = r.id'
+_USER_COLUMNS = ("u.city AS title, u.profile_description AS body, "
+                 "u.given_name || ' ' || u.surname AS name, NULL AS posted")
+_USER_JOINS = 'JOIN "USER" u ON u.user_id = r.id'
+
+SEARCH_JOBS_FULLTEXT = register('search_jobs_fulltext', _ranked_search(
+    _fulltext_matches('JOB j', 'j.job_id', JOB_DOCUMENT), _JOB_COLUMNS, _JOB_JOINS))
+SEARCH_JOBS_SUBSTRING = register('search_jobs_substring', _ranked_search(
+    _substring_matches('JOB j', 'j.job_id', ['j.other_requirements']), _JOB_COLUMNS, _JOB_JOINS))
+SEARCH_MEMBERS_FULLTEXT = register('search_members_fulltext', _ranked_search(
+    _fulltext_matches('MEMBER m', 'm.member_user_id', MEMBER_DOCUMENT), _MEMBER_COLUMNS, _MEMBER_JOINS))
+SEARCH_MEMBERS_SUBSTRING = register('search_members_substring', _ranked_search(
+    _substring_matches('MEMBER m', 'm.member_user_id', ['m.house_rules', 'm.dependent_description']),
+    _MEMBER_COLUMNS, _MEMBER_JOINS))
+SEARCH_USERS_FULLTEXT = register('search_users_fulltext', _ranked_search(
+    _fulltext_matches('"USER" u', 'u.user_id', USER_DOCUMENT), _USER_COLUMNS, _USER_JOINS))
+SEARCH_USERS_SUBSTRING = register('search_users_substring', _ranked_search(
+    _substring_matches('"USER" u', 'u.user_id', ['u.profile_description']), _USER_COLUMNS, _USER_JOINS))
+
+
+# ============================================================================
+# MATCHING (matching.py)
+# ============================================================================
+
+# One row per caregiver with what the match index ranks by; confirmed hours
+# come from the CAREGIVER_EARNINGS rollup
+_MATCH_CANDIDATES = """
+    SELECT c.caregiver_user_id,
+           u.given_name || ' ' || u.surname AS name,
+           u.city,
+           c.caregiving_type,
+           c.hourly_rate,
+           COALESCE(e.confirmed_hours, 0) AS confirmed_hours,
+           COALESCE(e.confirmed_appointments, 0) AS confirmed_appointments
+    FROM CAREGIVER c
+    JOIN "USER" u ON c.caregiver_user_id = u.user_id
+    LEFT JOIN CAREGIVER_EARNINGS e ON c.caregiver_user_id = e.caregiver_user_id
+"""
+
+MATCH_CANDIDATES = register('match_candidates', _MATCH_CANDIDATES, prepare=False)
+
+MATCH_CANDIDATES_BY_ID = register('match_candidates_by_id', f"""
+    {_MATCH_CANDIDATES}
+    WHERE c.caregiver_user_id = ANY(:caregiver_ids)
+""")
+
+MATCH_JOB = register('match_job', """
+    SELECT j.job_id, j.required_caregiving_type, u.city
+    FROM JOB j
+    JOIN "USER" u ON j.member_user_id = u.user_id
+    WHERE j.job_id = :job_id
+""")
+
+
+# ============================================================================
+# AVAILABILITY
+# ============================================================================
+
+# Busy intervals of the given caregivers within [:range_start, :range_end),
+# sorted by caregiver and start: one probe of the appointment_no_overlap
+# GiST index per caregiver. Caregivers without appointments in the range
+# get one row with NULL starts/ends; ids that are not caregivers get none.
+CAREGIVER_BUSY = register('caregiver_busy', """
+    SELECT c.caregiver_user_id,
+           lower(a.appointment_period) AS starts,
+           upper(a.appointment_period) AS ends
+    FROM CAREGIVER c
+    LEFT JOIN APPOINTMENT a
+           ON a.caregiver_user_id = c.caregiver_user_id
+          AND a.status <> 'declined'
+          AND a.appointment_period && tsrange(:range_start, :range_end)
+    WHERE c.caregiver_user_id = ANY(:caregiver_ids)
+    ORDER BY c.caregiver_user_id, starts
+""")
+
+
+# ============================================================================
+# CONDITIONAL GET
+# ============================================================================
+
+# Version stamps of the tables a page reads (TABLE_VERSION, bumped by triggers)
+TABLE_VERSIONS = register('table_versions', """
+    SELECT table_name, version, modified_at
+    FROM TABLE_VERSION
+    WHERE table_name = ANY(:tables)
+    ORDER BY table_name
+""")
+
+
+# ============================================================================
+# REPORTS (main.py)
+# ============================================================================
+
+PING = register('ping', "SELECT 1")
+
+# 3.1 Update phone number of Arman Armanov
+UPDATE_ARMAN_PHONE = register('update_arman_phone', """
+    UPDATE "USER"
+    SET phone_number = '+77773414141'
+    WHERE given_name = 'Arman' AND surname = 'Armanov';
+""")
+
+VERIFY_ARMAN_PHONE = register('verify_arman_phone', """
+    SELECT user_id, given_name, surname, phone_number
+    FROM "USER"
+    WHERE given_name = 'Arman' AND surname = 'Armanov';
+""")
+
+# 3.2 Add commission fee to caregivers' hourly rates
+ADD_COMMISSION = register('add_commission', """
+    UPDATE CAREGIVER
+    SET hourly_rate = CASE
+        WHEN hourly_rate < 10 THEN hourly_rate + 0.3
+        ELSE hourly_rate * 1.10
+    END;
+""")
+
+CAREGIVER_RATES = register('caregiver_rates', """
+    SELECT caregiver_user_id, 
+           u.given_name || ' ' || u.surname AS caregiver_name,
+           caregiving_type,
+           hourly_rate
+    FROM CAREGIVER c
+    JOIN "USER" u ON c.caregiver_user_id = u.user_id
+    ORDER BY caregiver_user_id;
+""")
+
+# 4.1 Delete jobs posted by Amina Aminova
+DELETE_AMINA_JOBS = register('delete_amina_jobs', """
+    DELETE FROM JOB
+    WHERE member_user_id IN (
+        SELECT member_user_id
+        FROM MEMBER m
+        JOIN "USER" u ON m.member_user_id = u.user_id
+        WHERE u.given_name = 'Amina' AND u.surname = 'Aminova'
+    );
+""")
+
+VERIFY_AMINA_JOBS = register('verify_amina_jobs', """
+    SELECT j.job_id, u.given_name, u.surname, j.required_caregiving_type
+    FROM JOB j
+    JOIN MEMBER m ON j.member_user_id = m.member_user_id
+    JOIN "USER" u ON m.member_user_id = u.user_id
+    WHERE u.given_name = 'Amina' AND u.surname = 'Aminova';
+""")
+
+# 4.2 Delete members who live on Kabanbay Batyr street
+DELETE_KABANBAY_MEMBERS = register('delete_kabanbay_members', """
+    DELETE FROM MEMBER
+    WHERE member_user_id IN (
+        SELECT a.member_user_id
+        FROM ADDRESS a
+        WHERE a.street = 'Kabanbay Batyr Avenue'
+    );
+""")
+
+VERIFY_KABANBAY_MEMBERS = register('verify_kabanbay_members', """
+    SELECT m.member_user_id, u.given_name, u.surname, a.street
+    FROM MEMBER m
+    JOIN "USER" u ON m.member_user_id = u.user_id
+    LEFT JOIN ADDRESS a ON m.member_user_id = a.member_user_id
+    WHERE a.street = 'Kabanbay Batyr Avenue';
+""")
+
+# 5.1 Caregiver and member names for accepted appointments
+QUERY_5_1 = register('query_5_1', """
+    SELECT 
+        u1.given_name || ' ' || u1.surname AS caregiver_name,
+        u2.given_name || ' ' || u2.surname AS member_name,
+        a.appointment_date,
+        a.appointment_time,
+        a.work_hours
+    FROM APPOINTMENT a
+    JOIN CAREGIVER c ON a.caregiver_user_id = c.caregiver_user_id
+    JOIN "USER" u1 ON c.caregiver_user_id = u1.user_id
+    JOIN MEMBER m ON a.member_user_id = m.member_user_id
+    JOIN "USER" u2 ON m.member_user_id = u2.user_id
+    WHERE a.status = 'confirmed'
+    ORDER BY a.appointment_date, a.appointment_time;
+""")
+
+# 5.2 Job ids that contain 'soft-spoken' in their other requirements
+QUERY_5_2 = register('query_5_2', """
+    SELECT job_id, required_caregiving_type, other_requirements
+    FROM JOB
+    WHERE other_requirements ILIKE '%soft-spoken%'
+    ORDER BY job_id;
+""")
+
+# 5.3 Work hours of all babysitter positions
+QUERY_5_3 = register('query_5_3', """
+    SELECT 
+        a.appointment_id,
+        u.given_name || ' ' || u.surname AS caregiver_name,
+        a.appointment_date,
+        a.work_hours,
+        a.status
+    FROM APPOINTMENT a
+    JOIN CAREGIVER c ON a.caregiver_user_id = c.caregiver_user_id
+    JOIN "USER" u ON c.caregiver_user_id = u.user_id
+    WHERE c.caregiving_type = 'babysitter'
+    ORDER BY a.appointment_date;
+""")
+
+# 5.4 Members looking for Elderly Care in Astana with "No pets." rule
+QUERY_5_4 = register('query_5_4', """
+    SELECT 
+        u.user_id,
+        u.given_name || ' ' || u.surname AS member_name,
+        u.city,
+        m.house_rules,
+        j.job_id,
+        j.required_caregiving_type
+    FROM MEMBER m
+    JOIN "USER" u ON m.member_user_id = u.user_id
+    JOIN JOB j ON m.member_user_id = j.member_user_id
+    WHERE u.city = 'Astana'
+      AND j.required_caregiving_type = 'elderly care'
+      AND m.house_rules ILIKE '%No pets%'
+    ORDER BY u.surname, u.given_name;
+""")
+
+# 6.1 Number of applicants for each job posted by a member
+# (JOB.applicant_count is kept current by triggers on JOB_APPLICATION)
+QUERY_6_1 = register('query_6_1', """
+    SELECT 
+        j.job_id,
+        u.given_name || ' ' || u.surname AS member_name,
+        j.required_caregiving_type,
+        j.applicant_count AS number_of_applicants
+    FROM JOB j
+    JOIN MEMBER m ON j.member_user_id = m.member_user_id
+    JOIN "USER" u ON m.member_user_id = u.user_id
+    ORDER BY number_of_applicants DESC, j.job_id;
+""")
+
+# 6.2-7 read the CAREGIVER_EARNINGS rollup (kept current by triggers, see
+# schema.sql) instead of aggregating every confirmed APPOINTMENT; the
+# results are the same. confirmed_appointments > 0 leaves out caregivers
+# whose confirmed appointments were all removed, as GROUP BY would.
+
+# 6.2 Total hours spent by caregivers for all accepted appointments
+QUERY_6_2 = register('query_6_2', """
+    SELECT 
+        c.caregiver_user_id,
+        u.given_name || ' ' || u.surname AS caregiver_name,
+        c.caregiving_type,
+        e.confirmed_hours AS total_hours
+    FROM CAREGIVER_EARNINGS e
+    JOIN CAREGIVER c ON e.caregiver_user_id = c.caregiver_user_id
+    JOIN "USER" u ON c.caregiver_user_id = u.user_id
+    WHERE e.confirmed_appointments > 0
+    ORDER BY total_hours DESC;
+""")
+
+# 6.3 Average pay of caregivers based on accepted appointments
+QUERY_6_3 = register('query_6_3', """
+    SELECT 
+        c.caregiver_user_id,
+        u.given_name || ' ' || u.surname AS caregiver_name,
+        c.caregiving_type,
+        ROUND(e.confirmed_cost / e.confirmed_appointments, 2) AS average_pay_per_appointment
+    FROM CAREGIVER_EARNINGS e
+    JOIN CAREGIVER c ON e.caregiver_user_id = c.caregiver_user_id
+    JOIN "USER" u ON c.caregiver_user_id = u.user_id
+    WHERE e.confirmed_appointments > 0
+    ORDER BY average_pay_per_appointment DESC;
+""")
+
+# 6.4 Caregivers who earn above average based on accepted appointments
+QUERY_6_4 = register('query_6_4', """
+    WITH caregiver_earnings AS (
+        SELECT 
+            caregiver_user_id,
+            confirmed_cost / confirmed_appointments AS avg_earnings
+        FROM CAREGIVER_EARNINGS
+        WHERE confirmed_appointments > 0
+    ),
+    overall_avg AS (
+        SELECT AVG(avg_earnings) AS overall_average
+        FROM caregiver_earnings
+    )
+    SELECT 
+        ce.caregiver_user_id,
+        u.given_name || ' ' || u.surname AS caregiver_name,
+        c.caregiving_type,
+        ROUND(ce.avg_earnings, 2) AS average_earnings,
+        ROUND(oa.overall_average, 2) AS overall_average
+    FROM caregiver_earnings ce
+    CROSS JOIN overall_avg oa
+    JOIN CAREGIVER c ON ce.caregiver_user_id = c.caregiver_user_id
+    JOIN "USER" u ON c.caregiver_user_id = u.user_id
+    WHERE ce.avg_earnings > oa.overall_average
+    ORDER BY ce.avg_earnings DESC;
+""")
+
+# 7. Total cost to pay for caregivers for all accepted appointments
+QUERY_7 = register('query_7', """
+    SELECT 
+        SUM(confirmed_cost) AS total_cost
+    FROM CAREGIVER_EARNINGS
+    WHERE confirmed_appointments > 0;
+""")
+
+# Top rows of the report queries for the /dashboard page
+def _top_rows(query):
+    return query.derive('top', query.sql.strip().rstrip(';') + '\n    LIMIT :limit')
+
+
+DASHBOARD_APPLICANTS = _top_rows(QUERY_6_1)
+DASHBOARD_HOURS = _top_rows(QUERY_6_2)
+DASHBOARD_AVERAGE_PAY = _top_rows(QUERY_6_3)
+DASHBOARD_ABOVE_AVERAGE = _top_rows(QUERY_6_4)
+
+# 8. View of job applications and applicants
+CREATE_JOB_APPLICATIONS_VIEW = register('create_job_applications_view', """
+    CREATE OR REPLACE VIEW job_applications_view AS
+    SELECT 
+        ja.job_id,
+        j.required_caregiving_type,
+        j.other_requirements,
+        j.date_posted,
+        u_member.given_name || ' ' || u_member.surname AS member_name,
+        ja.caregiver_user_id,
+        u_caregiver.given_name || ' ' || u_caregiver.surname AS applicant_name,
+        c.caregiving_type AS applicant_caregiving_type,
+        c.hourly_rate,
+        ja.date_applied
+    FROM JOB_APPLICATION ja
+    JOIN JOB j ON ja.job_id = j.job_id
+    JOIN MEMBER m ON j.member_user_id = m.member_user_id
+    JOIN "USER" u_member ON m.member_user_id = u_member.user_id
+    JOIN CAREGIVER c ON ja.caregiver_user_id = c.caregiver_user_id
+    JOIN "USER" u_caregiver ON c.caregiver_user_id = u_caregiver.user_id;
+""", prepare=False)
+
+# The view has no ORDER BY of its own, so that filtered and paginated reads
+# of it (the job applications list) only sort the rows they return
+JOB_APPLICATIONS_VIEW = register('job_applications_view', """
+    SELECT * FROM job_applications_view
+    ORDER BY job_id, date_applied, caregiver_user_id;
+""")
+
+# ============================================================================
+# MAINTENANCE (maintenance.py)
+# ============================================================================
+
+# Confirmed appointment totals per caregiver, computed from APPOINTMENT;
+# the source of truth for the CAREGIVER_EARNINGS rollup
+_LIVE_EARNINGS = """
+    SELECT a.caregiver_user_id,
+           SUM(a.work_hours) AS confirmed_hours,
+           COUNT(*) AS confirmed_appointments,
+           SUM(c.hourly_rate * a.work_hours) AS confirmed_cost
+    FROM APPOINTMENT a
+    JOIN CAREGIVER c ON a.caregiver_user_id = c.caregiver_user_id
+    WHERE a.status = 'confirmed'
+    GROUP BY a.caregiver_user_id
+"""
+
+LOCK_EARNINGS_SOURCES = register('lock_earnings_sources', """
+    LOCK TABLE APPOINTMENT, CAREGIVER IN SHARE ROW EXCLUSIVE MODE
+""", prepare=False)
+
+CLEAR_CAREGIVER_EARNINGS = register('clear_caregiver_earnings', "DELETE FROM CAREGIVER_EARNINGS")
+
+FILL_CAREGIVER_EARNINGS = register('fill_caregiver_earnings', f"""
+    INSERT INTO CAREGIVER_EARNINGS (caregiver_user_id, confirmed_hours, confirmed_appointments, confirmed_cost)
+    {_LIVE_EARNINGS}
+""")
+
+# Caregivers whose rollup row differs from a fresh aggregation
+CAREGIVER_EARNINGS_DRIFT = register('caregiver_earnings_drift', f"""
+    WITH live AS ({_LIVE_EARNINGS}),
+    stored AS (
+        SELECT * FROM CAREGIVER_EARNINGS
+        WHERE confirmed_appointments <> 0 OR confirmed_hours <> 0 OR confirmed_cost <> 0
+    )
+    SELECT COALESCE(live.caregiver_user_id, stored.caregiver_user_id) AS caregiver_user_id,
+           stored.confirmed_hours AS stored_hours, live.confirmed_hours AS live_hours,
+           stored.confirmed_appointments AS stored_appointments,
+           live.confirmed_appointments AS live_appointments,
+           stored.confirmed_cost AS stored_cost, live.confirmed_cost AS live_cost
+    FROM live
+    FULL OUTER JOIN stored ON stored.caregiver_user_id = live.caregiver_user_id
+    WHERE live.confirmed_hours IS DISTINCT FROM stored.confirmed_hours
+       OR live.confirmed_appointments IS DISTINCT FROM stored.confirmed_appointments
+       OR live.confirmed_cost IS DISTINCT FROM stored.confirmed_cost
+    ORDER BY 1
+""")
+
+# Jobs whose applicant_count differs from the number of JOB_APPLICATION rows
+_APPLICANT_COUNT_DRIFT = """
+    SELECT j.job_id, j.applicant_count AS stored_count, count(ja.job_id) AS live_count
+    FROM JOB j
+    LEFT JOIN JOB_APPLICATION ja ON ja.job_id = j.job_id
+    GROUP BY j.job_id
+    HAVING j.applicant_count <> count(ja.job_id)
+"""
+
+LOCK_APPLICANT_COUNT_SOURCES = register('lock_applicant_count_sources', """
+    LOCK TABLE JOB_APPLICATION IN SHARE ROW EXCLUSIVE MODE
+""", prepare=False)
+
+APPLICANT_COUNT_DRIFT = register('applicant_count_drift', f"""
+    {_APPLICANT_COUNT_DRIFT}
+    ORDER BY j.job_id
+""")
+
+# Sets the drifted counts; returns the rows it changed
+REPAIR_APPLICANT_COUNTS = register('repair_applicant_counts', f"""
+    WITH drift AS ({_APPLICANT_COUNT_DRIFT})
+    UPDATE JOB j
+    SET applicant_count = drift.live_count
+    FROM drift
+    WHERE j.job_id = drift.job_id
+    RETURNING j.job_id, drift.stored_count, drift.live_count
+""")
+
+# Pairs of appointments that double-book a caregiver. The ranges are
+# computed rather than read from appointment_period, so this also runs
+# before migrations/006 adds the column and the constraint.
+def _period(alias):
+    return (f"tsrange({alias}.appointment_date + {alias}.appointment_time, "
+            f"{alias}.appointment_date + {alias}.appointment_time + {alias}.work_hours * INTERVAL '1 hour')")
+
+
+APPOINTMENT_OVERLAPS = register('appointment_overlaps', f"""
+    SELECT a.caregiver_user_id,
+           a.appointment_id, a.appointment_date, a.appointment_time, a.work_hours,
+           b.appointment_id AS other_appointment_id, b.appointment_date AS other_date,
+           b.appointment_time AS other_time, b.work_hours AS other_work_hours
+    FROM APPOINTMENT a
+    JOIN APPOINTMENT b ON b.caregiver_user_id = a.caregiver_user_id AND b.appointment_id > a.appointment_id
+    WHERE a.status <> 'declined' AND b.status <> 'declined'
+      AND {_period('a')} && {_period('b')}
+    ORDER BY a.caregiver_user_id, a.appointment_id, b.appointment_id
+""")
@@ -0,0 +1,197 @@
+"""
+Streaming SQL script reader and executor
+
+Used by main.py, load_db.py, load_render_db.py and bulk_load.py to run
+schema and data files. Statements are read incrementally from the file,
+so memory use is bounded by the largest single statement rather than the
+file size, and the tokenizer understands everything that can hide a
+semicolon:
+
+    'single quoted' strings (with '' escapes), E'...' strings (with
+    backslash escapes), "quoted identifiers", $$dollar$$ and $tag$...$tag$
+    quoting, -- line comments and nested /* block */ comments.
+
+Comments are dropped from the statements that are returned.
+
+Environment:
+    SQL_BATCH_STATEMENTS  statements per transaction in execute_script()
+                          (default 1000, 0 = the whole file in one)
+    SQL_READ_CHUNK        bytes read from the file at a time (default 1 MiB)
+"""
+
+import os
+import re
+from contextlib import nullcontext
+
+from sqlalchemy.orm import Session
+
+BATCH_STATEMENTS = int(os.getenv('SQL_BATCH_STATEMENTS', '1000'))
+READ_CHUNK = int(os.getenv('SQL_READ_CHUNK', str(1 << 20)))
+
+# Anything that starts a comment, a quoted token or ends a statement
+TOKEN = re.compile(r"--|/\*|;|'|\"|\$(?:[^\W\d]\w*)?\$")
+BLOCK_COMMENT = re.compile(r'/\*|\*/')
+QUOTE = re.compile(r"'")
+ESCAPED_QUOTE = re.compile(r"\\.|'", re.DOTALL)
+IDENTIFIER_QUOTE = re.compile(r'"')
+NEWLINE = re.compile(r'\n')
+
+# Longest token that can straddle a chunk boundary ($tag$ of a 63-byte tag)
+LOOKAHEAD = 66
+
+
+class StatementReader:
+    """Incremental tokenizer that yields one SQL statement at a time"""
+
+    def __init__(self, f, chunk_size=READ_CHUNK):
+        self.f = f
+        self.chunk_size = chunk_size
+        self.buf = ''
+        self.pos = 0        # scan position in buf
+        self.seg = 0        # start of the statement text not yet in parts
+        self.parts = []     # pieces of the current statement, comments removed
+        self.eof = False
+
+    def _fill(self):
+        """Append the next chunk of the file to the buffer"""
+        if self.eof:
+            return False
+        chunk = self.f.read(self.chunk_size)
+        if not chunk:
+            self.eof = True
+            return False
+        self.buf += chunk
+        return True
+
+    def _compact(self):
+        """Drop the consumed part of the buffer once it is a chunk long"""
+        if self.seg >= self.chunk_size:
+            self.buf = self.buf[self.seg:]
+            self.pos -= self.seg
+            self.seg = 0
+
+    def _search(self, pattern, start):
+        """Next match of pattern at or after start that is followed by at
+        least one more character (or the end of the file)"""
+        while True:
+            match = pattern.search(self.buf, start)
+            if match and (match.end() < len(self.buf) or self.eof):
+                return match
+            if not self._fill():
+                return match
+
+    def _skip_quoted(self, start, pattern, quote, what):
+        """Position just past the closing quote of a quoted token"""
+        pos = start
+        while True:
+            match = self._search(pattern, pos)
+            if match is None:
+                raise ValueError(f'Unterminated {what} in SQL script')
+            if match.group(0) != quote:
+                pos = match.end()           # backslash escape
+            elif self.buf.startswith(quote * 2, match.start()):
+                pos = match.end() + 1       # doubled quote
+            else:
+                return match.end()
+
+    def _skip_block_comment(self, start):
+        """Position just past the end of a (possibly nested) block comment"""
+        depth = 1
+        pos = start
+        while depth:
+            match = self._search(BLOCK_COMMENT, pos)
+            if match is None:
+                raise ValueError('Unterminated /* comment in SQL script')
+            depth += 1 if match.group(0) == '/*' else -1
+            pos = match.end()
+        return pos
+
+    def _end_statement(self, end):
+        self.parts.append(self.buf[self.seg:end])
+        statement = ''.join(self.parts).strip()
+        self.parts = []
+        return statement
+
+    def __iter__(self):
+        while True:
+            self._compact()
+            match = TOKEN.search(self.buf, self.pos)
+            if match is None or (match.end() + LOOKAHEAD > len(self.buf) and not self.eof):
+                if self._fill():
+                    continue
+                if match is None:
+                    break
+
+            token = match.group(0)
+            start = match.start()
+            if token == ';':
+                statement = self._end_statement(start)
+                self.pos = self.seg = match.end()
+                if statement:
+                    yield statement
+            elif token == '--':
+                self.parts.append(self.buf[self.seg:start])
+                end = self._search(NEWLINE, match.end())
+                self.pos = self.seg = end.start() if end else len(self.buf)
+            elif token == '/*':
+                self.parts.append(self.buf[self.seg:start] + ' ')
+                self.pos = self.seg = self._skip_block_comment(match.end())
+            elif token == "'":
+                prefix = self.buf[max(start - 2, 0):start]
+                backslashes = prefix[-1:] in ('E', 'e') and not prefix[:-1].replace('_', 'a').isalnum()
+                pattern = ESCAPED_QUOTE if backslashes else QUOTE
+                self.pos = self._skip_quoted(match.end(), pattern, "'", 'string literal')
+            elif token == '"':
+                self.pos = self._skip_quoted(match.end(), IDENTIFIER_QUOTE, '"', 'quoted identifier')
+            elif start > 0 and (self.buf[start - 1].isalnum() or self.buf[start - 1] == '_'):
+                self.pos = start + 1            # $ inside an identifier
+            else:
+                end = self._search(re.compile(re.escape(token)), match.end())
+                if end is None:
+                    raise ValueError(f'Unterminated {token} quoted string in SQL script')
+                self.pos = end.end()
+
+        statement = self._end_statement(len(self.buf))
+        if statement:
+            yield statement
+
+
+def iter_statements(source, chunk_size=READ_CHUNK):
+    """Yield the statements of a SQL file (path or open text file) one by one"""
+    if hasattr(source, 'read'):
+        yield from StatementReader(source, chunk_size)
+        return
+    with open(source, 'r', encoding='utf-8') as f:
+        yield from StatementReader(f, chunk_size)
+
+
+def execute_script(connection, source, batch_size=BATCH_STATEMENTS, on_error=None, progress=None):
+    """
+    Execute every statement of a SQL file on a Session or Connection.
+
+    The transaction is committed every batch_size statements (0 = only at
+    the end). If on_error(number, statement, error) is given, each statement
+    runs in a savepoint and failures are reported to it instead of aborting
+    the load. progress(count) is called after every commit.
+
+    Statements go to the driver as written (no bind parameter parsing).
+    Returns the number of statements executed.
+    """
+    count = 0
+    for count, statement in enumerate(iter_statements(source), 1):
+        target = connection.connection() if isinstance(connection, Session) else connection
+        try:
+            with connection.begin_nested() if on_error else nullcontext():
+                target.exec_driver_sql(statement)
+        except Exception as e:
+            if on_error is None:
+                raise
+            on_error(count, statement, e)
+        if batch_size and count % batch_size == 0:
+            connection.commit()
+            if progress:
+                progress(count)
+    connection.commit()
+    if progress:
+        progress(count)
+    return count
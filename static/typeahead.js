@@ -0,0 +1,50 @@
+// Typeahead pickers: a text input with data-typeahead="<search url>" fills
+// its <datalist> from the JSON search API as the user types, and writes the
+// chosen id into the hidden input named by data-target.
+(function () {
+    var ID_SUFFIX = /\(#(\d+)\)$/;
+
+    function attach(input) {
+        var list = document.getElementById(input.getAttribute('list'));
+        var target = document.getElementById(input.dataset.target);
+        var timer = null;
+        var pending = null;
+
+        function sync() {
+            var match = ID_SUFFIX.exec(input.value);
+            target.value = match ? match[1] : '';
+            input.setCustomValidity(target.value ? '' : 'Pick an entry from the suggestions');
+        }
+
+        function search() {
+            var q = input.value.trim();
+            if (!q || ID_SUFFIX.test(input.value)) {
+                return;
+            }
+            if (pending) {
+                pending.abort();
+            }
+            pending = new AbortController();
+            fetch(input.dataset.typeahead + '?q=' + encodeURIComponent(q), {signal: pending.signal})
+                .then(function (response) { return response.json(); })
+                .then(function (results) {
+                    list.innerHTML = '';
+                    results.forEach(function (result) {
+                        var option = document.createElement('option');
+                        option.value = result.name + ' (#' + result.id + ')';
+                        list.appendChild(option);
+                    });
+                })
+                .catch(function () {});
+        }
+
+        input.addEventListener('input', function () {
+            sync();
+            clearTimeout(timer);
+            timer = setTimeout(search, 150);
+        });
+        sync();
+    }
+
+    document.querySelectorAll('input[data-typeahead]').forEach(attach);
+})();